@@ -5,16 +5,203 @@ Copyright SpaceVR, 2017.  All rights reserved.
 """
 
 import socket
+import errno
 import time
 import select
 import sys
+import functools
 
+from event_loop import EventLoop
 from spacepacket import Packet,TelemetryPacket,AckPacket
+from checksum import ChecksumError
 from supernova import Supernova
 
 # Assert Python 2.7
 assert sys.version_info[0:2] == (2,7)
 
+class Reassembler(object):
+    """ Reassemble packet sequences into single packets with the complete data.
+
+    Sequences are tracked independently per (src_node, service, pkt_id), so
+    several transfers can be in progress at once.  The fragments of each
+    are copied into a buffer that grows geometrically, so the total work is
+    linear in the size of the transfer.
+
+    A sequence is abandoned if a packet arrives out of order (according to
+    its 'seq_count'), if a packet carries less data than its 'data_len', or
+    if no packet arrives for it within 'timeout' seconds.  Stale sequences
+    are evicted when the next segmented packet arrives or, when the
+    reassembler is attached to an EventLoop, by a loop timer.
+
+    Properties:
+        timeout   : seconds after which an incomplete sequence is discarded
+        completed : number of multi-packet sequences completed
+        dropped   : number of packets discarded (out of order, truncated, or
+                    no first packet)
+        evicted   : number of incomplete sequences discarded after a timeout
+        loop      : the EventLoop the reassembler is attached to, or None
+    """
+
+    TIMEOUT = 60 # seconds
+
+    # Initial buffer capacity for a new sequence
+    INITIAL_CAPACITY = 4 * Packet.MAX_DATA_SIZE
+
+    DEBUG = False
+
+    def __init__(self, timeout=None, clock=time.time):
+        """ Construct a Reassembler
+
+        Args:
+            timeout : seconds after which an incomplete sequence is discarded
+                (defaults to Reassembler.TIMEOUT)
+            clock : function returning the current time in seconds
+        """
+
+        self.timeout = Reassembler.TIMEOUT if timeout is None else timeout
+        self.clock = clock
+
+        # Map of (src_node, service, pkt_id) -> _Transfer
+        self.transfers = {}
+
+        self.completed = 0
+        self.dropped = 0
+        self.evicted = 0
+
+        self.loop = None
+        self._evict_timer = None
+
+    def attach(self, loop):
+        """ Evict stale sequences from a timer on an EventLoop, using the loop's clock. """
+
+        self.loop = loop
+        self.clock = loop.clock
+        self._start_evict_timer()
+
+    def detach(self):
+        """ Stop the eviction timer. """
+
+        if self._evict_timer is not None:
+            self._evict_timer.cancel()
+            self._evict_timer = None
+        self.loop = None
+
+    def add(self, packet):
+        """ Add a received packet.
+
+        Args:
+            packet : A Packet instance
+
+        Returns:
+            A Packet holding the complete data, if 'packet' completes a sequence,
+            or None if the sequence is still incomplete (or the packet was dropped).
+
+            An unsegmented packet (both SEQ_FLAG_FIRST and SEQ_FLAG_LAST) is
+            returned as-is.
+        """
+
+        first = packet.seq_flags & Packet.SEQ_FLAG_FIRST
+        last = packet.seq_flags & Packet.SEQ_FLAG_LAST
+        if first and last:
+            return packet
+
+        now = self.clock()
+        self.evict_stale(now)
+
+        key = (packet.src_node, packet.service, packet.pkt_id)
+        transfer = self.transfers.get(key)
+
+        if first:
+            # Start a new sequence, abandoning any that was in progress
+            transfer = _Transfer(packet, Reassembler.INITIAL_CAPACITY)
+            self.transfers[key] = transfer
+        elif transfer is None:
+            if Reassembler.DEBUG: print("Dropped packet: no sequence in progress")
+            self.dropped = self.dropped + 1
+            return None
+        elif packet.seq_count != (transfer.seq_count + 1) & Packet.SEQ_COUNT_MASK:
+            if Reassembler.DEBUG: print("Dropped sequence: gap in seq_count")
+            del self.transfers[key]
+            self.dropped = self.dropped + 1
+            return None
+
+        if packet.data_len > (len(packet.data) if packet.data is not None else 0):
+            if Reassembler.DEBUG: print("Dropped sequence: packet shorter than data_len")
+            self.transfers.pop(key, None)
+            self.dropped = self.dropped + 1
+            return None
+
+        transfer.append(packet, now)
+
+        if not last:
+            self._start_evict_timer()
+            return None
+
+        del self.transfers[key]
+        self.completed = self.completed + 1
+        return transfer.packet()
+
+    def evict_stale(self, now=None):
+        """ Discard incomplete sequences that have not progressed within the timeout.
+
+        Args:
+            now : current time in seconds (defaults to the clock)
+        """
+
+        if now is None:
+            now = self.clock()
+
+        for key in [k for (k, t) in self.transfers.items() if now - t.updated >= self.timeout]:
+            if Reassembler.DEBUG: print("Evicted stale sequence %s" % repr(key))
+            del self.transfers[key]
+            self.evicted = self.evicted + 1
+
+    def _start_evict_timer(self):
+        if self.loop is not None and self._evict_timer is None and self.transfers:
+            oldest = min(t.updated for t in self.transfers.values())
+            self._evict_timer = self.loop.call_at(oldest + self.timeout, self._on_evict_timer)
+
+    def _on_evict_timer(self):
+        self._evict_timer = None
+        self.evict_stale()
+        self._start_evict_timer()
+
+
+class _Transfer(object):
+    """ A sequence of packets that is being reassembled. """
+
+    __slots__ = ('header', 'seq_count', 'buf', 'length', 'updated')
+
+    def __init__(self, first, capacity):
+        self.header = first.clone_header()
+        self.seq_count = first.seq_count
+        self.buf = bytearray(capacity)
+        self.length = 0
+        self.updated = 0
+
+    def append(self, packet, now):
+        """ Copy the packet's data onto the end of the buffer. """
+
+        end = self.length + packet.data_len
+        if end > len(self.buf):
+            # Grow geometrically, so that appending is amortized linear
+            self.buf.extend(bytearray(max(end, 2 * len(self.buf)) - len(self.buf)))
+        if packet.data_len > 0:
+            self.buf[self.length:end] = packet.data
+        self.length = end
+        self.seq_count = packet.seq_count
+        self.updated = now
+
+    def packet(self):
+        """ Return the complete data as a single (unsegmented) packet. """
+
+        p = self.header
+        p.seq_flags = Packet.SEQ_FLAG_FIRST | Packet.SEQ_FLAG_LAST
+        p.data = memoryview(self.buf)[0:self.length]
+        p.data_len = self.length
+        return p
+
+
 class Agent:
     """ Receive and process traffic on Supernova bus.
 
@@ -26,6 +213,14 @@ class Agent:
         payload_id : The payload ID for this agent.
                 Each payload ID has a very specific role.  See the Supernova spec.
                 This should be set appropriately by the caller.
+        reassembled_services : Names of the services whose packet sequences are
+                reassembled before being passed to the handler, so the handler
+                sees a single packet with the complete data.
+        reassembler : The Reassembler used for those services.
+        loop : The EventLoop the agent is attached to, or None if it is
+                run with run().
+        checksum_errors : Number of received packets dropped because their
+                checksum did not match.
     """
 
     TIMEOUT = 300 # seconds
@@ -39,6 +234,17 @@ class Agent:
 
         self.payload_id = Supernova.get_my_id()
         self.service_sock = {}
+        self.service_by_fd = {}
+
+        # EventLoop the agent is attached to, if any
+        self.loop = None
+
+        # Number of received packets dropped for a bad checksum
+        self.checksum_errors = 0
+
+        # Receive buffer, reused for every packet
+        self.recv_buf = bytearray(Packet.PACKET_SIZE)
+        self.recv_view = memoryview(self.recv_buf)
 
         # Service handler functions.
         # Map of service name to method.
@@ -54,6 +260,10 @@ class Agent:
             "Time"              : Agent.do_nothing,
         }
 
+        # Services whose packet sequences are reassembled before dispatch.
+        self.reassembled_services = set([ "Data Upload" ])
+        self.reassembler = Reassembler()
+
 
     @staticmethod
     def do_nothing(packet):
@@ -94,18 +304,22 @@ class Agent:
             tp.printout()
         else:
             print("=== Begin ===")
-            print(packet.data)
+            print(bytearray(packet.data or b""))
             print("===  End  ===")
 
     def bind_udp_sockets(self):
         """ Bind UDP sockets to appropriate ports
 
         Effects:
-            self.supernova_sock : set to a dict of interface names -> socket instances
+            self.service_sock : set to a dict of service names -> socket instances
+            self.service_by_fd : set to a dict of socket file descriptors -> service names
         """
 
         for i in Supernova.SERVICES:
             self.service_sock[i] = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            # Reads must not block, so that each socket can be drained completely.
+            self.service_sock[i].setblocking(0)
+            self.service_by_fd[self.service_sock[i].fileno()] = i
 
             try:
                 self.service_sock[i].bind((Supernova.payload_ip(self.payload_id),
@@ -123,7 +337,13 @@ class Agent:
         """
 
         for i in Supernova.SERVICES:
+            if self.loop is not None:
+                self.loop.remove_reader(self.service_sock[i])
             self.service_sock[i].close()
+        self.service_by_fd = {}
+        if self.loop is not None:
+            self.reassembler.detach()
+        self.loop = None
 
 
     def run(self):
@@ -133,38 +353,106 @@ class Agent:
             the destination service (as determined by which port it was sent to), look
             up a method in the self.service_handler map and pass it to that method.
 
+        Each readable socket is drained of all waiting packets before waiting
+            again.  Packets are received into a single reused buffer, and the
+            packet data passed to handlers is a view into that buffer.  It is
+            only valid until the handler returns; a handler must copy any data
+            that it keeps.
+
         This method will continue forever.
 
         Precondition:
-            self.supernova_sock should contain a set of bound sockets (e.g. by
+            self.service_sock should contain a set of bound sockets (e.g. by
                 calling bind_udp_sockets first)
         """
 
         if Agent.DEBUG: print("Running main loop")
 
+        socks = list(self.service_sock.values())
+
         while True:
             # Select function monitors all inputs and waits the specified timeoue period. Once a port is readable (has data to read) it is returned in the readable array.
-            readable, writable, exceptional = select.select(self.service_sock.values(), [], [], Agent.TIMEOUT)
-            if readable != []:
-                # Read each port with data available
-                for sock in readable:
-                    data, addr = sock.recvfrom(Packet.PACKET_SIZE)
-
-                    # Deconstruct packets to retrieve header data and packet data
-                    packet = Packet()
-                    packet.deserialize(data)
-
-                    # Parse data based on packet type and service
-                    if packet.ack == 1:
-                        # If packet is an ACK packet, data is parsed the same regardless of port
-                        ack = AckPacket(packet)
-                        if Agent.DEBUG: print("Received an ack")
-                    else:
-                        for i in Supernova.SERVICES:
-                            if sock == self.service_sock[i]:
-                                if Agent.DEBUG: print("Received a packet: "+i)
-                                self.service_handler[i](packet)
+            readable, writable, exceptional = select.select(socks, [], [], Agent.TIMEOUT)
+
+            # Read each port with data available, until it has no more
+            for sock in readable:
+                self.read_socket(sock)
 
             # Timeout condition
             if readable == []:
-                print('\nTimed out at ' + str(timeout) + ' seconds')
+                print('\nTimed out at ' + str(Agent.TIMEOUT) + ' seconds')
+
+
+    def attach(self, loop):
+        """ Receive and process incoming packets on an EventLoop
+
+        This is the alternative to run() for programs that share one thread
+            between the agent and other work (timers, the flight state machine).
+            Packets are processed as in run().  In addition, a handler may be a
+            generator function; the generator it returns is run as a coroutine
+            on the loop (see EventLoop.spawn).  A coroutine handler must copy
+            any packet data it needs before its first yield.
+
+        Args:
+            loop : an EventLoop instance
+
+        Precondition:
+            self.service_sock should contain a set of bound sockets (e.g. by
+                calling bind_udp_sockets first)
+        """
+
+        self.loop = loop
+        for sock in self.service_sock.values():
+            loop.add_reader(sock, functools.partial(self.read_socket, sock))
+        self.reassembler.attach(loop)
+
+
+    def read_socket(self, sock):
+        """ Process every packet waiting on one of the service sockets. """
+
+        service = self.service_by_fd[sock.fileno()]
+        buf = self.recv_buf
+        view = self.recv_view
+        while True:
+            try:
+                nbytes, addr = sock.recvfrom_into(buf)
+            except socket.error as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return
+                raise
+            self.handle_frame(service, view[0:nbytes])
+
+
+    def handle_frame(self, service, frame):
+        """ Process one received frame
+
+        Args:
+            service : name of the service it was received on
+            frame : bytes, bytearray or memoryview of the serialized packet
+        """
+
+        # Deconstruct packets to retrieve header data and packet data
+        # (without copying the packet data out of the received frame)
+        packet = Packet()
+        try:
+            packet.deserialize(frame, verify=True)
+        except ChecksumError as e:
+            self.checksum_errors = self.checksum_errors + 1
+            if Agent.DEBUG: print("Dropped a packet: " + str(e))
+            return
+
+        # Parse data based on packet type and service
+        if packet.ack == 1:
+            # If packet is an ACK packet, data is parsed the same regardless of port
+            ack = AckPacket(packet)
+            if Agent.DEBUG: print("Received an ack")
+            return
+
+        if Agent.DEBUG: print("Received a packet: "+service)
+        if service in self.reassembled_services:
+            packet = self.reassembler.add(packet)
+            if packet is None:
+                return # Sequence is not yet complete
+        rsl = self.service_handler[service](packet)
+        if self.loop is not None and EventLoop.is_coroutine(rsl):
+            self.loop.spawn(rsl)
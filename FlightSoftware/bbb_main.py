@@ -6,66 +6,205 @@ Main entry point for BBB flight software.
 Copyright SpaceVR, 2017.  All rights reserved.
 """
 
+import os
 import sys
 import time
-import threading
 from local_enum import Enum
 
 from agent import Agent
+from event_loop import EventLoop
+from spacepacket import TelemetryPacket
 from payload_cmd_handler import PayloadCommandHandler
+from payload_cmd_defs import PayloadCommandId
 from hardware import Hardware
-from flight_sm import State,Transitions
-from stats import Stats
+from flight_sm import State,Action,StateMachine
+from state_journal import StateJournal
+from coalescing_queue import CoalescingQueue
 
 # Assert Python 2.7
 assert sys.version_info[0:2] == (2,7)
 
 class BbbSoftware:
 
-    # Timeout after waiting for any network event
+    # Interval between runs of the flight state machine while the current
+    # state has conditions that don't declare their inputs
     MAIN_LOOP_TIMEOUT = 1.0 # seconds
 
-    def __init__(self):
+    # Where the flight state is kept across reboots
+    JOURNAL_PATH = os.environ.get("BBB_STATE_JOURNAL",
+                                  os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                               "bbb_state.journal"))
+
+    # Maximum number of telemetry frames (of different packet types)
+    # waiting to be decoded
+    TELEMETRY_QUEUE_SIZE = 32
+
+    def __init__(self, journal_path=None):
         self.agent = None
         self.payload_cmds = None
 
-        # Event object to wake the flight control loop
-        self.event = threading.Event()
+        # Event loop shared by the Supernova bus agent and the flight control loop
+        self.loop = EventLoop()
+        self.next_step = None
+        self.agent_errors = 0
+
+        # Received telemetry frames, newest per packet type, waiting to be
+        # decoded by decode_telemetry()
+        self.telemetry_queue = CoalescingQueue(BbbSoftware.TELEMETRY_QUEUE_SIZE)
+        self.decode_pending = False
 
         # Initialize components of state machine
         self.hardware = Hardware()
+        Action.HARDWARE = self.hardware
+
+        # Resume from the journal, after a reboot: the state, the number of
+        # each command received, and the time the software first started
+        # (which mission times are measured from)
+        self.journal = StateJournal(journal_path or BbbSoftware.JOURNAL_PATH)
+        if self.journal.get("start_time") is None:
+            self.journal.record({"start_time": self.hardware.start_time}, sync=True)
+        self.hardware.start_time = self.journal.get("start_time")
+        self.command_counts = self.journal.get("command_counts", {})
 
         # Initialize state
-        self.state = State.INITIAL
+        self.state_machine = StateMachine(self.journal.get("state", State.INITIAL))
+        self.state = self.state_machine.state
 
-        # Initialize stats
-        self.stats = Stats()
+        # Telemetry items (watched by the state machine) that changed since
+        # it last ran, and their latest values
+        self.changed_telemetry = set()
+        self.watched_values = {}
 
     def on_telemetry(self, packet):
-        # Decode as telemetry packet
-        tp = TelemetryPacket(packet)
-        tp.deserialize()
-        # Update newest data
-        self.hardware.telemetry = tp
-        # Wake the main control thread
-        self.event.set()
-
-    def thread_agent(self):
         """
-        This is the entry point for the thread that handles
-        all communication with the Supernova bus.
-        It communicates back to the main ConnOps loop via
-        multithreaded Event objects.
+        Queue a received telemetry packet for decoding.
+
+        This runs while the agent drains its sockets, so it only copies the
+        packet data (which is a view of the agent's receive buffer).  If a
+        packet of the same type is still waiting, it is replaced.
         """
+        packet.data = bytearray(packet.data)
+        self.telemetry_queue.put(packet.pkt_id, packet)
+        if not self.decode_pending:
+            self.decode_pending = True
+            self.loop.call_soon(self.decode_telemetry)
+
+    def decode_telemetry(self):
+        """ Decode the queued telemetry packets, and run the flight control loop if needed. """
+        self.decode_pending = False
+        watched = self.state_machine.watched_telemetry()
+
         while True:
-            try:
-                # Set up the command handlers
-                self.agent = Agent()
-                self.agent.service_handler["Telemetry Packet"] = self.on_telemetry
+            entry = self.telemetry_queue.get()
+            if entry is None:
+                break
+
+            # Decode as telemetry packet
+            tp = TelemetryPacket(entry[1])
+            tp.deserialize()
+            # Update newest data
+            self.hardware.record_telemetry(tp)
+
+            for name in watched:
+                if name in tp.values and tp.values[name] != self.watched_values.get(name):
+                    self.watched_values[name] = tp.values[name]
+                    self.changed_telemetry.add(name)
+
+        # Run the flight control loop now, if this affects it
+        if self.changed_telemetry or self.state_machine.polled():
+            self.schedule_step(0)
+
+    def on_payload_command(self, packet):
+        """
+        Dispatch a received payload command to its handler in
+        self.payload_cmds.  Other payload commands are ignored.
+        """
+        handler = self.payload_cmds.get(packet.pkt_id)
+        if handler is not None:
+            handler(packet)
+
+    def on_go_command(self, packet):
+        """ Handle a GO payload command. """
+        self.on_command("GO")
+
+    def on_command(self, name):
+        """ Pass a received command to the state machine. """
+        self.command_counts[name] = self.command_counts.get(name, 0) + 1
+        self.journal.record({"command_counts": self.command_counts})
+        self.state_machine.command(name)
+        self.schedule_step(0)
+
+    def schedule_step(self, delay):
+        """ (Re)schedule the next run of the flight state machine.
+        None cancels it. """
+        if self.next_step is not None:
+            self.next_step.cancel()
+            self.next_step = None
+        if delay is not None:
+            self.next_step = self.loop.call_later(delay, self.step)
+
+    def step(self):
+        """ Run the flight state machine once. """
+        self.next_step = None
+        # If a condition or action raises, try again after the poll interval
+        # (the exception is passed on to the loop)
+        delay = BbbSoftware.MAIN_LOOP_TIMEOUT
+        try:
+            changed = self.state_machine.step(self.changed_telemetry)
+            self.changed_telemetry = set()
+            self.state = self.state_machine.state
+
+            if changed:
+                # Don't repeat the transition's action after a reboot
+                self.journal.record({"state": self.state}, sync=True)
+                # Evaluate the new state straight away
+                delay = 0
+                return
+
+            # Otherwise, wait for telemetry or a command, or until the next
+            # time a condition becomes true
+            delay = None
+            if self.state_machine.polled():
+                delay = BbbSoftware.MAIN_LOOP_TIMEOUT
+            wake_time = self.state_machine.wake_time()
+            if wake_time is not None:
+                wake_delay = wake_time - self.hardware.time()
+                if delay is None or wake_delay < delay:
+                    delay = wake_delay
+        finally:
+            self.schedule_step(delay)
+
+    def start_agent(self):
+        """
+        Set up communication with the Supernova bus.
+        Packets are handled on the same event loop as the
+        flight control loop.
+        """
+        # Set up the command handlers
+        self.agent = Agent()
+        self.agent.service_handler["Telemetry Packet"] = self.on_telemetry
+        self.agent.service_handler["Telemetry Stream"] = self.on_telemetry
+
+        # Commands for the flight state machine.  (Only these: the payload
+        # board's shell and echo handlers would block the loop.)
+        self.payload_cmds = {
+            PayloadCommandId.GO : self.on_go_command,
+        }
+        self.agent.service_handler["Payload Command"] = self.on_payload_command
+
+        self.agent.bind_udp_sockets()
+        self.agent.attach(self.loop)
 
-                # Run
-                self.agent.bind_udp_sockets()
-                self.agent.run() # should never exit
+    def main(self):
+        self.start_agent()
+        self.journal.attach(self.loop)
+        # Timed hardware command sequences also run on the loop
+        self.hardware.scheduler.attach(self.loop)
+        self.schedule_step(0)
+
+        while True:
+            try:
+                self.loop.run_forever() # should never exit
 
             except Exception as ex:
                 # NOTE: It is an error to ever reach this line.
@@ -75,17 +214,6 @@ class BbbSoftware:
             # NOTE: It is an error to ever reach this line.
             self.agent_errors = self.agent_errors + 1
 
-    def main(self):
-        # Launch the thread that communicates with the Supernova bus.
-        agent_thread = threading.Thread(target=self.thread_agent)
-        agent_thread.daemon = True
-        agent_thread.start()
-
-        # Run the flight state machine program
-        while True:
-            self.event.wait(BbbSoftware.MAIN_LOOP_TIMEOUT)
-            self.state = Transitions.next(self.state)
-
 
 if __name__ == "__main__":
     BbbSoftware().main()
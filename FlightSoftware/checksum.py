@@ -0,0 +1,78 @@
+"""
+Checksum module
+
+The 16-bit additive checksum used by Supernova space packets and by
+MAI-400 ADACS commands: the sum of all bytes, modulo 2**16.
+
+Copyright SpaceVR, 2017.  All rights reserved.
+"""
+
+import sys
+import struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Assert Python 2.7
+assert sys.version_info[0:2] == (2,7)
+
+# Buffers at least this long are summed with NumPy (when available);
+# below it, the call overhead outweighs the faster summation.
+NUMPY_THRESHOLD = 256 # bytes
+
+class ChecksumError(ValueError):
+    """ A received checksum does not match the data. """
+    pass
+
+def checksum16(buf, start=0, end=None):
+    """ Return the 16-bit additive checksum of buf[start:end].
+
+    Args:
+        buf : bytes, bytearray or memoryview
+        start, end : range of bytes to sum (defaults to all of buf)
+
+    The bytes are summed in place; none of buf is copied.
+    """
+
+    return 0xFFFF & _sum(buf, start, len(buf) if end is None else end)
+
+def _sum(buf, start, end):
+    """ Return the (unbounded) sum of the bytes buf[start:end]. """
+
+    if isinstance(buf, memoryview):
+        # (numpy.frombuffer rejects a Python 2 memoryview, but asarray
+        # wraps it without copying.)
+        (start, end, step) = slice(start, end).indices(len(buf))
+        if end <= start:
+            return 0
+        if numpy is not None and end - start >= NUMPY_THRESHOLD:
+            return int(numpy.asarray(buf)[start:end].sum(dtype=numpy.uint64))
+        return sum(struct.unpack_from('%dB' % (end - start), buf, start))
+    if numpy is not None and end - start >= NUMPY_THRESHOLD:
+        return int(numpy.frombuffer(buf, numpy.uint8, end - start, start).sum(dtype=numpy.uint64))
+    if isinstance(buf, bytearray):
+        return sum(buf[start:end])
+    return sum(bytearray(buf[start:end]))
+
+class Checksum16(object):
+    """ Incremental 16-bit additive checksum.
+
+    Feed the data in any number of pieces with update(); 'value' is the
+    checksum of everything so far.  This allows a checksum to be computed
+    while data is streamed, without collecting it in one buffer.
+    """
+
+    __slots__ = ('value',)
+
+    def __init__(self, buf=None):
+        self.value = 0
+        if buf is not None:
+            self.update(buf)
+
+    def update(self, buf, start=0, end=None):
+        """ Add buf[start:end] to the checksum. """
+
+        self.value = 0xFFFF & (self.value + _sum(buf, start, len(buf) if end is None else end))
+        return self
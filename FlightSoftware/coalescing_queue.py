@@ -0,0 +1,95 @@
+"""
+Coalescing queue module
+
+A bounded queue between one producer and one consumer that keeps only the
+newest item for each key, e.g. the newest telemetry frame of each packet
+type.  When the consumer falls behind, older items are dropped (and
+counted) rather than piling up.
+
+Copyright SpaceVR, 2017.  All rights reserved.
+"""
+
+import sys
+from collections import deque
+
+# Assert Python 2.7
+assert sys.version_info[0:2] == (2,7)
+
+class CoalescingQueue(object):
+    """ Bounded queue with latest-value coalescing.
+
+    Keys are taken in the order they were first queued.  Putting an item
+    whose key is already queued replaces that item, without changing its
+    place in the queue.  Putting an item with a new key when the queue is
+    full drops the oldest queued item.
+
+    Not thread-safe: the producer and consumer are expected to share a
+    thread (e.g. an EventLoop).
+
+    Properties:
+        capacity : maximum number of queued keys
+        received : number of items put
+        coalesced : number of items replaced by a newer item with the same key
+        overflowed : number of items dropped because the queue was full
+    """
+
+    def __init__(self, capacity):
+        """ Construct a CoalescingQueue
+
+        Args:
+            capacity : maximum number of queued keys
+        """
+
+        self.capacity = capacity
+        self.received = 0
+        self.coalesced = 0
+        self.overflowed = 0
+
+        # Queued keys, oldest first, and the newest item for each
+        self._order = deque()
+        self._latest = {}
+
+    def __len__(self):
+        return len(self._order)
+
+    @property
+    def dropped(self):
+        """ Total number of items that were dropped without being taken. """
+        return self.coalesced + self.overflowed
+
+    def put(self, key, item):
+        """ Queue an item.
+
+        Returns:
+            True if an older item was dropped to make room for it
+        """
+
+        self.received = self.received + 1
+        if key in self._latest:
+            self._latest[key] = item
+            self.coalesced = self.coalesced + 1
+            return True
+
+        dropped = False
+        if len(self._order) >= self.capacity:
+            del self._latest[self._order.popleft()]
+            self.overflowed = self.overflowed + 1
+            dropped = True
+
+        self._order.append(key)
+        self._latest[key] = item
+        return dropped
+
+    def get(self):
+        """ Take the oldest queued (key, item), or return None if the queue is empty. """
+
+        if not self._order:
+            return None
+        key = self._order.popleft()
+        return (key, self._latest.pop(key))
+
+    def clear(self):
+        """ Discard all queued items (without counting them as dropped). """
+
+        self._order.clear()
+        self._latest.clear()
@@ -0,0 +1,259 @@
+"""
+Command scheduler module
+
+Runs timed sequences of hardware commands (e.g. the solar panel burn
+sequence) without blocking: each step runs a given delay after the one
+before it, and the caller is notified when the whole sequence is done.
+
+Copyright SpaceVR, 2017.  All rights reserved.
+"""
+
+import sys
+import math
+import time
+from collections import deque
+
+from event_loop import Timer
+
+# Assert Python 2.7
+assert sys.version_info[0:2] == (2,7)
+
+# --- Sequence timings (shared by Hardware and HardwareMock)
+
+# Delay between the commands for successive solar panels
+SOLAR_PANEL_INTERVAL = 0.1 # seconds
+
+
+class TimerWheel(object):
+    """ Hashed timer wheel.
+
+    Time is divided into ticks of 'resolution' seconds, and each timer is
+    put in the slot for its tick (modulo the number of slots), so adding a
+    timer and finding the due ones are both constant time.  Timers run on
+    the first advance() at or after their time (rounded up to a whole tick),
+    in time order.
+
+    Properties:
+        resolution : length of a tick, in seconds
+    """
+
+    def __init__(self, resolution, num_slots=256, now=0.0):
+        """ Construct a TimerWheel
+
+        Args:
+            resolution : length of a tick, in seconds
+            num_slots : number of slots in the wheel
+            now : current time
+        """
+
+        self.resolution = resolution
+        self._slots = [[] for i in range(num_slots)]
+        self._tick = int(now / self.resolution)
+        self._sequence = 0
+        self._count = 0
+
+    def __len__(self):
+        """ Number of timers that haven't run (including cancelled ones). """
+        return self._count
+
+    def _tick_of(self, when):
+        """ The first tick at or after 'when' (allowing for rounding error). """
+        return int(math.ceil(when / self.resolution - 1e-6))
+
+    def add(self, when, callback, *args):
+        """ Call callback(*args) on the first advance() at or after 'when'.
+
+        Returns:
+            a Timer, which can be cancelled
+        """
+
+        timer = Timer(when, callback, args)
+        tick = max(self._tick_of(when), self._tick)
+        self._sequence = self._sequence + 1
+        self._slots[tick % len(self._slots)].append((tick, self._sequence, timer))
+        self._count = self._count + 1
+        return timer
+
+    def advance(self, now):
+        """ Run the timers that are due at time 'now'.
+
+        Returns:
+            the number of timers run
+        """
+
+        target = int(now / self.resolution + 1e-6)
+        if target < self._tick:
+            return 0
+
+        due = []
+        if self._count > 0:
+            # No need to visit a slot more than once.
+            num_slots = len(self._slots)
+            for tick in range(self._tick, self._tick + min(target - self._tick + 1, num_slots)):
+                slot = self._slots[tick % num_slots]
+                if not slot:
+                    continue
+                keep = [entry for entry in slot if entry[0] > target]
+                if len(keep) != len(slot):
+                    due.extend(entry for entry in slot if entry[0] <= target)
+                    slot[:] = keep
+        self._tick = target + 1
+
+        self._count = self._count - len(due)
+        due.sort()
+        run = 0
+        for (tick, sequence, timer) in due:
+            if not timer.cancelled:
+                timer.callback(*timer.args)
+                run = run + 1
+        return run
+
+
+class CommandSequence(object):
+    """ A sequence of timed commands submitted to a CommandScheduler.
+
+    Properties:
+        name : description of the sequence
+        done : True once the sequence has finished (or failed, or was cancelled)
+        cancelled : True if cancel() was called before it finished
+        error : the exception raised by a step, if any (the remaining steps are skipped)
+    """
+
+    __slots__ = ('name', 'steps', 'on_done', 'done', 'cancelled', 'error', '_timer')
+
+    def __init__(self, name, steps, on_done):
+        self.name = name
+        self.steps = deque(steps)
+        self.on_done = on_done
+        self.done = False
+        self.cancelled = False
+        self.error = None
+        self._timer = None
+
+    def cancel(self):
+        """ Skip the remaining steps.  on_done is not called. """
+
+        if not self.done:
+            self.cancelled = True
+            self.done = True
+            if self._timer is not None:
+                self._timer.cancel()
+
+
+class CommandScheduler(object):
+    """ Run timed sequences of commands.
+
+    A sequence is a list of (delay, function, args) steps: each function is
+    called 'delay' seconds after the previous step (or after the sequence
+    is submitted, for the first step).  When the last step has run,
+    on_done(sequence) is called.
+
+    Steps are kept in a TimerWheel.  When the scheduler is attached to an
+    EventLoop, the wheel is advanced by a loop timer, every tick while
+    there are steps pending, so sequences run alongside the other work on
+    the loop.  Otherwise, run() advances it until all sequences are done.
+
+    Properties:
+        clock : function returning the current time in seconds
+        resolution : interval between ticks, in seconds
+        loop : the EventLoop the scheduler is attached to, or None
+    """
+
+    # Length of a tick of the wheel
+    RESOLUTION = 0.01 # seconds
+
+    def __init__(self, clock=time.time, resolution=None):
+        """ Construct a CommandScheduler
+
+        Args:
+            clock : function returning the current time in seconds
+            resolution : length of a tick (defaults to CommandScheduler.RESOLUTION)
+        """
+
+        self.clock = clock
+        self.resolution = CommandScheduler.RESOLUTION if resolution is None else resolution
+        self.loop = None
+        self._wheel = TimerWheel(self.resolution, now=clock())
+        self._tick_timer = None
+
+    def attach(self, loop):
+        """ Advance the scheduler from an EventLoop, using the loop's clock. """
+
+        self.loop = loop
+        self.clock = loop.clock
+        self._start_ticking()
+
+    @property
+    def pending(self):
+        """ True if any steps are waiting to run. """
+        return len(self._wheel) > 0
+
+    def submit(self, steps, on_done=None, name=None):
+        """ Start a sequence of commands.
+
+        Args:
+            steps : list of (delay in seconds, function, args tuple)
+            on_done : function called with the CommandSequence when it finishes
+            name : description of the sequence
+
+        Returns:
+            the CommandSequence
+        """
+
+        sequence = CommandSequence(name, steps, on_done)
+        self._schedule_step(sequence, self.clock())
+        return sequence
+
+    def _schedule_step(self, sequence, now):
+        if not sequence.steps:
+            sequence.done = True
+            if sequence.on_done is not None:
+                sequence.on_done(sequence)
+            return
+
+        delay = sequence.steps[0][0]
+        sequence._timer = self._wheel.add(now + delay, self._run_step, sequence)
+        self._start_ticking()
+
+    def _run_step(self, sequence):
+        (delay, function, args) = sequence.steps.popleft()
+        try:
+            function(*args)
+        except Exception as ex:
+            sequence.error = ex
+            sequence.steps.clear()
+        self._schedule_step(sequence, self.clock())
+
+    def tick(self):
+        """ Run the steps that are due now. """
+
+        self._wheel.advance(self.clock())
+
+    def run(self, timeout=None):
+        """ Run steps, sleeping between them, until no steps are pending.
+
+        For use when the scheduler isn't attached to an EventLoop.
+
+        Args:
+            timeout : maximum number of seconds to run (None for no limit)
+
+        Returns:
+            True if all sequences finished
+        """
+
+        deadline = None if timeout is None else self.clock() + timeout
+        while self.pending:
+            if deadline is not None and self.clock() >= deadline:
+                return False
+            time.sleep(self.resolution)
+            self.tick()
+        return True
+
+    def _start_ticking(self):
+        if self.loop is not None and self._tick_timer is None and self.pending:
+            self._tick_timer = self.loop.call_later(self.resolution, self._on_tick)
+
+    def _on_tick(self):
+        self._tick_timer = None
+        self.tick()
+        self._start_ticking()
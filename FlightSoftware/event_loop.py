@@ -0,0 +1,227 @@
+"""
+Event loop module
+
+A single-threaded event loop that multiplexes socket reads and timers,
+so that the agent, the flight state machine and periodic work can share
+one thread.
+
+Copyright SpaceVR, 2017.  All rights reserved.
+"""
+
+import sys
+import time
+import types
+import heapq
+import select
+from collections import deque
+
+# Assert Python 2.7
+assert sys.version_info[0:2] == (2,7)
+
+class Timer(object):
+    """ A callback scheduled on an EventLoop.
+
+    Returned by EventLoop.call_soon / call_later / call_at so that it can
+    be cancelled before it runs.
+    """
+
+    __slots__ = ('when', 'callback', 'args', 'cancelled')
+
+    def __init__(self, when, callback, args):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        """ Prevent the callback from running. """
+        self.cancelled = True
+
+
+class EventLoop(object):
+    """ Run callbacks when sockets become readable or timers expire.
+
+    Readiness is polled with epoll where it is available (Linux), and with
+    select otherwise.  Timers are kept in a heap, so the loop sleeps exactly
+    until the next timer is due (or a socket becomes readable).
+
+    Coroutines are plain generators: each value they yield is a delay in
+    seconds (None meaning "as soon as possible") after which the loop
+    resumes them.  See spawn().
+
+    Callbacks run on the loop's thread, one at a time.  An exception raised
+    by a callback propagates out of run_forever() / run_once().
+
+    Properties:
+        clock : function returning the current time in seconds
+    """
+
+    def __init__(self, clock=time.time):
+        """ Construct an EventLoop
+
+        Args:
+            clock : function returning the current time in seconds
+        """
+
+        self.clock = clock
+
+        # Map of file descriptor -> callback
+        self._readers = {}
+
+        # Heap of (when, sequence number, Timer)
+        self._timers = []
+        self._sequence = 0
+
+        # Timers that are due now
+        self._ready = deque()
+
+        self._running = False
+
+        if hasattr(select, "epoll"):
+            self._epoll = select.epoll()
+        else:
+            self._epoll = None
+
+    def add_reader(self, fileobj, callback):
+        """ Call callback() whenever fileobj is readable.
+
+        Args:
+            fileobj : a socket (or anything with a fileno() method)
+            callback : function of no arguments
+        """
+
+        fd = fileobj.fileno()
+        if self._epoll is not None:
+            if fd in self._readers:
+                self._epoll.modify(fd, select.EPOLLIN)
+            else:
+                self._epoll.register(fd, select.EPOLLIN)
+        self._readers[fd] = callback
+
+    def remove_reader(self, fileobj):
+        """ Stop watching fileobj.  Returns True if it was being watched. """
+
+        fd = fileobj.fileno()
+        if fd not in self._readers:
+            return False
+        del self._readers[fd]
+        if self._epoll is not None:
+            self._epoll.unregister(fd)
+        return True
+
+    def call_soon(self, callback, *args):
+        """ Call callback(*args) on the next iteration of the loop. """
+
+        timer = Timer(None, callback, args)
+        self._ready.append(timer)
+        return timer
+
+    def call_later(self, delay, callback, *args):
+        """ Call callback(*args) after 'delay' seconds. """
+
+        return self.call_at(self.clock() + delay, callback, *args)
+
+    def call_at(self, when, callback, *args):
+        """ Call callback(*args) at time 'when' (in terms of self.clock). """
+
+        timer = Timer(when, callback, args)
+        self._sequence = self._sequence + 1
+        heapq.heappush(self._timers, (when, self._sequence, timer))
+        return timer
+
+    def spawn(self, coroutine):
+        """ Run a generator as a coroutine on this loop.
+
+        The generator is first resumed on the next iteration of the loop.
+        Each value it yields is the number of seconds to wait before it is
+        resumed again (None to resume on the next iteration).
+
+        Args:
+            coroutine : a generator
+        """
+
+        return self.call_soon(self._step, coroutine)
+
+    def _step(self, coroutine):
+        try:
+            delay = next(coroutine)
+        except StopIteration:
+            return
+        if delay is None:
+            self.call_soon(self._step, coroutine)
+        else:
+            self.call_later(delay, self._step, coroutine)
+
+    def run_once(self, timeout=None):
+        """ Wait for and process one round of events.
+
+        Args:
+            timeout : maximum number of seconds to wait for an event
+                (None to wait until the next timer, or forever if there is none)
+        """
+
+        # Don't wait if something is already due.
+        if self._ready:
+            timeout = 0
+        elif self._timers:
+            due = max(0, self._timers[0][0] - self.clock())
+            if timeout is None or due < timeout:
+                timeout = due
+
+        for fd in self._poll(timeout):
+            callback = self._readers.get(fd)
+            if callback is not None:
+                callback()
+
+        # Move expired timers onto the ready queue.
+        now = self.clock()
+        while self._timers and self._timers[0][0] <= now:
+            self._ready.append(heapq.heappop(self._timers)[2])
+
+        # Only run what is ready now; callbacks scheduled by these run next time.
+        for i in range(len(self._ready)):
+            timer = self._ready.popleft()
+            if not timer.cancelled:
+                timer.callback(*timer.args)
+
+    def _poll(self, timeout):
+        """ Return the file descriptors that are readable. """
+
+        if self._epoll is not None:
+            events = self._epoll.poll(-1 if timeout is None else timeout)
+            return [fd for fd, event in events]
+
+        if not self._readers:
+            # select() with no descriptors isn't portable; just sleep.
+            if timeout is not None: time.sleep(timeout)
+            return []
+        readable, writable, exceptional = select.select(self._readers.keys(), [], [], timeout)
+        return readable
+
+    def run_forever(self):
+        """ Process events until stop() is called. """
+
+        self._running = True
+        while self._running:
+            self.run_once()
+
+    def stop(self):
+        """ Make run_forever() return after the current round of events. """
+
+        self._running = False
+
+    def close(self):
+        """ Release the poll object.  Sockets are not closed. """
+
+        self._readers = {}
+        self._timers = []
+        self._ready.clear()
+        if self._epoll is not None:
+            self._epoll.close()
+            self._epoll = None
+
+    @staticmethod
+    def is_coroutine(obj):
+        """ True if obj is a generator that should be run with spawn(). """
+
+        return isinstance(obj, types.GeneratorType)
@@ -0,0 +1,286 @@
+"""
+Flight state machine simulation module
+
+Runs the flight state machine against HardwareMock over simulated mission
+time.  Rather than ticking, the simulated clock jumps straight to the next
+event: a telemetry change, a received command, a time a condition is
+waiting for, or a step of a hardware command sequence.  So hours of mission
+time take milliseconds to run.
+
+Each timeline is randomized from a seed.  Many timelines can be run in
+parallel worker processes, and the results merged into a SimulationReport.
+
+Copyright SpaceVR, 2017.  All rights reserved.
+"""
+
+import sys
+import random
+import multiprocessing
+
+from flight_sm import State, Action, StateMachine
+from hardware_mock import HardwareMock
+from spacepacket import Packet
+from pumpkin.core_cmd_tlm import TLM
+
+# Assert Python 2.7
+assert sys.version_info[0:2] == (2,7)
+
+class SimulatedTelemetry(object):
+    """ Stands in for a summary TelemetryPacket; only its values are used. """
+
+    __slots__ = ('base', 'values')
+
+    def __init__(self, values):
+        self.base = Packet()
+        self.base.pkt_id = TLM.id_by_name["TLMITEM_1_PL"]
+        self.values = values
+
+
+class Simulation(object):
+    """ One randomized timeline of the flight state machine.
+
+    Events are generated as Poisson processes: telemetry arrives on average
+    every 'telemetry_interval' seconds, with each item in 'telemetry_ranges'
+    drawn uniformly from its range, and each command in 'commands' arrives on
+    average every 'command_interval' seconds.
+
+    The state machine uses the transition table that is compiled in flight_sm
+    (see Transitions.compile).
+    """
+
+    # Interval between steps while the current state has conditions that
+    # don't declare their inputs.  (As BbbSoftware.MAIN_LOOP_TIMEOUT.)
+    POLL_INTERVAL = 1.0 # seconds
+
+    # Transitions that may happen without simulated time passing before the
+    # timeline is counted as stuck in a livelock.  The clock then moves on
+    # to the next event.
+    MAX_STEPS_PER_EVENT = 100
+
+    def __init__(self, duration, seed=None, initial_state=State.INITIAL,
+                 telemetry_interval=60.0, telemetry_ranges=None,
+                 command_interval=600.0, commands=("GO",)):
+        """ Construct a Simulation
+
+        Args:
+            duration : simulated mission time, in seconds
+            seed : random seed (None for a random timeline)
+            initial_state : state to start in
+            telemetry_interval : mean time between telemetry packets, in seconds
+            telemetry_ranges : dict of telemetry item name -> (low, high)
+            command_interval : mean time between each kind of command, in seconds
+            commands : names of the commands that may be received
+        """
+
+        self.duration = duration
+        self.seed = seed
+        self.initial_state = initial_state
+        self.telemetry_interval = telemetry_interval
+        self.telemetry_ranges = telemetry_ranges or {}
+        self.command_interval = command_interval
+        self.commands = commands
+
+    def run(self):
+        """ Run the timeline.
+
+        Returns:
+            dict of
+                time_in_state : dict of state -> seconds spent in it
+                visits : dict of state -> number of times it was entered
+                transitions : number of transitions
+                livelocks : number of times MAX_STEPS_PER_EVENT was reached
+                events : number of events processed
+                final_state : state at the end
+        """
+
+        rng = random.Random(self.seed)
+        hw = HardwareMock()
+        hw.verbose = False
+        previous_hardware = Action.HARDWARE
+        Action.HARDWARE = hw
+
+        try:
+            return self._run(rng, hw)
+        finally:
+            Action.HARDWARE = previous_hardware
+
+    def _next_time(self, rng, now, interval):
+        return now + rng.expovariate(1.0 / interval) if interval else None
+
+    def _run(self, rng, hw):
+        sm = StateMachine(self.initial_state)
+        time_in_state = {sm.state: 0}
+        visits = {sm.state: 1}
+        transitions = 0
+        livelocks = 0
+        events = 0
+
+        entered_at = hw.time()
+        # (Telemetry without any items can't change anything.)
+        next_telemetry = None
+        if self.telemetry_ranges:
+            next_telemetry = self._next_time(rng, hw.time(), self.telemetry_interval)
+        next_commands = dict((name, self._next_time(rng, hw.time(), self.command_interval))
+                             for name in self.commands)
+        changed = set()
+
+        while True:
+            # Run the state machine until it settles
+            steps = 0
+            while sm.step(changed):
+                changed = set()
+                time_in_state[sm.state] = time_in_state.get(sm.state, 0)
+                transitions = transitions + 1
+                visits[sm.state] = visits.get(sm.state, 0) + 1
+                steps = steps + 1
+                if steps >= Simulation.MAX_STEPS_PER_EVENT:
+                    livelocks = livelocks + 1
+                    break
+            changed = set()
+
+            # The state entered last is the one time is spent in.
+            # (States passed through without time passing get 0.)
+            state = sm.state
+
+            # Jump to the next event
+            now = hw.time()
+            candidates = [next_telemetry] + list(next_commands.values())
+            wake_time = sm.wake_time()
+            candidates.append(wake_time)
+            if sm.polled() or steps >= Simulation.MAX_STEPS_PER_EVENT:
+                candidates.append(now + Simulation.POLL_INTERVAL)
+            if hw.scheduler.pending:
+                candidates.append(now + hw.scheduler.resolution)
+            candidates = [t for t in candidates if t is not None]
+            when = min(candidates) if candidates else self.duration
+            if when >= self.duration:
+                when = self.duration
+
+            time_in_state[state] = time_in_state.get(state, 0) + (when - entered_at)
+            entered_at = when
+            hw.advance_time(when - now)
+            if when >= self.duration:
+                break
+            events = events + 1
+
+            if next_telemetry is not None and next_telemetry <= when:
+                values = dict((name, rng.uniform(low, high))
+                              for (name, (low, high)) in self.telemetry_ranges.items())
+                hw.record_telemetry(SimulatedTelemetry(values))
+                changed.update(values)
+                next_telemetry = self._next_time(rng, when, self.telemetry_interval)
+
+            for name, t in next_commands.items():
+                if t is not None and t <= when:
+                    sm.command(name)
+                    next_commands[name] = self._next_time(rng, when, self.command_interval)
+
+        return {
+            "time_in_state": time_in_state,
+            "visits": visits,
+            "transitions": transitions,
+            "livelocks": livelocks,
+            "events": events,
+            "final_state": sm.state,
+        }
+
+
+def run_timeline(args):
+    """ Run one Simulation.  For use by worker processes.
+
+    Args:
+        (seed, options) : seed, and dict of the other Simulation arguments
+    """
+
+    (seed, options) = args
+    return Simulation(seed=seed, **options).run()
+
+
+class SimulationReport(object):
+    """ Results of many simulated timelines, merged.
+
+    Properties:
+        runs : number of timelines
+        visits : dict of state -> number of timelines that entered it
+        time_in_state : dict of state -> list of seconds spent in it, one per
+            timeline that entered it
+        final_states : dict of state -> number of timelines that ended in it
+        transitions, livelocks, events : totals over all timelines
+    """
+
+    def __init__(self):
+        self.runs = 0
+        self.visits = {}
+        self.time_in_state = {}
+        self.final_states = {}
+        self.transitions = 0
+        self.livelocks = 0
+        self.events = 0
+
+    def add(self, result):
+        """ Merge in the result of a Simulation.run(). """
+
+        self.runs = self.runs + 1
+        for state in result["visits"]:
+            self.visits[state] = self.visits.get(state, 0) + 1
+        for state, seconds in result["time_in_state"].items():
+            self.time_in_state.setdefault(state, []).append(seconds)
+        self.final_states[result["final_state"]] = self.final_states.get(result["final_state"], 0) + 1
+        self.transitions = self.transitions + result["transitions"]
+        self.livelocks = self.livelocks + result["livelocks"]
+        self.events = self.events + result["events"]
+
+    def coverage(self):
+        """ Return (covered, not covered) lists of states. """
+
+        covered = [state for state in State.ALL if state in self.visits]
+        return (covered, [state for state in State.ALL if state not in self.visits])
+
+    def histogram(self, state, bins=10):
+        """ Histogram of the time spent in a state, per timeline.
+
+        Returns:
+            list of (low, high, count), one per bin
+        """
+
+        values = self.time_in_state.get(state, [])
+        if not values:
+            return []
+        low, high = min(values), max(values)
+        width = (high - low) / float(bins) or 1.0
+        counts = [0] * bins
+        for value in values:
+            counts[min(int((value - low) / width), bins - 1)] += 1
+        return [(low + i * width, low + (i + 1) * width, counts[i]) for i in range(bins)]
+
+
+def run_many(count, workers=None, seed=0, **options):
+    """ Run many randomized timelines, in parallel worker processes.
+
+    Args:
+        count : number of timelines
+        workers : number of worker processes (defaults to the number of CPUs;
+            0 runs them in this process)
+        seed : seed of the first timeline; the others follow on from it
+        options : the other Simulation arguments
+
+    Returns:
+        a SimulationReport
+    """
+
+    report = SimulationReport()
+    jobs = [(seed + i, options) for i in range(count)]
+
+    if workers == 0:
+        for job in jobs:
+            report.add(run_timeline(job))
+        return report
+
+    pool = multiprocessing.Pool(workers)
+    try:
+        for result in pool.imap_unordered(run_timeline, jobs, chunksize=max(1, count // 64)):
+            report.add(result)
+    finally:
+        pool.close()
+        pool.join()
+    return report
@@ -47,13 +47,48 @@ class State(Enum):
     ERROR
     ) = range(13)
 
+# Map of state -> state name, and all states in order
+State.NAMES = dict((value, name) for (name, value) in vars(State).items()
+                   if name.isupper() and isinstance(value, int))
+State.ALL = tuple(sorted(State.NAMES))
+
+
+def depends(telemetry=(), commands=(), at=None):
+    """
+    Declare the inputs of a condition, so that it is only re-evaluated when
+    one of them changes.  (See StateMachine.)
+
+    Args:
+        telemetry : names of the telemetry data items it reads
+        commands : names of the commands it waits for
+        at : hardware time (see Hardware.time) from which it is true, for a
+            condition on the time alone
+
+    A condition without a declaration is re-evaluated on every step.
+    """
+
+    def declare(condition):
+        condition.telemetry = frozenset(telemetry)
+        condition.commands = frozenset(commands)
+        condition.at = at
+        return condition
+    return declare
+
 
 class Condition:
     """
     All predicates that define state transition conditions.
     """
 
+    # Time after deployment when O1 is clear of the ISS
+    ISS_CLEARANCE_TIME = 1800 # seconds
+
+    # Names of the commands received and not yet acted on.  (Set by
+    # StateMachine.step before the conditions are evaluated.)
+    RECEIVED = frozenset()
+
     @staticmethod
+    @depends()
     def always():
         return True
 
@@ -66,13 +101,18 @@ class Condition:
         return True
 
     @staticmethod
+    @depends(at=ISS_CLEARANCE_TIME)
     def out_of_iss_safety_zone():
-        # Time > 1800s
-        return Action.hw().time() > 1800
+        # Time >= 1800s.  (Inclusive, so that the step woken exactly at
+        # ISS_CLEARANCE_TIME takes the transition.)
+        return Action.hw().time() >= Condition.ISS_CLEARANCE_TIME
 
     @staticmethod
+    @depends(commands=("GO",))
     def received_go_command():
-        return True
+        # True once a GO command has been received, until the transition
+        # that depends on it is taken
+        return "GO" in Condition.RECEIVED
 
 
 class Action:
@@ -176,6 +216,68 @@ class Transitions:
 
     ]
 
+    # Map of state -> tuple of (condition, action, next state), in the order
+    # of ALL.  Built by compile() when this module is imported.
+    BY_STATE = {}
+
+    @staticmethod
+    def compile(transitions=None):
+        """
+        Index a transition table by state, and make it the active one.
+
+        Args:
+            transitions : list of (from state, to state, condition, action)
+                tuples, in priority order (defaults to Transitions.ALL)
+
+        Returns:
+            the index (see Transitions.BY_STATE)
+        """
+
+        if transitions is None:
+            transitions = Transitions.ALL
+
+        index = {}
+        for (t_current, t_next, t_condition, t_action) in transitions:
+            for state in (t_current, t_next):
+                if state not in State.NAMES:
+                    raise ValueError("Unknown state %r in transition table" % (state,))
+            if not callable(t_condition) or not callable(t_action):
+                raise ValueError("Transition from %s has a condition or action that isn't callable"
+                                 % State.NAMES[t_current])
+            index.setdefault(t_current, []).append((t_condition, t_action, t_next))
+
+        Transitions.BY_STATE = dict((state, tuple(entries)) for (state, entries) in index.items())
+        return Transitions.BY_STATE
+
+    @staticmethod
+    def validate(index=None):
+        """
+        Check the state graph of a compiled transition table.
+
+        Args:
+            index : as returned by compile() (defaults to Transitions.BY_STATE)
+
+        Returns:
+            (unreachable, dead_ends): lists of the states that can't be reached
+            from State.INITIAL, and of the (reachable) states with no transitions
+            out of them
+        """
+
+        if index is None:
+            index = Transitions.BY_STATE
+
+        reached = set([State.INITIAL])
+        pending = [State.INITIAL]
+        while pending:
+            for (t_condition, t_action, t_next) in index.get(pending.pop(), ()):
+                if t_next not in reached:
+                    reached.add(t_next)
+                    pending.append(t_next)
+
+        unreachable = [state for state in State.ALL if state not in reached]
+        dead_ends = [state for state in State.ALL if state in reached and state not in index]
+        return (unreachable, dead_ends)
+
     @staticmethod
     def next(current_state):
         """
@@ -189,10 +291,115 @@ class Transitions:
         Otherwise, the current state is returned.
         """
 
-        # Test all transitions in order.
-        for (t_current, t_next, t_condition, t_action) in Transitions.ALL:
-            if t_current == current_state and t_condition():
+        # Test the transitions from this state in order.
+        for (t_condition, t_action, t_next) in Transitions.BY_STATE.get(current_state, ()):
+            if t_condition():
                 t_action()
                 return t_next
         # No transition is possible.  Remain in current state.
         return current_state
+
+
+Transitions.compile()
+
+
+class StateMachine(object):
+    """
+    Runs the flight state machine, re-evaluating only the transitions whose
+    inputs have changed.
+
+    On entering a state, all of its transitions are evaluated.  After that,
+    a transition is only evaluated again when its condition may have changed:
+    a telemetry item or command it depends on, or its time is reached (see
+    depends()).  Conditions without a declaration are evaluated on every step.
+
+    A received command is kept until a transition whose condition depends on
+    it is taken, so a command that arrives before the state that waits for
+    it is not lost.
+
+    Properties:
+        state : the current state
+    """
+
+    def __init__(self, state=State.INITIAL):
+        self.state = state
+        self._entered = True
+        # Commands not yet acted on, and those received since the last step
+        self._commands = set()
+        self._new_commands = set()
+
+    def command(self, name):
+        """ Record a received command, for the next step(). """
+        self._commands.add(name)
+        self._new_commands.add(name)
+
+    def watched_telemetry(self):
+        """ Names of the telemetry items the current state's conditions depend on. """
+
+        names = set()
+        for (t_condition, t_action, t_next) in Transitions.BY_STATE.get(self.state, ()):
+            names.update(getattr(t_condition, 'telemetry', ()))
+        return names
+
+    def polled(self):
+        """ True if the current state has conditions without a declaration. """
+
+        for (t_condition, t_action, t_next) in Transitions.BY_STATE.get(self.state, ()):
+            if not hasattr(t_condition, 'telemetry'):
+                return True
+        return False
+
+    def wake_time(self):
+        """ The next hardware time at which a condition of the current state
+        becomes true, or None. """
+
+        now = Action.hw().time()
+        times = [t_condition.at for (t_condition, t_action, t_next)
+                     in Transitions.BY_STATE.get(self.state, ())
+                     if getattr(t_condition, 'at', None) is not None and t_condition.at > now]
+        return min(times) if times else None
+
+    def step(self, telemetry=()):
+        """
+        Advance the state machine (by at most one transition), if possible.
+
+        Args:
+            telemetry : names of the telemetry items that changed since the last step
+
+        Returns:
+            True if the state changed
+        """
+
+        commands = self._new_commands
+        self._new_commands = set()
+        Condition.RECEIVED = frozenset(self._commands)
+        now = None
+
+        for (t_condition, t_action, t_next) in Transitions.BY_STATE.get(self.state, ()):
+            if not self._entered and hasattr(t_condition, 'telemetry'):
+                if t_condition.at is not None:
+                    if now is None:
+                        now = Action.hw().time()
+                    changed = now >= t_condition.at
+                else:
+                    changed = False
+                if not (changed or
+                        t_condition.commands.intersection(commands) or
+                        t_condition.telemetry.intersection(telemetry)):
+                    continue
+            if t_condition():
+                t_action()
+                self._commands.difference_update(getattr(t_condition, 'commands', ()))
+                self.state = t_next
+                self._entered = True
+                return True
+
+        self._entered = False
+        return False
+
+
+if __name__ == "__main__":
+    # Report problems with the state graph
+    (unreachable, dead_ends) = Transitions.validate()
+    print("Unreachable states: " + ", ".join(State.NAMES[s] for s in unreachable))
+    print("Dead-end states:    " + ", ".join(State.NAMES[s] for s in dead_ends))
@@ -6,11 +6,14 @@ Copyright SpaceVR, 2017.  All rights reserved.
 
 import time
 import sys
-import struct
 
 from send import Send
 from payload_cmd_defs import PayloadCommandId
 from supernova import BusCommands
+from telemetry_history import TelemetryHistory
+from command_scheduler import CommandScheduler, SOLAR_PANEL_INTERVAL
+from mai400 import Mai400
+from pumpkin.core_cmd_tlm import TLM
 
 # Assert Python 2.7
 assert sys.version_info[0:2] == (2,7)
@@ -24,11 +27,16 @@ class Hardware:
     command to the Supernova software.
 
     It also stores the latest telemetry summary packet, as received from the
-    Supernova bus.
+    Supernova bus, and a history of recent telemetry summary values.
+
+    Timed command sequences are run by 'scheduler', which should be attached
+    to the main event loop (or run() explicitly) for them to make progress.
     """
 
     def __init__(self):
         self.telemetry = None
+        self.history = TelemetryHistory("TLMITEM_1_PL")
+        self.scheduler = CommandScheduler()
         self.start_time = time.time() # Seconds since epoch when the flight software started.
 
     # --- Helpers and other stuff
@@ -38,31 +46,53 @@ class Hardware:
     def time(self):
         return time.time() - self.start_time
 
+    def record_telemetry(self, tp):
+        """
+        Store a received (and deserialized) TelemetryPacket.
+
+        Summary packets are also added to the telemetry history.
+        """
+        self.telemetry = tp
+        if tp.base.pkt_id == TLM.id_by_name[self.history.packet_name]:
+            self.history.append(tp.values, self.time())
+
     # --- BEGIN Hardware API
     #
     # Implementing a method here means that a corresponding version should be added
     # to hardware_mock.py (and of course a test written, too).
 
-    def deploy_solar_panels(self):
+    def deploy_solar_panels(self, on_done=None):
         """
-        Send a command to the bus to trigger solar panel deployment.
+        Send commands to the bus to trigger solar panel deployment.
+
+        The commands for each panel are sent SOLAR_PANEL_INTERVAL seconds
+        apart, by the scheduler, so this returns immediately.
+
+        Args:
+            on_done : function called with the CommandSequence once all
+                commands have been sent
+
+        Returns:
+            the CommandSequence
 
         TODO: should the burns happen sequentially or at once?
         """
 
         burn_time = 10 #seconds
 
+        # XXX: On the simulator, a small delay is required or the
+        # XXX: fourth wire fails to fire.
+        steps = []
         for num in range(1,5):
-            Send.send_bus_cmd(BusCommands.PRM_CMD,
-                              bytearray([0x05, num, 0x00]) )
-            Send.send_bus_cmd(BusCommands.PRM_CMD,
-                              bytearray([0x07, num, 0x00]) )
-            Send.send_bus_cmd(BusCommands.PRM_CMD,
-                              bytearray([0x09, num, burn_time]) )
+            steps.append( (0 if num == 1 else SOLAR_PANEL_INTERVAL,
+                           Send.send_bus_cmds,
+                           ([
+                               (BusCommands.PRM_CMD, bytearray([0x05, num, 0x00]) ),
+                               (BusCommands.PRM_CMD, bytearray([0x07, num, 0x00]) ),
+                               (BusCommands.PRM_CMD, bytearray([0x09, num, burn_time]) ),
+                           ],)) )
 
-            # XXX: On the simulator, a small delay is required or the
-            # XXX: fourth wire fails to fire.
-            time.sleep(0.1)
+        return self.scheduler.submit(steps, on_done, "deploy_solar_panels")
 
 
     def power_cpm(self, enable):
@@ -184,15 +214,14 @@ class Hardware:
         # XXX: Presumable we've stored the latest ground station coordinates.
         # self.mai_set_latlong(longitude, latitude, start_time, stop_time):
 
-        # XXX: Example
-        self.mai_set_latlong(75, 50, 0, 999999999)
-
-        # NOTE: executing these two commands immediately in
-        #   in sequence appears to cause a Supernova ACS_READ_ERROR.
-        #   This does not appear to have any effect on the uptake
-        #   of the commands.
+        # NOTE: the two commands are intentionally sent back to back, in
+        #   one batch.  Executing them immediately in sequence appears to
+        #   cause a Supernova ACS_READ_ERROR; this is a known error, and
+        #   does not appear to have any effect on the uptake of the commands.
 
-        self.mai_set_mode(4)
+        # XXX: Example
+        Mai400.send([ (Mai400.SET_LATLONG, (75, 50, 0, 999999999)),
+                      (Mai400.SET_MODE, (4,)) ])
 
     def transmit_health_data(self):
         """
@@ -296,20 +325,7 @@ class Hardware:
                 with Sun/mag and thus will lose inertial pointing during eclipse.
         """
 
-        DATA_LEN = 40 #always
-        data = bytearray(DATA_LEN)
-
-        syncbyte    = 0xEB90 # TODO: the Pumpkin comments contain some confusing statements about endianness
-        commandID   = 0x00   # SET_MODE
-
-        # Create data
-        struct.pack_into('<HBB', data, 0, syncbyte, commandID, mode) 
-
-        # Add data checksum.  (This is different than the packet checksum.)
-        checksum = 0xFFFF & sum(data[0:DATA_LEN]) 
-        struct.pack_into('<H', data, 38, checksum) 
-
-        Send.send_bus_cmd(BusCommands.MAI_CMD, data)
+        Mai400.send([ (Mai400.SET_MODE, (mode,)) ])
 
 
     def mai_set_latlong(self, longitude, latitude, start_time, stop_time):
@@ -333,22 +349,7 @@ class Hardware:
             stop_time:  gul_GPStime_LLend (sec)
         """
 
-        DATA_LEN = 40 #always
-        data = bytearray(DATA_LEN)
-
-        syncbyte    = 0xEB90 # TODO: the Pumpkin comments contain some confusing statements about endianness
-        commandID   = 0x51   # "torque command" (says manual)
-
-        # Create data
-        struct.pack_into('<HBhhLL', data, 0, syncbyte, commandID, 
-                         longitude, latitude,
-                         start_time, stop_time)
-
-        # Add data checksum.  (This is different than the packet checksum.)
-        checksum = 0xFFFF & sum(data[0:DATA_LEN]) 
-        struct.pack_into('<H', data, 38, checksum) 
-
-        Send.send_bus_cmd(BusCommands.MAI_CMD, data)
+        Mai400.send([ (Mai400.SET_LATLONG, (longitude, latitude, start_time, stop_time)) ])
 
 
     def mai_set_time(self, gpstime):
@@ -359,22 +360,7 @@ class Hardware:
             gpstime - GPS time is a linear count of seconds elapsed since 0h Jan 6, 1980.
         """
 
-        DATA_LEN = 40 #always
-        data = bytearray(DATA_LEN)
-
-        syncbyte    = 0xEB90 # TODO: the Pumpkin comments contain some confusing statements about endianness
-        commandID   = 0x44   # set GPS time
-
-        # Create data
-        struct.pack_into('<HBL', data, 0, syncbyte, commandID, 
-                         gpstime)
-
-        # Add data checksum.  (This is different than the packet checksum.)
-        checksum = 0xFFFF & sum(data[0:DATA_LEN]) 
-        struct.pack_into('<H', data, 38, checksum) 
-
-        Send.send_bus_cmd(BusCommands.MAI_CMD, data)
-
+        Mai400.send([ (Mai400.SET_GPS_TIME, (gpstime,)) ])
 
 
     def mai_reset(self):
@@ -382,33 +368,5 @@ class Hardware:
         Resets the ADACS.
         """
 
-        DATA_LEN = 40 #always
-        data = bytearray(DATA_LEN)
-
-        # --- First command
-
-        syncbyte    = 0xEB90 # TODO: the Pumpkin comments contain some confusing statements about endianness
-        commandID   = 0x5A   # Reset step 1
-
-        # Create data
-        struct.pack_into('<HB', data, 0, syncbyte, commandID)
-
-        # Add data checksum.  (This is different than the packet checksum.)
-        checksum = 0xFFFF & sum(data[0:DATA_LEN]) 
-        struct.pack_into('<H', data, 38, checksum) 
-
-        Send.send_bus_cmd(BusCommands.MAI_CMD, data)
-
-        # --- Second command
-
-        commandID   = 0xF1   # Reset step 2
-
-        # Create data
-        struct.pack_into('<HB', data, 0, syncbyte, commandID)
-
-        # Add data checksum.  (This is different than the packet checksum.)
-        checksum = 0xFFFF & sum(data[0:DATA_LEN]) 
-        struct.pack_into('<H', data, 38, checksum) 
-
-        Send.send_bus_cmd(BusCommands.MAI_CMD, data)
-
+        Mai400.send([ (Mai400.RESET_1, ()),
+                      (Mai400.RESET_2, ()) ])
@@ -8,6 +8,10 @@ Copyright SpaceVR, 2017.  All rights reserved.
 
 import sys
 
+from telemetry_history import TelemetryHistory
+from command_scheduler import CommandScheduler, SOLAR_PANEL_INTERVAL
+from pumpkin.core_cmd_tlm import TLM
+
 # Assert Python 2.7
 assert sys.version_info[0:2] == (2,7)
 
@@ -17,21 +21,39 @@ class HardwareMock:
         # Time will advance manually in our mock hardware layer
         self.start_time = 0
         self.cur_time = self.start_time
+        self.telemetry = None
+        self.history = TelemetryHistory("TLMITEM_1_PL")
+        # Print activities (disabled e.g. by the simulator)
+        self.verbose = True
+        # Timed command sequences run as the mock time advances
+        self.scheduler = CommandScheduler(clock=self.time)
     
     def time(self):
         return self.cur_time
 
+    def record_telemetry(self, tp):
+        self.telemetry = tp
+        if tp.base.pkt_id == TLM.id_by_name[self.history.packet_name]:
+            self.history.append(tp.values, self.cur_time)
+
     def advance_time(self, delta):
         self.cur_time = self.cur_time + delta
+        self.scheduler.tick()
 
     def log_and_print(self, func_name, extra=""):
+        if not self.verbose:
+            return
         print("HardwareMock::%-15.15s time=%0.1f %s \n" % 
                   (func_name, 
-                   self.start_time,
+                   self.cur_time,
                    extra))
 
-    def deploy_solar_panels(self):
+    def deploy_solar_panels(self, on_done=None):
         self.log_and_print( sys._getframe().f_code.co_name )
+        steps = [(0 if num == 1 else SOLAR_PANEL_INTERVAL,
+                  self.log_and_print, ("deploy_solar_panel", "Num=%d" % num))
+                 for num in range(1,5)]
+        return self.scheduler.submit(steps, on_done, "deploy_solar_panels")
     def power_eyestar(self, enable):
         self.log_and_print( sys._getframe().f_code.co_name, "ON" if enable else "OFF" )
     def power_cpm(self, enable):
@@ -0,0 +1,158 @@
+"""
+MAI-400 ADACS command module
+
+Encodes commands for the MAI-400 attitude determination and control system.
+They are sent to the Supernova bus as the data of MAI_CMD bus commands.
+
+Every MAI-400 command is 40 bytes long:
+
+    Offset  Size  Contents
+    0       2     sync word, 0xEB90 (little endian)
+    2       1     command ID
+    3       35    arguments (depending on the command), zero padded
+    38      2     checksum of bytes 0..37 (little endian)
+
+Copyright SpaceVR, 2017.  All rights reserved.
+"""
+
+import sys
+import struct
+import threading
+
+from send import Send
+from supernova import BusCommands
+from checksum import checksum16
+
+# Assert Python 2.7
+assert sys.version_info[0:2] == (2,7)
+
+class MaiCommand(object):
+    """ Template for one MAI-400 command.
+
+    The whole command, apart from the checksum, is packed by a single
+    precompiled struct.
+
+    Properties:
+        name : command name
+        command_id : command ID byte
+        arg_names : names of the arguments, in order
+    """
+
+    __slots__ = ('name', 'command_id', 'arg_names', '_struct')
+
+    def __init__(self, name, command_id, arg_format="", arg_names=()):
+        """ Construct a MaiCommand
+
+        Args:
+            name : command name
+            command_id : command ID byte
+            arg_format : struct format of the arguments (without byte order)
+            arg_names : names of the arguments, in order
+        """
+
+        args = struct.Struct('<' + arg_format)
+        if len(args.unpack_from(bytearray(args.size))) != len(arg_names):
+            raise ValueError("Argument names of %s don't match the format" % name)
+        head = 3 + args.size
+        if head > Mai400.CHECKSUM_OFFSET:
+            raise ValueError("Arguments of %s are too long" % name)
+
+        self.name = name
+        self.command_id = command_id
+        self.arg_names = tuple(arg_names)
+
+        # Pad bytes are packed as zero, so a reused buffer needs no clearing.
+        self._struct = struct.Struct('<HB%s%dx' % (arg_format, Mai400.CHECKSUM_OFFSET - head))
+
+    def pack_into(self, buf, offset, *args):
+        """ Encode the command (with its checksum) into buf[offset:offset+40]. """
+
+        self._struct.pack_into(buf, offset, Mai400.SYNC_WORD, self.command_id, *args)
+        Mai400._CHECKSUM.pack_into(buf, offset + Mai400.CHECKSUM_OFFSET,
+                                   checksum16(buf, offset, offset + Mai400.CHECKSUM_OFFSET))
+
+    def encode(self, *args):
+        """ Return the encoded command as a new bytearray. """
+
+        buf = bytearray(Mai400.DATA_LEN)
+        self.pack_into(buf, 0, *args)
+        return buf
+
+    def __repr__(self):
+        return "MaiCommand(%s, 0x%02X)" % (self.name, self.command_id)
+
+
+class Mai400(object):
+    """ Send commands to the MAI-400 ADACS
+
+    Commands are given as (MaiCommand, args) tuples, e.g.
+        Mai400.send([ (Mai400.SET_MODE, (3,)) ])
+
+    All of the commands passed to one send() call are encoded into a reused
+    buffer and sent as one batch of bus commands.
+    """
+
+    DATA_LEN = 40
+    CHECKSUM_OFFSET = 38
+    SYNC_WORD = 0xEB90 # TODO: the Pumpkin comments contain some confusing statements about endianness
+
+    _CHECKSUM = struct.Struct('<H')
+
+    # Reused buffer for encoding batches of commands
+    _BUF = bytearray(DATA_LEN * 4)
+    _BUF_LOCK = threading.Lock()
+
+    @staticmethod
+    def send(commands):
+        """ Encode and transmit MAI-400 commands, in order, as one batch.
+
+        Args:
+            commands : list of (MaiCommand, args tuple)
+
+        Returns:
+            Nothing
+        """
+
+        with Mai400._BUF_LOCK:
+            size = Mai400.DATA_LEN * len(commands)
+            if len(Mai400._BUF) < size:
+                Mai400._BUF = bytearray(size)
+            buf = Mai400._BUF
+
+            for i, (command, args) in enumerate(commands):
+                command.pack_into(buf, i * Mai400.DATA_LEN, *args)
+
+            # The frames are serialized before send_bus_cmds returns,
+            # so the buffer can be reused afterwards.
+            view = memoryview(buf)
+            Send.send_bus_cmds([(BusCommands.MAI_CMD, view[i:i+Mai400.DATA_LEN])
+                                for i in range(0, size, Mai400.DATA_LEN)])
+
+
+# --- Command Definitions ------------------------
+#
+# Adding a command only takes a definition here (and, usually, a method in
+# hardware.py that sends it).
+
+# Sets the ADACS operational mode.  (See Hardware.mai_set_mode.)
+Mai400.SET_MODE = MaiCommand("SET_MODE", 0x00, "B", ("mode",))
+
+# Sets the ADACS clock, in GPS seconds.
+Mai400.SET_GPS_TIME = MaiCommand("SET_GPS_TIME", 0x44, "L", ("gpstime",))
+
+# Loads the Earth latitude and longitude target, and the GPS start and stop
+# time, used by the Lat/Long modes.  ("torque command" says the manual.)
+Mai400.SET_LATLONG = MaiCommand("SET_LATLONG", 0x51, "hhLL",
+                                ("longitude", "latitude", "start_time", "stop_time"))
+
+# Reset step 1.  A reset is RESET_1 then RESET_2.
+Mai400.RESET_1 = MaiCommand("RESET_1", 0x5A)
+
+# Reset step 2.  Must follow RESET_1.
+Mai400.RESET_2 = MaiCommand("RESET_2", 0xF1)
+
+Mai400.COMMANDS = dict((c.name, c) for c in (Mai400.SET_MODE,
+                                              Mai400.SET_GPS_TIME,
+                                              Mai400.SET_LATLONG,
+                                              Mai400.RESET_1,
+                                              Mai400.RESET_2))
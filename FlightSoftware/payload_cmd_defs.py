@@ -106,3 +106,15 @@ class PayloadCommandId(Enum):
         None
     """
 
+    # ---
+    GO = 0x18
+    """
+    Summary:     Leave the power check / Globalstar loop.
+    Description: Passed to the flight state machine as the "GO" command,
+                 which moves on to SEQ2.  It is kept until the state
+                 machine acts on it.
+
+    Data:
+        None
+    """
+
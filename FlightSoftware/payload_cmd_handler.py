@@ -4,7 +4,7 @@ import sys
 import subprocess
 import shlex
 
-from agent import Agent
+from agent import Agent, Reassembler
 from supernova import Supernova
 from spacepacket import Packet
 from send import Send
@@ -61,8 +61,8 @@ class PayloadCommandHandler:
                 print("Unknown command %x.  Ignoring." % (cmd))
 
 
-    shell_cmd = ""
-    shell_rsl = ""
+    # Reassembles shell commands that are split across multiple packets
+    shell_seq = Reassembler()
     @staticmethod
     def run_shell(packet):
         """ The "shell" command runs a bash command.
@@ -73,15 +73,10 @@ class PayloadCommandHandler:
         is received.
         """
 
-        if (packet.seq_flags & Packet.SEQ_FLAG_FIRST):
-            # On the first packet, clear whatever old command string
-            PayloadCommandHandler.shell_cmd = ""
-
-        PayloadCommandHandler.shell_cmd = PayloadCommandHandler.shell_cmd + packet.data.decode("utf-8")
-        shell_cmd = PayloadCommandHandler.shell_cmd
-        shell_rsl = ""
-
-        if (packet.seq_flags & Packet.SEQ_FLAG_LAST):
+        packet = PayloadCommandHandler.shell_seq.add(packet)
+        if packet is not None:
+            shell_cmd = bytearray(packet.data).decode("utf-8")
+            shell_rsl = ""
 
             # On the last packet, we actually run the command
             print("Running in shell...\n $ %s \n" % (shell_cmd))
@@ -99,9 +94,9 @@ class PayloadCommandHandler:
                 print(shell_rsl)
                 print('================== END OUTPUT ==================')
 
-            # Send reponse packet
+            # Send reponse packet(s)
             # TODO: send back to packet source
-            Send.send_payload_cmd(4, PayloadCommandHandler.SHELL_RESP, shell_rsl)
+            Send.send_payload_stream(4, PayloadCommandHandler.SHELL_RESP, shell_rsl)
 
     @staticmethod
     def run_echo(packet):
@@ -21,25 +21,37 @@ core_cmd_telem.py - Public API v0.2
     CMD
     TLM
     ENUMS
+    ANALOGS
 
 ### FUNCTIONS
 
     unpack_telemetry(packet_obj)
+    enum_lookup(enum_relid, value)
+    decode_batch(frames, packet_name, offset=0, stride=None)    (needs NumPy)
 
 ### CLASSES
 
     Command
     Telemetry
+    PacketIndex
+    FieldInfo
 
 """
 
-import struct, os, logging
+import struct, os, logging, marshal, mmap
 from csv import DictReader
+from operator import itemgetter
+from collections import Mapping, OrderedDict, namedtuple
 
 #from supernova_apps import core_packets
 #from supernova_apps.settings import Settings
 from _utils import verify_range
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 # LOGGING:
 #    LOG.debug() is called when a telemetry packet_obj is unpacked
 LOG = logging.getLogger(__name__)
@@ -50,6 +62,13 @@ _FOLDER = os.path.join(_SCRIPT_PATH, "core_definitions")
 _CMD_CSV_PATH = os.path.join(_FOLDER, "qry_icd_cmd_definitions_full.csv")
 _TLM_CSV_PATH = os.path.join(_FOLDER, "qry_icd_tlm_pkt_definitions.csv")
 _ENUM_CSV_PATH = os.path.join(_FOLDER, "enum_entry.csv")
+_ANALOG_CSV_PATH = os.path.join(_FOLDER, "analog_coef.csv")
+
+# --- Parsed tables are cached next to each csv, in `<csv path>.cache`.
+# ---   Change the version whenever the cached layout changes.
+_CACHE_SUFFIX = ".cache"
+_CACHE_VERSION = 2
+_CACHE_HEADER_LEN = struct.Struct('<I')
 
 # --- Format char lookup table
 _FORMAT_TABLE = {
@@ -90,11 +109,9 @@ def unpack_telemetry(packet_obj):
     if bytes_recd < bytes_expected:
         raise ValueError('{}: expected {} got {} bytes.'.format(packet_name,
             bytes_expected, bytes_recd))
-    # --- Definitions describe the data items in a packet & their types.
-    definitions = TLM.table[packet_name]
     telemetry_obj = Telemetry(
         tlm_pkt_name=TLM.name_by_id[packet_obj.packet_id],
-        values=_bytes_to_dict(packet_obj.packet_data, definitions),
+        values=TLM.get_codec(packet_name).unpack(packet_obj.packet_data),
         source_node=packet_obj.source_node,
         packet_subid=packet_obj.packet_subid
         )
@@ -205,14 +222,149 @@ class Command(object):
         """
         return _dict_to_bytes(self.arguments, self.definitions)
 
+class FieldInfo(namedtuple('FieldInfo', ['name', 'byte_offset', 'bit_offset',
+        'num_bits', 'shape', 'data_type', 'endian', 'fmt'])):
+    """
+    Location & type of one data item within a packet.
+
+    Attributes:
+        name (str): data item name.
+        byte_offset (int): offset of the first byte holding the item.  For a
+            bit-packed item this is the offset of its container.
+        bit_offset (int): offset of the item's first (most significant) bit,
+            counted from the start of the packet.
+        num_bits (int): width of the item, or of each element of an array.
+        shape (tuple): () for a single value, (DIM_1_SIZE,) for a 1d array,
+            (DIM_2_SIZE, DIM_1_SIZE) for a 2d array.
+        data_type (str): DATA_TYPE_NAME from the definitions.
+        endian (str): struct byte order symbol, '<' or '>'.
+        fmt (str): struct format of the item, of each array element, or of
+            the container of a bit-packed item ('{n}s' for 1d character arrays).
+    """
+    __slots__ = ()
+
+    @property
+    def count(self):
+        """
+        Number of values (array elements) in the item.
+
+        """
+        count = 1
+        for dim in self.shape:
+            count = count * dim
+        return count
+
+    @property
+    def packed(self):
+        """
+        True if the item is a bit field sharing its container with others.
+
+        """
+        return not self.shape and \
+            self.num_bits < struct.calcsize(self.endian + self.fmt) * 8
+
+    @property
+    def struct_format(self):
+        """
+        struct format that reads the whole item (or its container).
+
+        """
+        if self.shape and not self.fmt.endswith('s'):
+            return '{}{}'.format(self.count, self.fmt)
+        return self.fmt
+
+class PacketIndex(object):
+    """
+    Precomputed layout of a packet: its length and the position of each item.
+
+    Attributes:
+        length (int): packet data length in bytes, as given by the
+            definitions (the total of all item widths, rounded up).
+        size (int): number of bytes the codec packs/unpacks.  This is less
+            than `length` only if an item has DIM_1_SIZE but no ARRAY_NAME.
+        fields (list): FieldInfo for each data item, in packet order.
+        by_name (dict): {name: FieldInfo}.  For a repeated name, the last.
+    """
+    def __init__(self, definitions, fields, size):
+        self.length = _definitions_length(definitions)
+        self.size = size
+        self.fields = fields
+        self.by_name = dict((field.name, field) for field in fields)
+
+    def field(self, name):
+        """
+        Return the FieldInfo for a data item.
+
+        """
+        return self.by_name[name]
+
+def _definitions_length(definitions):
+    """
+    Returns the total length in Bytes of the items in `definitions`.
+
+    """
+    total_bits = 0
+    for item in definitions.itervalues():
+        item_bits = item['NUM_BITS']
+        if item_bits is None:
+            # --- handle case where there are no values or arguments
+            item_bits = 0
+        if item['DIM_1_SIZE']:
+            item_bits = item_bits * item['DIM_1_SIZE']
+            if item['DIM_2_SIZE']:
+                item_bits = item_bits * item['DIM_2_SIZE']
+        total_bits += item_bits
+    extra_bits = total_bits % 8
+    return total_bits // 8 + bool(extra_bits)
+
 class _DefinitionTable(object):
     """
     Holds a command or telemetry table and associated methods.
 
     """
     def __init__(self, path, primary_id, secondary_id, packet_id):
-        self.table = _group_items(_load_csv(path), primary_id, secondary_id)
-        self.name_by_id, self.id_by_name = _make_lookups(self.table, packet_id)
+        self.table = _LazyGrouping(path, primary_id, secondary_id, packet_id)
+        self._lookups = None
+
+    @property
+    def name_by_id(self):
+        if self._lookups is None:
+            self._lookups = _make_lookups(self.table.ids)
+        return self._lookups[0]
+
+    @property
+    def id_by_name(self):
+        if self._lookups is None:
+            self._lookups = _make_lookups(self.table.ids)
+        return self._lookups[1]
+
+    def get_codec(self, packet_name):
+        """
+        Return the compiled codec used to pack/unpack the given packet.
+
+        """
+        return _get_codec(self.table[packet_name])
+
+    def get_index(self, packet_name):
+        """
+        Return the PacketIndex (length & data item layout) of the given packet.
+
+        """
+        return _get_codec(self.table[packet_name]).index
+
+    def get_conversion(self, packet_name):
+        """
+        Return the analog conversion for the given packet.
+
+        """
+        return _get_conversion(self.table[packet_name])
+
+    def get_enum_decoder(self, packet_name):
+        """
+        Return the enum decoder for the given packet.
+
+        """
+        return _get_enum_decoder(self.table[packet_name])
 
     def create_empty_dict(self, packet_name):
         """
@@ -257,21 +409,7 @@ class _DefinitionTable(object):
         Returns the total packet length of a packet in Bytes.
 
         """
-        items = self.table[packet_name].iteritems()
-        total_bits = 0
-        for item in items:
-            item_bits = item[1]['NUM_BITS']
-            if item_bits is None:
-                # --- handle case where there are no values or arguments
-                item_bits = 0
-            if item[1]['DIM_1_SIZE']:
-                item_bits = item_bits * item[1]['DIM_1_SIZE']
-                if item[1]['DIM_2_SIZE']:
-                    item_bits = item_bits * item[1]['DIM_2_SIZE']
-            total_bits += item_bits
-        extra_bits = total_bits % 8
-        bytes = total_bits // 8 + bool(extra_bits)
-        return bytes
+        return self.get_index(packet_name).length
 
     def get_item_names(self, packet_name):
         """
@@ -289,154 +427,740 @@ def _bytes_to_dict(bytes, definitions):
     Turn bytearray structure into python dictionary acording to `definitions`.
 
     """
-    # --- Dictionary of name/values to return
-    dictionary = {}
-    # --- start_byte: describes where we are in the `bytes` packet as we parse
-    start_byte = 0
-    # --- Create iterator from ordered list of sequence counts
-    sequence_counts = iter(sorted(definitions.keys()))
-    while True:
-        try:
-            sequence_count = sequence_counts.next()
-        except StopIteration:
-            # --- Finished going through all items
-            break
-        else:
-            definition = definitions[sequence_count]
-            # ---
-            # --- STEP 1: Determine if item is a packed or array special case.
+    return _get_codec(definitions).unpack(bytes)
+
+def _dict_to_bytes(dictionary, definitions):
+    """
+    Pack a dictionary of data items according to definitions.
+
+    """
+    return _get_codec(definitions).pack(dictionary)
+
+# --- Compiled codecs, keyed by id() of the definitions dict they describe.
+_CODECS = {}
+
+def _get_codec(definitions):
+    """
+    Return the compiled _Codec for `definitions`, compiling it on first use.
+
+    """
+    codec = _CODECS.get(id(definitions))
+    if codec is None:
+        codec = _Codec(definitions)
+        _CODECS[id(definitions)] = codec
+    return codec
+
+class _Codec(object):
+    """
+    Precompiled pack/unpack plan for the data items of one packet.
+
+    The definitions are walked once, in sequence order, and reduced to one
+    struct.Struct per run of same-endian items plus the post-processing
+    needed for arrays and bit-packed items.  Single-byte formats have no
+    endianness, so most packets compile to a single Struct.
+
+    Attributes:
+        definitions (dict): the definitions this codec was compiled from.
+        size (int): number of bytes packed/unpacked.
+        index (PacketIndex): the position & type of each data item.
+        names (list): data item names in sequence order.
+        scalars (list): (name, struct format character) of each data item
+            that unpacks to a single number, in sequence order.
+    """
+    # --- Step kinds, in the order items appear in the packet.
+    _SCALAR, _STRING, _ARRAY, _PACKED = range(4)
+
+    def __init__(self, definitions):
+        # --- Holding a reference keeps id(definitions) valid as a cache key.
+        self.definitions = definitions
+        self.size = 0
+        self.names = []
+        self.scalars = []
+        # --- [(struct.Struct, byte offset, first value index)]
+        self._segments = []
+        # --- [(kind, value index, payload)] in packet order
+        self._steps = []
+        # --- FieldInfo for each data item, in packet order
+        self._fields = []
+        # --- NumPy dtypes for decode_batch, built on first use
+        self._batch_dtypes = None
+        # --- {tuple of names: _FieldReader} for unpack_fields
+        self._field_readers = {}
+        self._compile()
+        self.index = PacketIndex(definitions, self._fields, self.size)
+        # --- Scalars and strings come straight out of the unpacked tuple.
+        direct = [(step[2], step[1]) for step in self._steps
+            if step[0] in (_Codec._SCALAR, _Codec._STRING)]
+        self._direct_names = tuple(name for name, _ in direct)
+        self._direct_getter = _make_getter([index for _, index in direct])
+        self._arrays = [step[1:] for step in self._steps
+            if step[0] == _Codec._ARRAY]
+        self._packed = [step[1:] for step in self._steps
+            if step[0] == _Codec._PACKED]
+
+    def _compile(self):
+        """
+        Build the segments and steps from the definitions.
+
+        """
+        sequence_counts = sorted(self.definitions.keys())
+        fmt_chars = []
+        endian = None
+        num_values = 0
+        segment_offset = 0
+        segment_first_value = 0
+        i = 0
+        while i < len(sequence_counts):
+            definition = self.definitions[sequence_counts[i]]
+            i += 1
             data_type = definition['DATA_TYPE_NAME']
             if data_type is None:
                 # --- ASSUMPTION: if there is no data_type than then
                 # ---   this command has no arguments.
-                return {}
+                break
             ARRAY_ITEM, PACKED_ITEM = _determine_item_type(definition)
-            # ---
-            # --- STEP 2: Get `fmt_string` and `num_bytes`
-            fmt_string = _ENDIAN_SYMBOLS[definition['ENDIAN_NAME']]
+            name = definition['DATA_ITEM_NAME']
+            # --- [(name, bit offset in item, bits, shape, data type, format)]
+            layout = []
             if PACKED_ITEM:
                 num_bytes, fmt_char = _lookup_packed_datatype(data_type)
+                # --- Consume the following items sharing this container,
+                # ---   most significant bits first.
+                fields = []
+                shift = num_bytes * 8
+                while True:
+                    bit_count = definition['NUM_BITS']
+                    shift -= bit_count
+                    fields.append((definition['DATA_ITEM_NAME'], shift,
+                        (1 << bit_count) - 1))
+                    layout.append((definition['DATA_ITEM_NAME'],
+                        num_bytes * 8 - shift - bit_count, bit_count, (),
+                        definition['DATA_TYPE_NAME'], fmt_char))
+                    self.names.append(definition['DATA_ITEM_NAME'])
+                    self.scalars.append((definition['DATA_ITEM_NAME'], fmt_char))
+                    if shift <= 0 or i >= len(sequence_counts):
+                        break
+                    definition = self.definitions[sequence_counts[i]]
+                    i += 1
+                step = (_Codec._PACKED, num_values, fields)
+                count = 1
             else: #STANDARD_ITEM or ARRAY_ITEM
                 num_bytes = definition['NUM_BITS'] // 8
                 fmt_char = _FORMAT_TABLE[data_type]
+                self.names.append(name)
                 if ARRAY_ITEM:
-                    # --- Add number to fmt_string indicating series (eg. '<3I')
                     dim1_size = definition['DIM_1_SIZE']
                     dim2_size = definition['DIM_2_SIZE']
-                    num_elements = dim1_size
+                    count = dim1_size
                     if dim2_size:
-                        num_elements = num_elements * dim2_size
-                    num_bytes = num_bytes * num_elements
-                    fmt_string += str(num_elements)
-            fmt_string += fmt_char
-            # ---
-            # --- STEP 3: Unpack data & update start_byte
-            end_byte = start_byte + num_bytes
-            chunk = bytes[start_byte:end_byte]
-            value = struct.unpack(fmt_string, str(chunk))
-            start_byte += num_bytes
-            # ---
-            # --- STEP 4: Post-process unpacked value & add to dictionary
-            if PACKED_ITEM:
-                bit_count = definition['NUM_BITS']
-                parts = []
-                total_bits = bit_count
-                # --- Add this item to a list of (name, bit_count) tuples
-                parts.append((definition['DATA_ITEM_NAME'], bit_count))
-                while total_bits < (num_bytes * 8):
-                    # --- Iterate through all items in packed datatype
-                    definition = definitions[sequence_counts.next()]
-                    bit_count = definition['NUM_BITS']
-                    total_bits += bit_count
-                    # --- Add this item to a list of (name, bit_count) tuples
-                    parts.append((definition['DATA_ITEM_NAME'], bit_count))
-                # --- Unpack the parts into a dict of integer values.
-                parts_dict = _unpack_parts(value[0], parts)
-                for name in parts_dict:
-                    dictionary[name] = parts_dict[name]
-            elif ARRAY_ITEM:
-                if dim2_size:
-                    # --- Split up into 2d array.
-                    value = tuple([value[i:i+dim1_size] for i in
-                        xrange(0, len(value), dim1_size)])
-                elif data_type == 'Character':
-                    # --- Change from list to string if it's characters
+                        count = count * dim2_size
+                    num_bytes = num_bytes * count
+                    shape = (dim2_size, dim1_size) if dim2_size else (dim1_size,)
+                    if data_type == 'Character' and not dim2_size:
+                        # --- 1d character arrays unpack directly to a str
+                        fmt_char = '{}s'.format(count)
+                        step = (_Codec._STRING, num_values, name)
+                        layout.append((name, 0, 8, shape, data_type, fmt_char))
+                        count = 1
+                    else:
+                        layout.append((name, 0, definition['NUM_BITS'], shape,
+                            data_type, fmt_char))
+                        fmt_char = '{}{}'.format(count, fmt_char)
+                        step = (_Codec._ARRAY, num_values,
+                            (name, count, dim1_size if dim2_size else None))
+                else: #STANDARD_ITEM
+                    step = (_Codec._SCALAR, num_values, name)
+                    layout.append((name, 0, definition['NUM_BITS'], (),
+                        data_type, fmt_char))
+                    count = 1
+                    if fmt_char != 'c':
+                        self.scalars.append((name, fmt_char))
+            # --- Multi-byte items of a different endianness start a new
+            # ---   segment.  Single-byte items fit in any segment.
+            item_endian = _ENDIAN_SYMBOLS[definition['ENDIAN_NAME']]
+            if fmt_char[-1] in 'Bbcs':
+                item_endian = endian or item_endian
+            if endian is not None and item_endian != endian:
+                self._segments.append((struct.Struct(endian + ''.join(fmt_chars)),
+                    segment_offset, segment_first_value))
+                fmt_chars = []
+                segment_offset = self.size
+                segment_first_value = num_values
+            endian = item_endian
+            fmt_chars.append(fmt_char)
+            self._steps.append(step)
+            for field_name, bit_offset, num_bits, shape, field_type, field_fmt in layout:
+                self._fields.append(FieldInfo(field_name, self.size,
+                    self.size * 8 + bit_offset, num_bits, shape, field_type,
+                    item_endian, field_fmt))
+            num_values += count
+            self.size += num_bytes
+        if fmt_chars:
+            self._segments.append((struct.Struct(endian + ''.join(fmt_chars)),
+                segment_offset, segment_first_value))
+
+    def unpack_fields(self, data, names):
+        """
+        Unpack only the named data items from `data`.
+
+        This reads just the bytes of the requested items, without decoding
+        the rest of the packet or building a dictionary.
+
+        Args:
+            data: str, bytearray or memoryview of at least `size` bytes.
+            names: sequence of data item names.
+
+        Returns:
+            (tuple) the values, in the order of `names`, as `unpack` gives them.
+
+        """
+        names = tuple(names)
+        reader = self._field_readers.get(names)
+        if reader is None:
+            reader = _FieldReader(self, names)
+            self._field_readers[names] = reader
+        return reader.unpack(data)
+
+    def unpack(self, data):
+        """
+        Unpack `data` into a dictionary of values keyed by data item name.
+
+        Args:
+            data: str, bytearray or memoryview of at least `size` bytes.
+
+        """
+        if len(self._segments) == 1:
+            values = self._segments[0][0].unpack_from(data, 0)
+        else:
+            values = ()
+            for segment, offset, _ in self._segments:
+                values += segment.unpack_from(data, offset)
+        dictionary = dict(zip(self._direct_names, self._direct_getter(values)))
+        for index, (name, count, dim1_size) in self._arrays:
+            value = values[index:index+count]
+            if dim1_size:
+                # --- Split up into 2d array.
+                value = tuple([value[j:j+dim1_size] for j in
+                    xrange(0, count, dim1_size)])
+            dictionary[name] = value
+        for index, fields in self._packed:
+            packed_value = values[index]
+            for name, shift, mask in fields:
+                dictionary[name] = (packed_value >> shift) & mask
+        return dictionary
+
+    def pack(self, dictionary):
+        """
+        Pack a dictionary of values keyed by data item name into a bytearray.
+
+        """
+        values = []
+        for kind, _, payload in self._steps:
+            if kind == _Codec._SCALAR:
+                values.append(dictionary[payload])
+            elif kind == _Codec._STRING:
+                value = dictionary[payload]
+                if not isinstance(value, (str, bytearray)):
                     value = ''.join(value)
-                # --- Add array (1d or 2d) to dictionary
-                dictionary[definition['DATA_ITEM_NAME']] = value
-            else: #STANDARD_ITEM
-                # --- Add first element of struct.unpack to dictionary
-                dictionary[definition['DATA_ITEM_NAME']] = value[0]
-        # --- END WHILE LOOP
-    # --- Return from _bytes_to_dict()
-    return dictionary
+                values.append(value)
+            elif kind == _Codec._ARRAY:
+                if payload[2]:
+                    for dim1 in dictionary[payload[0]]:
+                        values.extend(dim1)
+                else:
+                    values.extend(dictionary[payload[0]])
+            else: #_PACKED
+                pack_value = 0
+                for name, shift, _ in payload:
+                    pack_value |= dictionary[name] << shift
+                values.append(pack_value)
+        packet_data = bytearray(self.size)
+        for j, (segment, offset, first) in enumerate(self._segments):
+            if j + 1 < len(self._segments):
+                last = self._segments[j + 1][2]
+            else:
+                last = len(values)
+            segment.pack_into(packet_data, offset, *values[first:last])
+        return packet_data
 
-def _dict_to_bytes(dictionary, definitions):
+    def batch_dtypes(self, offset=0, stride=None):
+        """
+        Return the NumPy dtypes used by `decode_batch`.
+
+        Returns:
+            (raw dtype, dtype, copied names, packed fields) where `raw dtype`
+            overlays one frame of `stride` bytes whose packet data starts at
+            `offset`, `dtype` is the (native byte order) decoded record,
+            `copied names` are the fields copied from the raw record, and
+            `packed fields` is [(container field, [(name, shift, mask)])].
+
+        """
+        if stride is None:
+            stride = offset + self.size
+        if self._batch_dtypes is None:
+            self._batch_dtypes = self._compile_batch_dtypes()
+        raw_fields, fields, copied, packed = self._batch_dtypes
+        raw_dtype = numpy.dtype({
+            'names': [name for name, _, _ in raw_fields],
+            'formats': [fmt for _, fmt, _ in raw_fields],
+            'offsets': [offset + item_offset for _, _, item_offset in raw_fields],
+            'itemsize': stride,
+        })
+        return raw_dtype, numpy.dtype(fields), copied, packed
+
+    def _compile_batch_dtypes(self):
+        """
+        Describe each data item as a NumPy field.
+
+        """
+        raw_fields = []
+        containers = {}
+        # --- Decoded fields by name; a repeated name keeps its first position
+        # ---   but (as with `unpack`) the value of its last occurrence.
+        fields = OrderedDict()
+        copied = OrderedDict()
+        for field in self.index.fields:
+            name = field.name
+            if field.packed:
+                container = '_packed_{}'.format(field.byte_offset)
+                if container not in containers:
+                    raw_fields.append((container, field.endian + field.fmt,
+                        field.byte_offset))
+                    containers[container] = []
+                shift = struct.calcsize(field.endian + field.fmt) * 8 - \
+                    (field.bit_offset - field.byte_offset * 8) - field.num_bits
+                mask = (1 << field.num_bits) - 1
+                containers[container].append((name, shift, mask))
+                fields[name] = _smallest_uint(mask)
+                copied.pop(name, None)
+                continue
+            if field.fmt.endswith('s'):
+                fmt = native = 'S' + field.fmt[:-1]
+            else:
+                if field.fmt == 'c':
+                    fmt = native = 'S1'
+                else:
+                    fmt = field.endian + field.fmt
+                    native = '=' + field.fmt
+                if field.shape:
+                    fmt = (fmt, field.shape)
+                    native = (native, field.shape)
+            # --- Raw names are unique even when data item names are not.
+            raw_name = '{}@{}'.format(name, field.byte_offset)
+            raw_fields.append((raw_name, fmt, field.byte_offset))
+            fields[name] = native
+            copied[name] = raw_name
+        packed = [(container, containers[container])
+            for container, _, _ in raw_fields if container in containers]
+        return (raw_fields, [(name, fmt) for name, fmt in fields.iteritems()],
+            copied.items(), packed)
+
+class _FieldReader(object):
     """
-    Pack a dictionary of data items according to definitions.
+    Unpacks a fixed set of data items of one packet.
+
+    The bytes of the requested items are read with one struct per
+    endianness, skipping over everything else with pad bytes.
 
     """
-    packet_data = bytearray()
-    # --- Create iterator from ordered list of sequence counts
-    sequence_counts = iter(sorted(definitions.keys()))
-    while True:
-        try:
-            sequence_count = sequence_counts.next()
-        except StopIteration:
-            # --- Finished going through all items
-            break
+    def __init__(self, codec, names):
+        # --- Byte ranges to read, one per (offset, endian)
+        parts = {}
+        fields = []
+        for name in names:
+            field = codec.index.by_name[name]
+            part = (field.byte_offset, field.endian)
+            parts[part] = field.struct_format
+            fields.append((part, field))
+        # --- One struct per endianness, in byte order
+        self._structs = []
+        index = {}
+        num_values = 0
+        for endian in sorted(set(endian for _, endian in parts)):
+            fmt = [endian]
+            position = 0
+            for offset in sorted(offset for offset, e in parts if e == endian):
+                fmt_char = parts[(offset, endian)]
+                if offset > position:
+                    fmt.append('{}x'.format(offset - position))
+                fmt.append(fmt_char)
+                position = offset + struct.calcsize(endian + fmt_char)
+                index[(offset, endian)] = num_values
+                num_values += _value_count(fmt_char)
+            self._structs.append(struct.Struct(''.join(fmt)))
+        # --- [(value index, kind, extra)] for each requested name
+        self._fields = []
+        for part, field in fields:
+            if field.packed:
+                shift = struct.calcsize(field.endian + field.fmt) * 8 - \
+                    (field.bit_offset - field.byte_offset * 8) - field.num_bits
+                kind = _Codec._PACKED
+                extra = (shift, (1 << field.num_bits) - 1)
+            elif field.shape and not field.fmt.endswith('s'):
+                kind = _Codec._ARRAY
+                extra = (field.count,
+                    field.shape[1] if len(field.shape) == 2 else None)
+            else:
+                kind = _Codec._SCALAR
+                extra = None
+            self._fields.append((index[part], kind, extra))
+
+    def unpack(self, data):
+        if len(self._structs) == 1:
+            values = self._structs[0].unpack_from(data, 0)
+        else:
+            values = ()
+            for segment in self._structs:
+                values += segment.unpack_from(data, 0)
+        result = []
+        for index, kind, extra in self._fields:
+            if kind == _Codec._PACKED:
+                shift, mask = extra
+                result.append((values[index] >> shift) & mask)
+            elif kind == _Codec._ARRAY:
+                count, dim1_size = extra
+                value = values[index:index+count]
+                if dim1_size:
+                    value = tuple([value[j:j+dim1_size] for j in
+                        xrange(0, count, dim1_size)])
+                result.append(value)
+            else:
+                result.append(values[index])
+        return tuple(result)
+
+def _value_count(fmt_char):
+    """
+    Return the number of values a struct format item like '4i' unpacks to.
+
+    """
+    count = fmt_char[:-1]
+    if not count or fmt_char[-1] == 's':
+        return 1
+    return int(count)
+
+def _smallest_uint(mask):
+    """
+    Return the smallest native unsigned NumPy format holding `mask`.
+
+    """
+    for fmt, bits in (('u1', 8), ('u2', 16), ('u4', 32)):
+        if mask >> bits == 0:
+            return fmt
+    return 'u8'
+
+def decode_batch(frames, packet_name, offset=0, stride=None):
+    """
+    Decode many frames of one telemetry packet type into a NumPy structured array.
+
+    Args:
+        frames: either one buffer (str or bytearray) holding back-to-back
+            frames of `stride` bytes, or a sequence of frame buffers.
+        packet_name (str): TLM name of the packet in every frame.
+        offset (int): byte offset of the packet data within each frame,
+            e.g. the space packet header size for serialized packets.
+        stride (int): bytes per frame in a single buffer (defaults to
+            `offset` plus the packet data length).
+
+    Returns:
+        (numpy.ndarray) with one record per frame and one field per data
+        item, in native byte order.  Packed bit fields are separate fields,
+        2d arrays have shape (DIM_2_SIZE, DIM_1_SIZE) and 1d character
+        arrays are byte strings.
+
+    """
+    if numpy is None:
+        raise ImportError('decode_batch requires NumPy')
+    codec = TLM.get_codec(packet_name)
+    if stride is None:
+        stride = offset + codec.size
+    if stride < offset + codec.size:
+        raise ValueError('{}: stride must be at least {} bytes.'.format(
+            packet_name, offset + codec.size))
+    if isinstance(frames, memoryview):
+        frames = frames.tobytes()
+    if isinstance(frames, (str, bytearray)):
+        if len(frames) % stride:
+            raise ValueError('{}: buffer is not a whole number of {} byte '
+                'frames.'.format(packet_name, stride))
+        buf = frames
+    else:
+        # --- Gather the frames into one buffer.
+        frames = list(frames)
+        buf = bytearray(len(frames) * stride)
+        needed = offset + codec.size
+        for i, frame in enumerate(frames):
+            if len(frame) < needed:
+                raise ValueError('{}: expected {} got {} bytes.'.format(
+                    packet_name, needed, len(frame)))
+            length = min(len(frame), stride)
+            buf[i*stride:i*stride+length] = frame[0:length]
+    raw_dtype, dtype, copied, packed = codec.batch_dtypes(offset, stride)
+    raw = numpy.frombuffer(buf, dtype=raw_dtype)
+    decoded = numpy.empty(len(raw), dtype=dtype)
+    for name, raw_name in copied:
+        decoded[name] = raw[raw_name]
+    for container, fields in packed:
+        values = raw[container]
+        for name, shift, mask in fields:
+            decoded[name] = (values >> shift) & mask
+    return decoded
+
+class _AnalogTable(object):
+    """
+    Polynomial coefficients of each analog conversion, by ANALOG_NAME.
+
+    Loaded from the analog csv on first use.
+
+    """
+    def __init__(self, path):
+        self.path = path
+        self._coefficients = None
+        self._units = None
+
+    def _load(self):
+        if self._coefficients is None:
+            self._coefficients = {}
+            self._units = {}
+            for row in _load_csv(self.path):
+                self._coefficients[row['ANALOG_NAME']] = _coefficients(row)
+                self._units[row['ANALOG_NAME']] = row['UNITS']
+
+    def coefficients(self, analog_name):
+        """
+        Return the coefficients (lowest order first) for `analog_name`, or None.
+
+        """
+        self._load()
+        return self._coefficients.get(analog_name)
+
+    def units(self, analog_name):
+        """
+        Return the engineering units for `analog_name`, or None if unknown.
+
+        """
+        self._load()
+        return self._units.get(analog_name)
+
+def _coefficients(row):
+    """
+    Return the polynomial coefficients of a row with NUM_COEF & COEF_{n}.
+
+    Returns None if the row has no coefficients.
+
+    """
+    num_coef = row.get('NUM_COEF')
+    if not num_coef:
+        return None
+    return tuple(float(row['COEF_{}'.format(i)] or 0) for i in range(num_coef))
+
+def _get_conversion(definitions):
+    """
+    Return the (cached) _Conversion for a packet's definitions.
+
+    """
+    key = id(definitions)
+    conversion = _CONVERSIONS.get(key)
+    if conversion is None:
+        conversion = _Conversion(definitions)
+        _CONVERSIONS[key] = conversion
+    return conversion
+
+# --- Compiled analog conversions, keyed by id() of the definitions dict.
+_CONVERSIONS = {}
+
+class _Conversion(object):
+    """
+    Converts the raw values of a packet's analog data items to engineering units.
+
+    Each data item with coefficients (its own NUM_COEF & COEF_{n} columns,
+    or else those of its ANALOG_NAME in ANALOGS) is converted with the
+    polynomial COEF_0 + COEF_1*x + COEF_2*x**2 + ...  Arrays are converted
+    element by element.
+
+    Attributes:
+        fields (list): (name, coefficients) of each converted data item.
+    """
+    def __init__(self, definitions):
+        self.definitions = definitions
+        fields = OrderedDict()
+        for sequence_count in sorted(definitions.keys()):
+            definition = definitions[sequence_count]
+            coefficients = _coefficients(definition)
+            if coefficients is None and definition.get('ANALOG_NAME'):
+                coefficients = ANALOGS.coefficients(definition['ANALOG_NAME'])
+            if coefficients and definition['DATA_TYPE_NAME'] != 'Character':
+                fields[definition['DATA_ITEM_NAME']] = coefficients
+        self.fields = fields.items()
+        self._names = set(fields)
+        # --- {input dtype: output dtype} for convert_batch
+        self._batch_dtypes = {}
+
+    def convert(self, values):
+        """
+        Return a copy of `values` (as from `_Codec.unpack`) with analog items converted.
+
+        """
+        converted = dict(values)
+        for name, coefficients in self.fields:
+            if name in converted:
+                converted[name] = _polyval(coefficients, converted[name])
+        return converted
+
+    def convert_batch(self, decoded):
+        """
+        Return a copy of a `decode_batch` result with analog items converted.
+
+        Converted fields become float64; other fields are copied as they are.
+
+        """
+        dtype = self._batch_dtypes.get(decoded.dtype)
+        if dtype is None:
+            fields = []
+            for name in decoded.dtype.names:
+                field = decoded.dtype.fields[name][0]
+                if name in self._names:
+                    field = numpy.dtype(('f8', field.shape))
+                fields.append((name, field))
+            dtype = numpy.dtype(fields)
+            self._batch_dtypes[decoded.dtype] = dtype
+        converted = numpy.empty(len(decoded), dtype=dtype)
+        for name in decoded.dtype.names:
+            converted[name] = decoded[name]
+        for name, coefficients in self.fields:
+            if name in decoded.dtype.fields:
+                converted[name] = _polyval(coefficients, decoded[name])
+        return converted
+
+def _polyval(coefficients, value):
+    """
+    Evaluate a polynomial (lowest order coefficient first) by Horner's rule.
+
+    `value` may be a number, a (nested) tuple of numbers or a NumPy array.
+
+    """
+    if isinstance(value, tuple):
+        return tuple(_polyval(coefficients, item) for item in value)
+    result = 0.0
+    for coefficient in reversed(coefficients):
+        result = result * value + coefficient
+    return result
+
+def enum_lookup(enum_relid, value):
+    """
+    Return (display name, meaning) of `value` in enum `enum_relid`, or None.
+
+    """
+    return _get_enum_map(enum_relid).lookup(value)
+
+def _get_enum_map(enum_relid):
+    """
+    Return the (cached) _EnumMap for an ENUM_RELID.
+
+    """
+    enum_map = _ENUM_MAPS.get(enum_relid)
+    if enum_map is None:
+        enum_map = _EnumMap(ENUMS[enum_relid])
+        _ENUM_MAPS[enum_relid] = enum_map
+    return enum_map
+
+# --- Enum reverse maps, keyed by ENUM_RELID.
+_ENUM_MAPS = {}
+
+class _EnumMap(object):
+    """
+    Reverse map of one enum, from value to (display name, meaning).
+
+    Enums with small, dense values (the usual case) are stored as tuples
+    indexed by value; others as a dict.
+
+    """
+    def __init__(self, entries):
+        by_value = dict((entry['VALUE'], (display_name, entry['MEANING']))
+            for display_name, entry in entries.iteritems())
+        self.entries = None
+        self.by_value = None
+        if by_value and 0 <= min(by_value) and max(by_value) < 2 * len(by_value) + 16:
+            self.entries = tuple(by_value.get(value)
+                for value in range(max(by_value) + 1))
         else:
+            self.by_value = by_value
+
+    def lookup(self, value):
+        """
+        Return (display name, meaning) for `value`, or None if it is not defined.
+
+        """
+        if self.entries is not None:
+            if 0 <= value < len(self.entries):
+                return self.entries[value]
+            return None
+        return self.by_value.get(value)
+
+def _get_enum_decoder(definitions):
+    """
+    Return the (cached) _EnumDecoder for a packet's definitions.
+
+    """
+    key = id(definitions)
+    decoder = _ENUM_DECODERS.get(key)
+    if decoder is None:
+        decoder = _EnumDecoder(definitions)
+        _ENUM_DECODERS[key] = decoder
+    return decoder
+
+# --- Compiled enum decoders, keyed by id() of the definitions dict.
+_ENUM_DECODERS = {}
+
+class _EnumDecoder(object):
+    """
+    Replaces the raw values of a packet's enumerated data items with their names.
+
+    Attributes:
+        fields (list): (name, _EnumMap) of each data item with an ENUM_RELID.
+    """
+    def __init__(self, definitions):
+        self.definitions = definitions
+        fields = OrderedDict()
+        for sequence_count in sorted(definitions.keys()):
             definition = definitions[sequence_count]
-            # ---
-            # --- STEP 1: Determine if item is a packed or array special case.
-            data_type = definition['DATA_TYPE_NAME']
-            if data_type is None:
-                # --- ASSUMPTION: if there is no data_type than then
-                # ---   this command has no arguments.
-                return bytearray()
-            ARRAY_ITEM, PACKED_ITEM = _determine_item_type(definition)
-            # ---
-            # --- STEP 2: Get `fmt_char` and `num_bytes`
-            fmt_string = _ENDIAN_SYMBOLS[definition['ENDIAN_NAME']]
-            if PACKED_ITEM:
-                num_bytes, fmt_char = _lookup_packed_datatype(data_type)
-            else: #STANDARD_ITEM or ARRAY_ITEM
-                num_bytes = definition['NUM_BITS'] // 8
-                fmt_char = _FORMAT_TABLE[data_type]
-            fmt_string += fmt_char
-            # ---
-            # --- STEP 3: Process & pack dictionary values
-            if PACKED_ITEM:
-                bit_count = definition['NUM_BITS']
-                parts = []
-                total_bits = bit_count
-                value = dictionary[definition['DATA_ITEM_NAME']]
-                # --- Add this item to a list of (value, bit_count) tuples
-                parts.append((value, bit_count))
-                while total_bits < (num_bytes * 8):
-                    # --- Iterate through all items in packed datatype
-                    definition = definitions[sequence_counts.next()]
-                    bit_count = definition['NUM_BITS']
-                    total_bits += bit_count
-                    value = dictionary[definition['DATA_ITEM_NAME']]
-                    # --- Add this item to a list of (value, bit_count) tuples
-                    parts.append((value, bit_count))
-                # --- Pack the parts into a bytearray
-                packet_part = _pack_parts(parts, fmt_string, num_bytes)
-            elif ARRAY_ITEM:
-                values = dictionary[definition['DATA_ITEM_NAME']]
-                packet_part = _pack_array(values, definition, fmt_string,
-                    num_bytes)
-            else: #STANDARD_ITEM
-                # --- Pack dictionary value into bytearray
-                value = dictionary[definition['DATA_ITEM_NAME']]
-                packet_part = bytearray(num_bytes)
-                struct.pack_into(fmt_string, packet_part, 0, value)
-            # --- Add part to return array before looping
-            packet_data += packet_part
-        # --- END WHILE LOOP
-    # --- Return from _dict_to_bytes()
-    return packet_data
+            enum_relid = definition.get('ENUM_RELID')
+            if enum_relid is not None and enum_relid in ENUMS:
+                fields[definition['DATA_ITEM_NAME']] = _get_enum_map(enum_relid)
+        self.fields = fields.items()
+
+    def decode(self, values):
+        """
+        Return a copy of `values` with enumerated items as display names.
+
+        Values not defined by the enum are left as they are.  Arrays are
+        decoded element by element.
+
+        """
+        decoded = dict(values)
+        for name, enum_map in self.fields:
+            if name in decoded:
+                decoded[name] = _enum_name(enum_map, decoded[name])
+        return decoded
+
+def _enum_name(enum_map, value):
+    if isinstance(value, tuple):
+        return tuple(_enum_name(enum_map, item) for item in value)
+    entry = enum_map.lookup(value)
+    if entry is None:
+        return value
+    return entry[0]
+
+def _make_getter(indices):
+    """
+    Return a function picking `indices` out of a tuple, always as a tuple.
+
+    """
+    if len(indices) == 0:
+        return lambda values: ()
+    elif len(indices) == 1:
+        index = indices[0]
+        return lambda values: (values[index],)
+    return itemgetter(*indices)
 
 def _determine_item_type(definition):
     """
@@ -480,88 +1204,9 @@ def _lookup_packed_datatype(data_type):
     else:
         raise ValueError
 
-def _pack_array(values, definition, fmt_string, num_bytes):
-    """
-    Pack an array item defined by a dictionary entry into a bytearray
-
-    Args:
-        values (tuple): 1d or 2d tuple of values to pack
-        definition (dict): definition of the data item
-        fmt_string (str): struct.unpack format string for an element
-        num_bytes (int): number of bytes of each element
-
-    """
-    packet_part = bytearray()
-    if definition['DIM_2_SIZE']:
-        for dim1 in values:
-            for value in dim1:
-                buff = bytearray(num_bytes)
-                struct.pack_into(fmt_string, buff, 0, value)
-                packet_part += buff
-    else:
-        for value in values:
-            buff = bytearray(num_bytes)
-            struct.pack_into(fmt_string, buff, 0, value)
-            packet_part += buff
-    return packet_part
-
-def _unpack_parts(packed_value, parts):
-    """
-    Create a dictionary of UInt values.
-
-    This unpacks data that is stored in fractional UInt sizes, eg. 1 byte split
-    into a 3BitUint8 and a 5BitUint8.
-
-    Args:
-        packed_value (int): A number representing packed integers of various bit sizes
-        parts (list): List of tuples like: (part name (str), bit size (int))
-
-    Returns:
-        Dictionary of names/part_values
-
-    """
-    dictionary = {}
-    total_bits = sum([parts[x][1] for x in xrange(len(parts))])
-    parsed_bits = 0
-    for part in parts:
-        num_bits = part[1]
-        parsed_bits += num_bits
-        shift = total_bits - parsed_bits
-        mask = sum([1 << x for x in xrange(num_bits)]) << shift
-        value = (packed_value & mask) >> shift
-        dictionary[part[0]] = value
-    return dictionary
-
-def _pack_parts(parts, fmt_string, num_bytes):
-    """
-    Combine a list of integers of different bit sizes & pack into bytearray.
-
-    This packs data that is stored in fractional UInt sizes, eg. 1 byte split
-    into a 3BitUint8 and a 5BitUint8.
-
-    Args:
-        parts (list): List of tuples like: (value (int), bit_count (int))
-        fmt_string (str): struct.unpack format string to use
-        num_bytes (int): Number of bytes long the datatype to pack into is
-
-    Returns:
-        Packed bytearray of the values in `parts`
-
-    """
-    pack_value = 0
-    shift = (num_bytes * 8)
-    for part in parts:
-        value = part[0]
-        num_bits = part[1]
-        shift = shift - num_bits
-        pack_value += (value << shift)
-    packet_part = bytearray(num_bytes)
-    struct.pack_into(fmt_string, packet_part, 0, pack_value)
-    return packet_part
-
-def _make_lookups(table, id_key):
+def _make_lookups(ids):
     """
-    Create lookup tables by `id_key` & name for top level keys in grouped dict.
+    Create lookup tables by packet id & name from {packet name: packet id}.
 
     Telemetry example:
 
@@ -578,10 +1223,7 @@ def _make_lookups(table, id_key):
     """
     name_by_id = {}
     id_by_name = {}
-    for name in table:
-        # --- Choose any data item in the packet to get the packet_id
-        item = table[name].iteritems().next()[1]
-        packet_id = item[id_key]
+    for name, packet_id in ids.iteritems():
         # --- Create lookup table as {'packet_id': 'packet_name'}
         name_by_id[packet_id] = name
         id_by_name[name] = packet_id
@@ -597,7 +1239,8 @@ def _load_csv(path):
         reader = DictReader(csv_file)
         for row in reader:
             # --- Convert fields to uppercase & copy
-            row = dict((k.upper(), v) for k,v in row.iteritems())
+            # ---   (interned, so all rows share one copy of each field name)
+            row = dict((intern(k.upper()), v) for k,v in row.iteritems())
             for key in row:
                 # --- Convert to int if it's a number field
                 try:
@@ -647,10 +1290,166 @@ def _group_items(table, key1, key2):
             grouping[val1][val2] = row
     return grouping
 
+class _LazyGrouping(Mapping):
+    """
+    Read-only grouped table (see `_group_items`) that is loaded on demand.
+
+    When the binary cache is up to date with the csv file, only its index is
+    read up front, and each group (e.g. one packet's definitions) is
+    unmarshalled the first time it is looked up.  Otherwise the csv is parsed
+    and the cache rebuilt.  Nothing is read until the table is first used.
+
+    Attributes:
+        ids (dict): {key1 value: `id_key` value of any row in that group},
+            e.g. packet name -> packet id.  Empty if there is no `id_key`.
+
+    """
+    def __init__(self, path, key1, key2, id_key=None):
+        self.path = path
+        self.key1 = key1
+        self.key2 = key2
+        self.id_key = id_key
+        # --- {key1 value: group} for groups loaded so far
+        self._groups = {}
+        # --- {key1 value: (start, end) in self._blobs}, once opened
+        self._index = None
+        self._ids = None
+        self._blobs = None
+
+    @property
+    def ids(self):
+        self._open()
+        return self._ids
+
+    def _open(self):
+        if self._index is not None:
+            return
+        cache_key = _cache_key(self.path, self.key1, self.key2, self.id_key)
+        cache_path = self.path + _CACHE_SUFFIX
+        blobs = None
+        try:
+            with open(cache_path, "rb") as cache_file:
+                # --- Map the file, so only the pages of loaded groups are read.
+                blobs = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+            header, base = _read_cache_header(blobs)
+            if header['key'] == cache_key:
+                self._index = dict((val1, (base + start, base + end))
+                    for val1, (start, end) in header['index'].iteritems())
+                self._ids = header['ids']
+                self._blobs = blobs
+                return
+        except (IOError, EOFError, ValueError, TypeError, KeyError,
+                struct.error, mmap.error):
+            pass
+        # --- The cache is stale or unreadable; don't keep it mapped.
+        if blobs is not None:
+            blobs.close()
+        self._reload()
+
+    def _reload(self):
+        """
+        Parse the csv (and rebuild the cache).
+
+        """
+        self._groups = _group_items(_load_csv(self.path), self.key1, self.key2)
+        self._index = dict.fromkeys(self._groups)
+        self._ids = {}
+        if self.id_key is not None:
+            for val1, group in self._groups.iteritems():
+                # --- Choose any data item in the group to get the id
+                self._ids[val1] = group.itervalues().next()[self.id_key]
+        if self._blobs is not None:
+            self._blobs.close()
+            self._blobs = None
+        _write_cache(self.path + _CACHE_SUFFIX,
+            _cache_key(self.path, self.key1, self.key2, self.id_key),
+            self._groups, self._ids)
+
+    def __getitem__(self, key):
+        group = self._groups.get(key)
+        if group is None:
+            self._open()
+            if key in self._groups:
+                # --- Loaded along with the rest of the csv
+                return self._groups[key]
+            start, end = self._index[key]
+            try:
+                group = marshal.loads(self._blobs[start:end])
+            except (EOFError, ValueError, TypeError):
+                self._reload()
+                return self._groups[key]
+            self._groups[key] = group
+        return group
+
+    def __iter__(self):
+        self._open()
+        return iter(self._index)
+
+    def __len__(self):
+        self._open()
+        return len(self._index)
+
+    def __contains__(self, key):
+        self._open()
+        return key in self._index
+
+def _cache_key(path, key1, key2, id_key):
+    """
+    Identify the csv contents (and how they were grouped) a cache was built from.
+
+    """
+    stat = os.stat(path)
+    return (_CACHE_VERSION, key1, key2, id_key, stat.st_mtime, stat.st_size)
+
+def _read_cache_header(data):
+    """
+    Return the header of a cache file, and the offset its groups start at.
+
+    """
+    header_len, = _CACHE_HEADER_LEN.unpack_from(data, 0)
+    base = _CACHE_HEADER_LEN.size + header_len
+    return marshal.loads(data[_CACHE_HEADER_LEN.size:base]), base
+
+def _write_cache(cache_path, cache_key, grouping, ids):
+    """
+    Write a cache file holding `grouping`.
+
+    Each group is marshalled separately, so it can be loaded on its own.  The
+    header maps each top level key to the (start, end) of its group, and
+    holds `ids`.
+
+    """
+    index = {}
+    blobs = []
+    offset = 0
+    for val1, group in grouping.iteritems():
+        blob = marshal.dumps(group)
+        index[val1] = (offset, offset + len(blob))
+        offset += len(blob)
+        blobs.append(blob)
+    header = marshal.dumps({'key': cache_key, 'index': index, 'ids': ids})
+    # --- Write to a temporary file first so readers never see a partial cache.
+    temp_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+    try:
+        with open(temp_path, "wb") as cache_file:
+            cache_file.write(_CACHE_HEADER_LEN.pack(len(header)))
+            cache_file.write(header)
+            cache_file.write(''.join(blobs))
+        os.rename(temp_path, cache_path)
+    except (IOError, OSError) as e:
+        # --- e.g. a read-only file system; just parse the csv every time.
+        LOG.debug('Cannot write %s: %s', cache_path, e)
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
 #------------------------------------------------
 # --- Initialize TABLE constants on module import
+# ---   (the tables themselves are loaded on first use)
 CMD = _DefinitionTable(_CMD_CSV_PATH, 'CMD_PKT_NAME', 'SEQUENCE_NUMBER',
     'CMD_ID')
 TLM = _DefinitionTable(_TLM_CSV_PATH, 'TLM_PKT_NAME', 'SEQUENCE_NUMBER',
     'PKT_ID')
-ENUMS = _group_items(_load_csv(_ENUM_CSV_PATH), 'ENUM_RELID', 'DISPLAY_NAME')
+ENUMS = _LazyGrouping(_ENUM_CSV_PATH, 'ENUM_RELID', 'DISPLAY_NAME')
+ANALOGS = _AnalogTable(_ANALOG_CSV_PATH)
@@ -50,6 +50,8 @@ def main():
         # OK, run the command!
         try:
             rval = func(*cmd_args_parsed)
+            # Wait for any timed command sequence it started
+            hw.scheduler.run()
         except NotImplementedError as ex:
             print("Error: Command not yet implemented.")
             sys.exit(1)            
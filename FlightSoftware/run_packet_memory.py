@@ -0,0 +1,94 @@
+#!/usr/bin/env python2.7
+
+"""
+run_packet_memory.py
+
+This executable measures the memory footprint of queued Packet objects,
+e.g. as they would sit in a transmit queue waiting to be sent.  For
+comparison, it also measures DictPacket: the same fields, kept in a
+per-instance __dict__, as Packet was before it had __slots__.
+
+Usage: run_packet_memory.py [num_packets]
+
+Copyright SpaceVR, 2017.  All rights reserved.
+"""
+
+import sys
+import resource
+from collections import deque
+
+from spacepacket import Packet
+
+# Assert Python 2.7
+assert sys.version_info[0:2] == (2,7)
+
+# Default number of packets to queue
+NUM_PACKETS = 100000
+
+# Size of the payload carried by each queued packet
+DATA_LEN = 32
+
+class DictPacket(object):
+    """ Baseline for the comparison: Packet's fields, without __slots__. """
+
+    def __init__(self):
+        for name in Packet._HEADER_FIELDS:
+            setattr(self, name, 0)
+        self.data = None
+        self.data_len = 0
+
+
+def rss_kb():
+    """ Peak resident set size of this process, in kB. """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def object_size(packet):
+    """ Size of a Packet object, including its attribute dict (if any). """
+    size = sys.getsizeof(packet)
+    if hasattr(packet, "__dict__"):
+        size = size + sys.getsizeof(packet.__dict__)
+    return size
+
+def measure(packet_class, num_packets):
+    """ Queue num_packets packets of packet_class.
+
+    Returns:
+        (queue, object size, peak RSS growth in kB)
+    """
+
+    data = bytearray(DATA_LEN)
+    queue = deque()
+
+    rss_before = rss_kb()
+    for i in range(0, num_packets):
+        p = packet_class()
+        p.seq_count = i & 0x3FFF
+        p.data_len = DATA_LEN
+        p.data = data
+        queue.append(p)
+    rss_after = rss_kb()
+
+    return (queue, object_size(queue[0]), rss_after - rss_before)
+
+def main():
+    num_packets = NUM_PACKETS
+    if len(sys.argv) > 1:
+        num_packets = int(sys.argv[1])
+
+    print("Queued packets:          %d" % num_packets)
+
+    # Both queues are kept until the end, so the second measurement doesn't
+    # reuse memory freed by the first.
+    queues = []
+    for packet_class in (Packet, DictPacket):
+        (queue, size, growth) = measure(packet_class, num_packets)
+        queues.append(queue)
+
+        print("\n%s:" % packet_class.__name__)
+        print("  Packet object size:    %d bytes" % size)
+        print("  Peak RSS growth:       %d kB" % growth)
+        print("  RSS growth per packet: %d bytes" % (growth * 1024 // num_packets))
+
+
+if __name__ == "__main__":
+    main()
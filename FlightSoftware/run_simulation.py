@@ -0,0 +1,67 @@
+#!/usr/bin/env python2.7
+
+"""
+run_simulation.py
+
+This executable runs many randomized timelines of the flight state machine
+against the mock hardware, and reports which states were reached and how
+long was spent in each.
+
+Usage: run_simulation.py [num_timelines] [hours] [initial_state]
+
+Copyright SpaceVR, 2017.  All rights reserved.
+"""
+
+import sys
+import time
+
+from flight_sm import State
+from flight_sim import run_many
+
+# Assert Python 2.7
+assert sys.version_info[0:2] == (2,7)
+
+# Default number of timelines, and simulated time of each
+NUM_TIMELINES = 10000
+HOURS = 6
+
+def main():
+    num_timelines = NUM_TIMELINES
+    hours = HOURS
+    initial_state = State.INITIAL
+    if len(sys.argv) > 1:
+        num_timelines = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        hours = float(sys.argv[2])
+    if len(sys.argv) > 3:
+        initial_state = getattr(State, sys.argv[3])
+
+    start = time.time()
+    report = run_many(num_timelines, duration=hours * 3600, initial_state=initial_state)
+    elapsed = time.time() - start
+
+    print("Timelines:               %d x %g hours" % (report.runs, hours))
+    print("Run time:                %0.2f s (%d timelines/s)" %
+              (elapsed, report.runs / elapsed))
+    print("Transitions:             %d" % report.transitions)
+    print("Events:                  %d" % report.events)
+    print("Livelocks:               %d" % report.livelocks)
+
+    (covered, not_covered) = report.coverage()
+    print("\nStates reached:          " + ", ".join(State.NAMES[s] for s in covered))
+    print("States not reached:      " + ", ".join(State.NAMES[s] for s in not_covered))
+
+    print("\nFinal states:")
+    for state in sorted(report.final_states):
+        print("    %-32s %d" % (State.NAMES[state], report.final_states[state]))
+
+    print("\nTime in state (seconds per timeline):")
+    for state in covered:
+        print("  %s" % State.NAMES[state])
+        for (low, high, count) in report.histogram(state):
+            if count > 0:
+                print("    %10.1f - %10.1f  %d" % (low, high, count))
+
+
+if __name__ == "__main__":
+    main()
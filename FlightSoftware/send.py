@@ -4,6 +4,9 @@
 
 import sys
 import socket
+import errno
+import threading
+from itertools import islice
 from supernova import Supernova
 from spacepacket import Packet
 from collections import deque
@@ -11,6 +14,92 @@ from collections import deque
 # Assert Python 2.7
 assert sys.version_info[0:2] == (2,7)
 
+class Transport(object):
+    """ UDP sockets for sending frames, kept open between packets.
+
+    One socket is connected to each destination (IP, port) on first use,
+    and reused for every later frame to that destination.  The destination
+    addresses of the bus services are also cached.
+
+    A destination with nothing listening doesn't raise an error into the
+    caller (as with an unconnected socket): its frame is counted in
+    'refused', and its socket is dropped.
+
+    Properties:
+        refused : number of frames dropped because the destination refused them
+    """
+
+    def __init__(self):
+        # Map of (IP, port) -> connected socket
+        self.sockets = {}
+        self.refused = 0
+        # Map of (service, src_node) -> (IP, port)
+        self.addresses = {}
+        self.lock = threading.Lock()
+
+    def bus_address(self, service, src_node):
+        """ Return the (IP, port) of the bus controller for a service.
+
+        Args:
+            service  : numeric service ID
+            src_node : payload ID of the sender
+        """
+
+        addr = self.addresses.get((service, src_node))
+        if addr is None:
+            service_name = Supernova.SERVICES[service-1]
+            addr = (Supernova.controller_ip(src_node),
+                    Supernova.service_send_port(service_name, src_node))
+            self.addresses[(service, src_node)] = addr
+        return addr
+
+    def sendto(self, frame, addr):
+        """ Send a frame to an address.
+
+        Args:
+            frame : bytes, bytearray or memoryview of the serialized packet
+            addr  : (IP, port) tuple
+        """
+
+        sock = self.sockets.get(addr)
+        if sock is None:
+            with self.lock:
+                sock = self.sockets.get(addr)
+                if sock is None:
+                    # Configure UDP socket to send to this destination
+                    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                    sock.connect(addr)
+                    self.sockets[addr] = sock
+
+        try:
+            sock.send(frame)
+        except socket.error as e:
+            # A connected UDP socket reports an ICMP "port unreachable" for an
+            # earlier datagram on the next send, which then fails.  Nothing
+            # is listening there (yet); the error is now cleared, so retry.
+            if e.errno != errno.ECONNREFUSED:
+                raise
+            try:
+                sock.send(frame)
+            except socket.error as e:
+                if e.errno != errno.ECONNREFUSED:
+                    raise
+                # Still refused: drop the frame, and the connection with it
+                self.refused = self.refused + 1
+                with self.lock:
+                    if self.sockets.get(addr) is sock:
+                        del self.sockets[addr]
+                sock.close()
+
+    def close(self):
+        """ Close all sockets. """
+
+        with self.lock:
+            for sock in self.sockets.values():
+                sock.close()
+            self.sockets = {}
+
+
 class Send(object):
     """ Basic packet transmission features.
     """
@@ -20,6 +109,14 @@ class Send(object):
     ENABLE_TRACE = False
     TRACE_QUEUE  = deque() # append on left, pop on right
 
+    # Shared sockets for all transmissions
+    TRANSPORT = Transport()
+
+    # Packets are serialized in batches of up to this many, into a reused buffer
+    BATCH_SIZE = 16
+    _BUF = bytearray(BATCH_SIZE * Packet.PACKET_SIZE)
+    _BUF_LOCK = threading.Lock()
+
     def __init__(self):
         """Construct object
         """
@@ -28,6 +125,9 @@ class Send(object):
     def send(packet):
         """Transmit a packet
 
+        A packet with more than Packet.MAX_DATA_SIZE bytes of data is
+        split into a sequence of packets, which are sent in order.
+
         Args:
             packet : a ready-to-send Packet instance.
 
@@ -38,23 +138,57 @@ class Send(object):
         if not isinstance(packet, Packet):
             raise TypeError("Expected a Packet object")
 
-        # If the packet were too large, we'd need to split it.  TODO.
-        assert packet.data_len <= Packet.MAX_DATA_SIZE
+        if packet.data_len > Packet.MAX_DATA_SIZE:
+            Send.send_many(packet.make_seq())
+        else:
+            Send.send_many((packet,))
 
-        # Serialize the packet (including all headers and data) into a buffer of raw bytes
-        buf = packet.serialize()
+    @staticmethod
+    def send_many(packets):
+        """Transmit several packets, in order
 
-        if Send.ENABLE_TRACE:
-            Send.TRACE_QUEUE.appendleft(buf)
+        The packets are serialized in batches into one reused buffer and
+        sent over the cached sockets, so no per-packet buffers or sockets
+        are created.  (Python 2.7 has no sendmmsg(); each frame is still
+        one send() call.)
 
-        # Configure UDP socket to send to the bus
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        # OK, send it!!!
-        service_name = Supernova.SERVICES[packet.service-1]
-        sock.sendto(buf, (Supernova.controller_ip(packet.src_node),
-                          Supernova.service_send_port(service_name, packet.src_node)))
-        # Close socket
-        sock.close()
+        Args:
+            packets : an iterable of ready-to-send Packet instances, each
+                with no more than Packet.MAX_DATA_SIZE bytes of data.
+                It is consumed incrementally, so it may be a generator
+                (e.g. from Packet.iter_seq).
+
+        Returns:
+            Nothing
+        """
+
+        packets = iter(packets)
+        transport = Send.TRANSPORT
+
+        while True:
+            batch = list(islice(packets, Send.BATCH_SIZE))
+            if len(batch) == 0:
+                break
+
+            for p in batch:
+                if not isinstance(p, Packet):
+                    raise TypeError("Expected a Packet object")
+                if p.data_len > Packet.MAX_DATA_SIZE:
+                    raise ValueError("Data length too long.  Split with Packet.make_seq")
+
+            with Send._BUF_LOCK:
+                # Serialize the packets (including all headers and data) into the buffer
+                frames = Packet.serialize_many(batch, Send._BUF)
+
+                view = memoryview(Send._BUF)
+                for (p, (offset, frame_len)) in zip(batch, frames):
+                    frame = view[offset:offset+frame_len]
+
+                    if Send.ENABLE_TRACE:
+                        Send.TRACE_QUEUE.appendleft(bytearray(frame))
+
+                    # OK, send it!!!
+                    transport.sendto(frame, transport.bus_address(p.service, p.src_node))
 
     @staticmethod
     def send_to_self(packet):
@@ -71,22 +205,17 @@ class Send(object):
 
         # Serialize the packet (including all headers and data) into a buffer of raw bytes
         buf = packet.serialize()
-        
-        # Configure UDP socket to send to the bus
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 
         # OK, send it!!!
         service_name = Supernova.SERVICES[packet.service-1]
-        sock.sendto(buf, ('127.0.0.1',
-                          Supernova.service_recv_port(service_name, packet.dest_node)))
-        # Close socket
-        sock.close()
+        Send.TRANSPORT.sendto(buf, ('127.0.0.1',
+                              Supernova.service_recv_port(service_name, packet.dest_node)))
 
 
     @staticmethod
     def send_payload_cmd(dest_payload_id, command, data):
 
-        if isinstance(data, bytes) or isinstance(data, bytearray):
+        if isinstance(data, (bytes, bytearray, memoryview)):
             data_len = len(data)
         elif data == None:
             data_len = 0
@@ -94,19 +223,57 @@ class Send(object):
             raise TypeError("Data argument is not an array of bytes")
 
         if data_len > Packet.MAX_DATA_SIZE:
-            raise ValueError("Data length too long.  TODO")
+            raise ValueError("Data length too long.  Use send_payload_stream")
+
+        p = Send._payload_cmd_header(dest_payload_id, command)
+
+        # It's a single packet, so set the sequence flags appropriately.
+        p.seq_count = 0x00  # first (and last) packet
+        p.seq_flags = 0x03  # first and last packet
+
+        # --- Data
+        p.data_len = data_len
+        p.data     = data
+
+        Send.send(p)
+
+
+    @staticmethod
+    def send_payload_stream(dest_payload_id, command, source):
+        """Transmit data of any length as a sequence of payload command packets
+
+        The data is read from 'source' incrementally as the packets are sent,
+        so e.g. a large file does not need to be held in memory.
+
+        Args:
+            dest_payload_id : payload ID of the destination
+            command         : command ID
+            source          : a file-like object, an iterable of byte chunks,
+                              or a bytes, bytearray or memoryview instance.
+                              (See Packet.iter_seq.)
+
+        Returns:
+            Nothing
+        """
+
+        p = Send._payload_cmd_header(dest_payload_id, command)
+        p.seq_count = 0x00  # first packet
+
+        Send.send_many(p.iter_seq(source))
+
+
+    @staticmethod
+    def _payload_cmd_header(dest_payload_id, command):
+        """Construct a payload command packet, with headers but no data
+        """
 
         p = Packet() # empty packet
 
         # --- Primary header
-        # This is a bus command
+        # This is a payload command
         p.service = Supernova.service_id("Payload Command")
         p.dst_node = dest_payload_id
         p.pkt_type = 1 # 0: telemetry, 1: command
-        # It's a single packet, so set the sequence flags appropriately.
-        # TODO: support packet sequences
-        p.seq_count = 0x00  # first (and last) packet
-        p.seq_flags = 0x03  # first and last packet
         p.pkt_id    = command
 
         # --- Secondary header
@@ -119,17 +286,35 @@ class Send(object):
         p.pkt_subid   = 0x00    # Unused
         p.byp_auth    = 0x01    # Bypass authentication
 
-        # --- Data
-        p.data_len = data_len
-        p.data     = data
-
-        Send.send(p)
+        return p
 
 
     @staticmethod
     def send_bus_cmd(command, data):
 
-        if isinstance(data, bytes) or isinstance(data, bytearray):
+        Send.send(Send._bus_cmd_packet(command, data))
+
+
+    @staticmethod
+    def send_bus_cmds(cmds):
+        """Transmit several bus commands as one batch, in order
+
+        Args:
+            cmds : list of (command, data) tuples, as for send_bus_cmd
+
+        Returns:
+            Nothing
+        """
+
+        Send.send_many([Send._bus_cmd_packet(command, data) for (command, data) in cmds])
+
+
+    @staticmethod
+    def _bus_cmd_packet(command, data):
+        """Construct a bus command packet
+        """
+
+        if isinstance(data, (bytes, bytearray, memoryview)):
             data_len = len(data)
         elif data == None:
             data_len = 0
@@ -166,4 +351,4 @@ class Send(object):
         p.data_len = data_len
         p.data     = data
 
-        Send.send(p)
\ No newline at end of file
+        return p
@@ -6,9 +6,9 @@
 
 import struct
 import sys
-import copy
 
-from pumpkin.core_cmd_tlm import TLM, _bytes_to_dict
+from pumpkin.core_cmd_tlm import TLM
+from checksum import checksum16, ChecksumError
 
 # Assert Python 2.7
 assert sys.version_info[0:2] == (2,7)
@@ -44,7 +44,7 @@ class Packet(object):
         checksum         : Checksum value
 
         (Data)
-        data             : bytes or bytearray instance
+        data             : bytes, bytearray or memoryview instance
         data_len         : length of data (excluding primary and secondary headers)
     """
 
@@ -52,11 +52,30 @@ class Packet(object):
 
     MAX_DATA_SIZE = 476
     PACKET_SIZE = 512
+    HEADER_SIZE = 12       # Primary Header (6) + Secondary Header (6)
+    CHECKSUM_SIZE = 2
 
     SEQ_FLAG_FIRST = 0x01  # This is a bitmask in the 'seq_flags' field.
                            # When set, it indicates the first packet in a sequence.
     SEQ_FLAG_LAST  = 0x02  # This is a bitmask in the 'seq_flags' field.
                            # When set, it indicates the last packet in a sequence.
+    SEQ_COUNT_MASK = 0x3FFF  # The 'seq_count' field is 14 bits, and wraps around.
+
+    # Precompiled layouts of the primary + secondary headers, and the checksum
+    _HEADER   = struct.Struct("<3H6B")
+    _CHECKSUM = struct.Struct("<H")
+
+    # Header fields, as copied by clone_header()
+    _HEADER_FIELDS = (
+        # Primary header
+        'pkt_type', 'dst_node', 'src_node', 'service', 'seq_flags', 'seq_count', 'packet_len',
+        # Secondary header
+        'scid', 'byp_auth', 'checksum_valid', 'ack', 'auth_count', 'pkt_subtype',
+        'pkt_id', 'pkt_subid', 'checksum',
+    )
+
+    # Fixed attribute layout; packets do not carry a per-instance __dict__.
+    __slots__ = _HEADER_FIELDS + ('data', 'data_len')
 
     def __init__(self, data_with_header=None):
         """ Construct a Packet object
@@ -97,20 +116,50 @@ class Packet(object):
         if data_with_header != None:
             self.deserialize(data_with_header)
 
-    def deserialize(self, data_with_header):
+    @property
+    def dest_node(self):
+        """ Alias of dst_node """
+        return self.dst_node
+
+    @dest_node.setter
+    def dest_node(self, value):
+        self.dst_node = value
+
+    def clone_header(self):
+        """ Return a new Packet with the same header fields, but no data
+
+        This is much cheaper than copy.deepcopy(), which would also copy
+        the data buffer.
+        """
+
+        clone = Packet.__new__(Packet)
+        for name in Packet._HEADER_FIELDS:
+            setattr(clone, name, getattr(self, name))
+        clone.data = None
+        clone.data_len = 0
+        return clone
+
+    def deserialize(self, data_with_header, verify=False):
         """ Deserialize space packet from a frame of raw data
         
         All class members will be updated.
 
+        Both headers are read in place with a single precompiled Struct.
+        If the frame is a memoryview, 'data' is set to a memoryview slice of
+        it, so no bytes are copied.  The caller must then keep the underlying
+        buffer unchanged for as long as 'data' is in use (e.g. until a
+        handler returns), or copy it.
+
+        With verify=True, the checksum of a packet with the checksum valid
+        flag set is checked, and ChecksumError is raised if it doesn't match.
+
         Args:
-            data_with_header : bytes or bytearray object containing serialized packet
+            data_with_header : bytes, bytearray or memoryview object containing serialized packet
+            verify : check the checksum (if the checksum valid flag is set)
         """
 
-        if isinstance(data_with_header, bytearray):
-            data_with_header = str(data_with_header)
-
-        # Unpacks the bytes in 2 byte pairs (3 unsigned shorts) for the primary header
-        (ph0, ph1, ph2) = struct.unpack("<3H", data_with_header[0:6])
+        # Unpacks the primary header (3 unsigned shorts) and the secondary header (6 unsigned characters)
+        (ph0, ph1, ph2, sh0, sh1, sh2, sh3, sh4, sh5) = Packet._HEADER.unpack_from(data_with_header, 0)
         # Breaks out each item from the header
         if(ph0 & 0x1000):
             self.pkt_type = 1                           # Packet Type flag
@@ -128,8 +177,6 @@ class Packet(object):
         self.seq_count = ph1 & 0x3FFF                   # Sequence Count
         self.packet_len = ph2 + 1                       # Packet Length; account for CCSDS convention
         
-        # Unpacks the bytes (6 unsigned characters) for the secondary header
-        (sh0, sh1, sh2, sh3, sh4, sh5) = struct.unpack("<6B", data_with_header[6:12])
         # Breaks out each item from the header
         self.scid = (sh0 & 0xF0) >> 4                   # Spacecraft ID
         self.byp_auth = (sh0 & 0b00000100) >> 2         # Bypass Authenticate
@@ -152,7 +199,12 @@ class Packet(object):
         self.pkt_subid = sh5                            # Packet Sub-ID
 
         # Unpacks the bytes (1 unsigned short) for the checksum
-        (self.checksum,) = struct.unpack("<H", data_with_header[-2:])
+        (self.checksum,) = Packet._CHECKSUM.unpack_from(data_with_header, len(data_with_header)-2)
+        if verify and self.checksum_valid:
+            expected = checksum16(data_with_header, 0, len(data_with_header)-2)
+            if self.checksum != expected:
+                raise ChecksumError("Packet checksum is 0x%04x, expected 0x%04x" %
+                                    (self.checksum, expected))
         
         if Packet.DEBUG: 
             print("\n------------------- primary header -------------------")
@@ -192,12 +244,38 @@ class Packet(object):
             Initializes most primary and secondary header properties.
         """
 
-        if self.data_len > 0 and not isinstance(self.data, bytes) and not isinstance(self.data, bytearray):
+        frame = bytearray(Packet.HEADER_SIZE + self.data_len + Packet.CHECKSUM_SIZE)
+        self.serialize_into(frame, 0)
+        return frame
+
+    def serialize_into(self, buf, offset=0):
+        """ Serialize this space packet directly into a caller-owned buffer
+
+        No intermediate frame is allocated, so the same buffer can be reused
+        for many packets.
+
+        The checksum member will be updated.
+
+        Args:
+            buf    : bytearray to write the frame into
+            offset : byte offset within 'buf' at which the frame starts
+
+        Returns:
+            The length of the frame in bytes (headers, data and checksum).
+
+        Effects:
+            Initializes most primary and secondary header properties.
+        """
+
+        if self.data_len > 0 and not isinstance(self.data, (bytes, bytearray, memoryview)):
             raise ValueError("Data buffer is not bytes.  It is " + repr(type(self.data)))
         if self.data_len > 0 and self.data_len != len(self.data):
             raise ValueError("Data length does not match bytearray size: "+repr(self.data_len)+" vs "+repr(len(self.data)))
 
-        frame = bytearray(Packet.PACKET_SIZE)
+        # find total packet frame length based on data length
+        frame_len = 6 + 6 + self.data_len + 2 # Primary Header (6) + Secondary Header (6) + Packet Data + Checksum (2)
+        if offset + frame_len > len(buf):
+            raise ValueError("Buffer too small for packet: "+repr(len(buf)-offset)+" vs "+repr(frame_len))
 
         # PRIMARY HEADER
         length = 6 + self.data_len + 2 # Secondary Header (6) + Packet Data + Checksum (2)
@@ -215,7 +293,6 @@ class Packet(object):
         
         if Packet.DEBUG == True:
             print("Primary Header: %04x  %04x  %04x" % (ph0, ph1, ph2))
-        struct.pack_into("<3H",frame,0,ph0,ph1,ph2)
         
         # SECONDARY HEADER
         spare = 0x00
@@ -237,77 +314,139 @@ class Packet(object):
         if Packet.DEBUG == True:
             print("Secondary Header: %02x  %02x  %02x  %02x  %02x  %02x" % (sh0, sh1, sh2, sh3, sh4, sh5))
         
-        struct.pack_into("<6B",frame,6,sh0,sh1,sh2,sh3,sh4,sh5)
+        Packet._HEADER.pack_into(buf, offset, ph0, ph1, ph2, sh0, sh1, sh2, sh3, sh4, sh5)
         
-        # CHECKSUM
-        # find total packet frame length based on data length
-        frame_len = 6 + 6 + self.data_len + 2 # Primary Header (6) + Secondary Header (6) + Packet Data + Checksum (2)
+        # DATA
+        if self.data_len > 0:
+            buf[offset+12:offset+12+self.data_len] = self.data
 
-        if (self.data != None):
-            frame[12:-2] = self.data[0:self.data_len]
-                
-        self.checksum = 0xFFFF & sum(frame[0:frame_len-2])
+        # CHECKSUM
+        self.checksum = checksum16(buf, offset, offset+frame_len-2)
         if Packet.DEBUG == True:
             print("csum: 0x%04x" % self.checksum)
-        struct.pack_into("<H",frame,frame_len-2,self.checksum)
+        Packet._CHECKSUM.pack_into(buf, offset+frame_len-2, self.checksum)
 
-        # PACKET
-        packet = frame[0:frame_len]
-        
-        return packet
+        return frame_len
+
+    @staticmethod
+    def serialize_many(packets, buf, offset=0):
+        """ Serialize a list of packets back-to-back into a caller-owned buffer
+
+        Args:
+            packets : list of Packet instances
+            buf     : bytearray large enough to hold all of the frames
+            offset  : byte offset within 'buf' at which the first frame starts
+
+        Returns:
+            A list of (offset, length) tuples, one per packet, locating each
+                frame within 'buf'.
+        """
+
+        frames = []
+        for packet in packets:
+            frame_len = packet.serialize_into(buf, offset)
+            frames.append((offset, frame_len))
+            offset = offset + frame_len
+        return frames
 
 
     def make_seq(self):
         """ Split a packet into a sequence of packets, if it is larger than the maximum packet size
 
+        Each packet in the sequence gets a copy of this packet's header and a
+        memoryview of its slice of the data, so the data is never copied.
+
         Returns:
             An array of Packet instances, each whose 'data_len' property is less than the
                 maximum packet size.
         """
 
-        seq = []
+        if self.data_len > 0:
+            return list(self.iter_seq(memoryview(self.data)[0:self.data_len]))
+        return list(self.iter_seq(None))
+
+    def iter_seq(self, source):
+        """ Generate a sequence of packets carrying the data read from 'source'
+
+        This packet serves as the header template.  The data is consumed
+        incrementally, so only about one packet's worth is held in memory at
+        a time.  The first and last packets have SEQ_FLAG_FIRST and
+        SEQ_FLAG_LAST set, and 'seq_count' increments (modulo 14 bits) from
+        this packet's value.
 
-        # Divide by maximum data length (rounding up)
-        seq_len = ( (self.data_len-1) // Packet.MAX_DATA_SIZE ) + 1
-        # ... and we still need a single packet even if the data is empty
-        seq_len = max(1, seq_len)
+        Args:
+            source : any of
+                - a file-like object with a read() method
+                - an iterable of byte chunks (of any size)
+                - a bytes, bytearray or memoryview instance
+                - None, for a single packet with no data
+
+        Yields:
+            Packet instances, each whose 'data_len' property is less than the
+                maximum packet size.
+        """
 
-        next_data = 0
+        fragments = Packet._fragments(source)
 
-        # Start making copies of the current packet and adding them to the sequence
-        for i in range(0, seq_len):
-            cur = copy.deepcopy(self)
+        i = 0
+        cur = next(fragments, None)
+        while True:
+            nxt = next(fragments, None)
 
-            # Need to correctly set seq_flags
-            cur.seq_flags = 0
+            p = self.clone_header()
+            p.seq_flags = 0
             if i == 0:
-                cur.seq_flags = cur.seq_flags | Packet.SEQ_FLAG_FIRST
-            if i == (seq_len-1):
-                cur.seq_flags = cur.seq_flags | Packet.SEQ_FLAG_LAST
+                p.seq_flags = p.seq_flags | Packet.SEQ_FLAG_FIRST
+            if nxt is None:
+                p.seq_flags = p.seq_flags | Packet.SEQ_FLAG_LAST
+            p.seq_count = (self.seq_count + i) & Packet.SEQ_COUNT_MASK
+            if cur is not None:
+                p.data = cur
+                p.data_len = len(cur)
+
+            yield p
+
+            if nxt is None:
+                break
+            cur = nxt
+            i = i + 1
+
+    @staticmethod
+    def _fragments(source):
+        """ Generate non-empty data fragments of at most MAX_DATA_SIZE bytes from 'source'
+
+        See iter_seq() for the accepted sources.
+        """
 
-            # Copy data, up to maximum packet size
-            cur.data_len = self.data_len - next_data
-            if cur.data_len > Packet.MAX_DATA_SIZE:
-                cur.data_len = Packet.MAX_DATA_SIZE
-            if cur.data_len == 0:
-                cur.data = None
-            else:
-                cur.data = self.data[next_data:next_data+cur.data_len]
-            next_data = next_data + cur.data_len
+        if source is None:
+            return
 
-            seq.append(cur)
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            # Already in memory; hand out views without copying.
+            view = memoryview(source)
+            for start in range(0, len(view), Packet.MAX_DATA_SIZE):
+                yield view[start:start+Packet.MAX_DATA_SIZE]
+            return
 
-        # Check: final data byte should be at the end of packet buffer
-        assert(next_data == self.data_len)
-        # Check: we have produced the expected number of packets
-        assert(len(seq) == seq_len)
+        if hasattr(source, "read"):
+            source = iter(lambda read=source.read: read(Packet.MAX_DATA_SIZE), b"")
 
-        return seq
+        # Re-block chunks of arbitrary size into full-size fragments.
+        pending = bytearray()
+        for chunk in source:
+            pending += chunk
+            while len(pending) >= Packet.MAX_DATA_SIZE:
+                yield pending[0:Packet.MAX_DATA_SIZE]
+                del pending[0:Packet.MAX_DATA_SIZE]
+        if len(pending) > 0:
+            yield pending
 
 
 class AckPacket(object):
     """ Acknowledgement packet """
 
+    __slots__ = ('base', 'ack_status', 'auth_count', 'ext_status')
+
     def __init__(self, packet):
         """ Construct an AckPacket from a generic Packet object
 
@@ -340,6 +479,8 @@ class TelemetryPacket(object):
 
     DEBUG = False
 
+    __slots__ = ('base', 'values')
+
     def __init__(self, packet):
         """ Construct a TelemetryPacket from a generic Packet object
 
@@ -351,7 +492,13 @@ class TelemetryPacket(object):
         self.values = dict()
 
 
-    def deserialize(self):
+    def deserialize(self, enums=False):
+        """ Decode the telemetry values from the base packet data
+
+        Args:
+            enums : if True, enumerated data items are given as their display
+                names (e.g. 'ON') instead of their raw values
+        """
 
         packet_name = TLM.name_by_id[self.base.pkt_id]
 
@@ -367,12 +514,33 @@ class TelemetryPacket(object):
 
         if TelemetryPacket.DEBUG: print("Telemetry packet : %s" % (packet_name))
 
-        # --- Definitions describe the data items in a packet & their types.
-        definitions = TLM.table[packet_name]
-        self.values = _bytes_to_dict(self.base.data, definitions)
+        # --- The compiled codec describes the data items in a packet & their types.
+        self.values = TLM.get_codec(packet_name).unpack(self.base.data)
+        if enums:
+            self.values = TLM.get_enum_decoder(packet_name).decode(self.values)
 
         if TelemetryPacket.DEBUG: self.printout()
 
+    def decode_fields(self, names):
+        """ Decode only the named telemetry values from the base packet data
+
+        This is much cheaper than deserialize() when only a few values are
+        needed.  It does not change self.values.
+
+        Args:
+            names : sequence of data item names
+
+        Returns:
+            tuple of the values, in the order of 'names'
+        """
+
+        packet_name = TLM.name_by_id[self.base.pkt_id]
+        codec = TLM.get_codec(packet_name)
+        if self.base.data_len < codec.size:
+            raise ValueError('{}: expected {} got {} bytes.'.format(packet_name,
+                codec.size, self.base.data_len))
+        return codec.unpack_fields(self.base.data, names)
+
     def printout(self):
         print "\n------------------- packet data -------------------"
 
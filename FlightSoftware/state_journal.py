@@ -0,0 +1,169 @@
+"""
+State journal module
+
+Keeps a small set of named values (e.g. the flight state) on disk, so they
+survive a reboot.  Updates are appended to a journal file rather than
+rewriting it, and several updates can share one fsync.  When the journal
+grows too long, it is compacted into a single record.
+
+Copyright SpaceVR, 2017.  All rights reserved.
+"""
+
+import os
+import sys
+import zlib
+import struct
+import marshal
+
+# Assert Python 2.7
+assert sys.version_info[0:2] == (2,7)
+
+class StateJournal(object):
+    """ Append-only journal of named values.
+
+    Each record is a dict of values that changed: a 4-byte length and a
+    4-byte CRC-32, followed by the marshalled dict.  Loading replays the
+    records in order.  A record that was only partly written (e.g. when
+    power was lost) fails its length or CRC check; it and anything after it
+    are discarded.
+
+    Records are written to the file immediately, but only fsync'd by
+    sync(): straight away for record(..., sync=True), and otherwise after
+    SYNC_INTERVAL seconds when the journal is attached to an EventLoop (or
+    on the next sync/close).
+
+    Properties:
+        path : journal file path
+        values : dict of the current values
+    """
+
+    # Time to wait for more records before an fsync
+    SYNC_INTERVAL = 1.0 # seconds
+
+    # Compact the journal when it grows beyond this size
+    COMPACT_SIZE = 64 * 1024 # bytes
+
+    _HEADER = struct.Struct('<Ii')
+
+    def __init__(self, path):
+        """ Construct a StateJournal, loading the values stored at 'path'
+
+        Args:
+            path : journal file path (created if it doesn't exist)
+        """
+
+        self.path = path
+        self.values = {}
+        self.loop = None
+        self._sync_timer = None
+        self._dirty = False
+
+        size = self._load()
+        self._file = open(path, "ab")
+        if self._file.tell() != size:
+            # Drop a torn record at the end
+            self._file.truncate(size)
+            self._file.seek(size)
+
+    def _load(self):
+        """ Replay the journal into self.values.  Returns the size of its valid part. """
+
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except IOError:
+            return 0
+
+        offset = 0
+        header_size = StateJournal._HEADER.size
+        while offset + header_size <= len(data):
+            (length, crc) = StateJournal._HEADER.unpack_from(data, offset)
+            payload = data[offset + header_size:offset + header_size + length]
+            if len(payload) != length or zlib.crc32(payload) != crc:
+                break
+            try:
+                self.values.update(marshal.loads(payload))
+            except (ValueError, EOFError, TypeError):
+                break
+            offset = offset + header_size + length
+        return offset
+
+    @staticmethod
+    def _encode(values):
+        payload = marshal.dumps(values)
+        return StateJournal._HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+    def get(self, name, default=None):
+        """ Return a stored value. """
+        return self.values.get(name, default)
+
+    def record(self, values, sync=False):
+        """ Store changed values.
+
+        Args:
+            values : dict of name -> value (anything marshal can store)
+            sync : fsync before returning, e.g. for a value that must not be lost
+        """
+
+        self.values.update(values)
+        self._file.write(StateJournal._encode(values))
+        self._file.flush()
+        self._dirty = True
+
+        if self._file.tell() >= StateJournal.COMPACT_SIZE:
+            self.compact()
+        elif sync:
+            self.sync()
+        elif self.loop is not None and self._sync_timer is None:
+            self._sync_timer = self.loop.call_later(StateJournal.SYNC_INTERVAL, self.sync)
+
+    def sync(self):
+        """ fsync the records written so far. """
+
+        if self._sync_timer is not None:
+            self._sync_timer.cancel()
+            self._sync_timer = None
+        if self._dirty:
+            os.fsync(self._file.fileno())
+            self._dirty = False
+
+    def compact(self):
+        """ Replace the journal with one record of the current values.
+
+        The new journal is written and fsync'd alongside the old one, then
+        renamed over it, so one of the two is always complete.
+        """
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(StateJournal._encode(self.values))
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmp_path, self.path)
+        StateJournal._sync_dir(self.path)
+
+        self._file.close()
+        self._file = open(self.path, "ab")
+        self._dirty = False
+        if self._sync_timer is not None:
+            self._sync_timer.cancel()
+            self._sync_timer = None
+
+    @staticmethod
+    def _sync_dir(path):
+        """ fsync the directory containing path, so a rename is durable. """
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def attach(self, loop):
+        """ Batch fsyncs with a timer on an EventLoop. """
+        self.loop = loop
+
+    def close(self):
+        """ Sync and close the journal file. """
+
+        self.sync()
+        self._file.close()
@@ -0,0 +1,183 @@
+"""
+Telemetry history module
+
+Keeps a fixed number of recent telemetry samples, stored by column (one
+array per data item) rather than as one dict per sample.
+
+Copyright SpaceVR, 2017.  All rights reserved.
+"""
+
+import sys
+import array
+from bisect import bisect_left, bisect_right
+
+from pumpkin.core_cmd_tlm import TLM
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Assert Python 2.7
+assert sys.version_info[0:2] == (2,7)
+
+# Map of struct format character -> array typecode for the column.
+# (The 'array' module has no 64-bit integer type, so those are kept as doubles.)
+_TYPECODES = {
+    'b': 'b', 'B': 'B',
+    'h': 'h', 'H': 'H',
+    'i': 'i', 'I': 'I',
+    'l': 'i', 'L': 'I',
+    'q': 'd', 'Q': 'd',
+    'f': 'f', 'd': 'd',
+}
+
+# NumPy columns can hold 64-bit integers exactly.
+_NUMPY_TYPECODES = dict(_TYPECODES, q='int64', Q='uint64')
+
+class TelemetryHistory(object):
+    """ Ring buffer of telemetry samples for one telemetry packet type.
+
+    There is one column for each numeric data item in the packet (as named
+    in the TLM definitions), plus a column of sample times.  Columns are
+    NumPy arrays when NumPy is available, and 'array' module arrays otherwise.
+    Once 'capacity' samples are stored, each new sample replaces the oldest.
+
+    Query results are in chronological order.
+
+    Properties:
+        packet_name : TLM name of the packet type stored
+        capacity : maximum number of samples stored
+        names : names of the stored data items
+    """
+
+    # Default capacity: 10 minutes of once-a-second telemetry
+    CAPACITY = 600
+
+    def __init__(self, packet_name="TLMITEM_1_PL", capacity=None):
+        """ Construct a TelemetryHistory
+
+        Args:
+            packet_name : TLM name of the packet type stored
+            capacity : maximum number of samples (defaults to TelemetryHistory.CAPACITY)
+        """
+
+        self.packet_name = packet_name
+        self.capacity = TelemetryHistory.CAPACITY if capacity is None else capacity
+
+        self.names = []
+        self.columns = {}
+        for name, fmt_char in TLM.get_codec(packet_name).scalars:
+            # A data item name may be repeated; keep one column for it.
+            if name not in self.columns:
+                self.names.append(name)
+                typecodes = _TYPECODES if numpy is None else _NUMPY_TYPECODES
+                self.columns[name] = TelemetryHistory._column(typecodes[fmt_char], self.capacity)
+        self.times = TelemetryHistory._column('d', self.capacity)
+
+        # Index of the next sample to write, and number of samples stored
+        self.next = 0
+        self.count = 0
+
+    @staticmethod
+    def _column(typecode, capacity):
+        if numpy is not None:
+            return numpy.zeros(capacity, dtype=typecode)
+        return array.array(typecode, [0]) * capacity
+
+    def __len__(self):
+        return self.count
+
+    def append(self, values, timestamp):
+        """ Store one sample.
+
+        Args:
+            values : dict of data item name -> value (e.g. TelemetryPacket.values).
+                Data items missing from it are stored as zero.
+            timestamp : time of the sample, in seconds.  Samples must be
+                appended in time order.
+        """
+
+        i = self.next
+        for name in self.names:
+            self.columns[name][i] = values.get(name, 0)
+        self.times[i] = timestamp
+
+        self.next = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count = self.count + 1
+
+    def clear(self):
+        """ Discard all samples. """
+
+        self.next = 0
+        self.count = 0
+
+    def latest(self, name):
+        """ Return the newest value of a data item, or None if there are no samples. """
+
+        if self.count == 0:
+            return None
+        return self.columns[name][self.next - 1]
+
+    def latest_time(self):
+        """ Return the time of the newest sample, or None if there are no samples. """
+
+        if self.count == 0:
+            return None
+        return self.times[self.next - 1]
+
+    def column(self, name):
+        """ Return all stored values of a data item. """
+
+        return self._ordered(self.columns[name])
+
+    def window(self, name, seconds, now=None):
+        """ Return the samples of one data item from the last 'seconds' seconds.
+
+        Args:
+            name : data item name
+            seconds : length of the window
+            now : end of the window (defaults to the time of the newest sample)
+
+        Returns:
+            (times, values) arrays
+        """
+
+        times, values = self.windows([name], seconds, now)
+        return times, values[name]
+
+    def windows(self, names, seconds, now=None):
+        """ Return the samples of several data items from the last 'seconds' seconds.
+
+        Args:
+            names : data item names
+            seconds : length of the window
+            now : end of the window (defaults to the time of the newest sample)
+
+        Returns:
+            (times, dict of data item name -> values array)
+        """
+
+        times = self._ordered(self.times)
+        if now is None:
+            now = self.latest_time()
+        if now is None:
+            start = end = 0
+        else:
+            start = bisect_left(times, now - seconds)
+            end = bisect_right(times, now)
+
+        return (times[start:end],
+                dict((name, self._ordered(self.columns[name])[start:end]) for name in names))
+
+    def _ordered(self, column):
+        """ Return the stored part of a column, oldest first. """
+
+        if self.count < self.capacity:
+            return column[0:self.count]
+
+        # The buffer has wrapped; the oldest sample is at self.next.
+        if numpy is not None:
+            return numpy.concatenate((column[self.next:], column[0:self.next]))
+        return column[self.next:] + column[0:self.next]
@@ -4,7 +4,8 @@ import threading
 import socket
 import time
 
-from agent import Agent
+from agent import Agent, Reassembler
+from event_loop import EventLoop
 from spacepacket import Packet
 from supernova import Supernova
 from send import Send
@@ -24,6 +25,105 @@ def test_handlers():
     p.data = bytearray(247)
     Agent.print_it(p)
 
+def make_seq(src_node, pkt_id, data):
+    p = Packet()
+    p.src_node = src_node
+    p.pkt_id = pkt_id
+    p.data_len = len(data)
+    p.data = data
+    return p.make_seq()
+
+def test_reassembler():
+    r = Reassembler()
+
+    # Unsegmented packets pass straight through
+    p = Packet()
+    p.seq_flags = Packet.SEQ_FLAG_FIRST | Packet.SEQ_FLAG_LAST
+    assert r.add(p) is p
+
+    # Two interleaved transfers
+    data_a = bytearray(i & 0xFF for i in range(10 * Packet.MAX_DATA_SIZE + 3))
+    data_b = bytearray(b"b" * (2 * Packet.MAX_DATA_SIZE))
+    seq_a = make_seq(1, 0x10, data_a)
+    seq_b = make_seq(2, 0x10, data_b)
+    for s in seq_a[:-1]:
+        assert r.add(s) is None
+    for s in seq_b[:-1]:
+        assert r.add(s) is None
+    rsl_b = r.add(seq_b[-1])
+    rsl_a = r.add(seq_a[-1])
+
+    assert rsl_a.data == data_a
+    assert rsl_a.data_len == len(data_a)
+    assert rsl_a.seq_flags == Packet.SEQ_FLAG_FIRST | Packet.SEQ_FLAG_LAST
+    assert rsl_b.data == data_b
+    assert rsl_b.src_node == 2
+    assert r.completed == 2
+    assert r.transfers == {}
+
+def test_reassembler_errors():
+    now = [0]
+    r = Reassembler(timeout=10, clock=lambda: now[0])
+    seq = make_seq(1, 0x10, bytearray(3 * Packet.MAX_DATA_SIZE))
+
+    # Continuation without a first packet
+    assert r.add(seq[1]) is None
+    assert r.dropped == 1
+
+    # Gap in the sequence
+    assert r.add(seq[0]) is None
+    assert r.add(seq[2]) is None
+    assert r.dropped == 2
+    assert r.transfers == {}
+
+    # Stale sequence
+    assert r.add(seq[0]) is None
+    now[0] = 11
+    assert r.add(seq[1]) is None
+    assert r.evicted == 1
+    assert r.dropped == 3
+
+    # Restarting with a new first packet
+    assert r.add(seq[0]) is None
+    assert r.add(seq[0]) is None
+    assert r.add(seq[1]) is None
+    assert r.add(seq[2]).data_len == 3 * Packet.MAX_DATA_SIZE
+
+    # A packet with less data than its data_len abandons the sequence
+    assert r.add(seq[0]) is None
+    short = seq[1].clone_header()
+    short.data = seq[1].data[0:10]
+    short.data_len = seq[1].data_len
+    dropped = r.dropped
+    assert r.add(short) is None
+    assert r.dropped == dropped + 1
+    assert r.transfers == {}
+
+def test_reassembler_timer():
+    # Attached to an EventLoop, stale sequences are evicted without any
+    # further packets arriving.
+    now = [0]
+    loop = EventLoop(clock=lambda: now[0])
+    r = Reassembler(timeout=10)
+    r.attach(loop)
+    seq = make_seq(1, 0x10, bytearray(3 * Packet.MAX_DATA_SIZE))
+
+    assert r.add(seq[0]) is None
+    now[0] = 5
+    assert r.add(seq[1]) is None
+    now[0] = 14
+    loop.run_once(0)
+    assert r.evicted == 0
+    now[0] = 15
+    loop.run_once(0)
+    assert r.evicted == 1
+    assert r.transfers == {}
+
+    # No timer is left once there is nothing to evict
+    assert r._evict_timer is None
+    r.detach()
+    loop.close()
+
 def test_socket_bind_error():
     # Block socket
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -97,3 +197,75 @@ def test_timeout():
     # Wait for and then assert that thread has exited.
     t.join(0.01)
     assert not t.is_alive()
+
+def test_drain_socket():
+    # Queue several packets before the agent starts; all of them
+    # should be handled, in order, from a single wakeup.
+    a = Agent()
+    a.bind_udp_sockets()
+    assert sorted(a.service_by_fd.values()) == sorted(Supernova.SERVICES)
+
+    received = []
+    def handler(packet):
+        received.append(packet.pkt_id)
+        if packet.pkt_id == 3:
+            Agent.raise_exception(packet)
+    a.service_handler["Payload Command"] = handler
+
+    for i in range(4):
+        p = Packet()
+        p.service = Supernova.service_id("Payload Command")
+        p.dest_node = Supernova.get_my_id()
+        p.pkt_id = i
+        Send.send_to_self(p)
+
+    with pytest.raises(Exception):
+        a.run()
+    assert received == [0, 1, 2, 3]
+    a.close()
+
+def test_event_loop():
+    # Handlers can be coroutines when the agent runs on an EventLoop.
+    loop = EventLoop()
+    a = Agent()
+    a.bind_udp_sockets()
+    a.attach(loop)
+
+    received = []
+    def handler(packet):
+        pkt_id = packet.pkt_id
+        yield 0.01
+        received.append(pkt_id)
+        loop.stop()
+    a.service_handler["Payload Command"] = handler
+
+    p = Packet()
+    p.service = Supernova.service_id("Payload Command")
+    p.dest_node = Supernova.get_my_id()
+    p.pkt_id = 5
+    Send.send_to_self(p)
+
+    loop.call_later(1.0, loop.stop) # in case the packet is lost
+    loop.run_forever()
+    assert received == [5]
+
+    a.close()
+    loop.close()
+
+def test_checksum_errors():
+    # Packets with a bad checksum are dropped and counted.
+    a = Agent()
+    received = []
+    a.service_handler["Payload Command"] = lambda packet: received.append(packet.pkt_id)
+
+    p = Packet()
+    p.service = Supernova.service_id("Payload Command")
+    p.checksum_valid = 1
+    buf = p.serialize()
+    a.handle_frame("Payload Command", buf)
+    assert received == [0]
+
+    buf[5] ^= 0x01
+    a.handle_frame("Payload Command", buf)
+    assert received == [0]
+    assert a.checksum_errors == 1
@@ -0,0 +1,151 @@
+import pytest
+import sys, os
+
+from bbb_main import BbbSoftware
+from flight_sm import State, Action, Transitions, StateMachine, depends
+from spacepacket import Packet
+from payload_cmd_defs import PayloadCommandId
+from payload_cmd_handler import PayloadCommandHandler
+from pumpkin.core_cmd_tlm import TLM
+
+# Assert Python 2.7
+assert sys.version_info[0:2] == (2,7)
+
+@pytest.fixture
+def bbb(tmpdir):
+    previous_hardware = Action.HARDWARE
+    b = BbbSoftware(journal_path=str(tmpdir.join("bbb_state.journal")))
+    yield b
+    b.journal.close()
+    b.loop.close()
+    Transitions.compile()
+    Action.HARDWARE = previous_hardware
+
+def summary_packet(fill=0):
+    packet = Packet()
+    packet.pkt_id = TLM.id_by_name["TLMITEM_1_PL"]
+    packet.data = memoryview(bytearray([fill] * 247))
+    packet.data_len = 247
+    return packet
+
+def test_telemetry_coalesced(bbb):
+    # Frames of the same type arriving in one drain are decoded once
+    for fill in range(3):
+        bbb.on_telemetry(summary_packet(fill))
+    assert bbb.decode_pending
+    assert len(bbb.hardware.history) == 0
+
+    bbb.loop.run_once(0)
+    assert not bbb.decode_pending
+    assert bbb.telemetry_queue.received == 3
+    assert bbb.telemetry_queue.coalesced == 2
+    assert len(bbb.telemetry_queue) == 0
+    assert len(bbb.hardware.history) == 1
+
+    # The next frame starts another decode
+    bbb.on_telemetry(summary_packet())
+    assert bbb.decode_pending
+    bbb.loop.run_once(0)
+    assert not bbb.decode_pending
+    assert len(bbb.hardware.history) == 2
+
+def test_telemetry_copied(bbb):
+    # The agent reuses its receive buffer once the handler returns
+    packet = summary_packet()
+    buf = bytearray([1] * packet.data_len)
+    packet.data = memoryview(buf)
+    bbb.on_telemetry(packet)
+    buf[:] = bytearray(len(buf))
+    assert packet.data == bytearray([1] * packet.data_len)
+    bbb.loop.run_once(0)
+    assert bbb.hardware.history.latest_time() is not None
+
+def test_watched_telemetry_schedules_step(bbb):
+    @depends(telemetry=("ACS_ADCS_MODE",))
+    def adcs_mode_set():
+        return False
+
+    Transitions.compile([
+        (State.INITIAL, State.MAIN_START_SEQ0, adcs_mode_set, Action.nothing),
+    ])
+    assert bbb.state_machine.watched_telemetry() == set(["ACS_ADCS_MODE"])
+    bbb.step()
+    assert bbb.next_step is None
+
+    # A new value of a watched item runs the state machine
+    bbb.on_telemetry(summary_packet())
+    bbb.loop.run_once(0)
+    assert bbb.changed_telemetry == set(["ACS_ADCS_MODE"])
+    assert bbb.next_step is not None
+    bbb.loop.run_once(0)
+    assert bbb.next_step is None
+    assert bbb.changed_telemetry == set()
+
+    # The same value again doesn't
+    bbb.on_telemetry(summary_packet())
+    bbb.loop.run_once(0)
+    assert bbb.next_step is None
+
+def test_go_command(bbb):
+    bbb.start_agent()
+    try:
+        bbb.state_machine = StateMachine(State.MAIN_START_POWER_CHECK)
+        bbb.schedule_step(0)
+        for i in range(20):
+            bbb.loop.run_once(0)
+        assert bbb.state != State.MAIN_START_SEQ2
+
+        # A GO payload command moves on from the power check / Globalstar loop
+        packet = Packet()
+        packet.pkt_id = PayloadCommandId.GO
+        bbb.agent.service_handler["Payload Command"](packet)
+        for i in range(20):
+            bbb.loop.run_once(0)
+        assert bbb.state == State.MAIN_START_SEQ2
+        assert bbb.command_counts == {"GO": 1}
+        assert bbb.journal.get("command_counts") == {"GO": 1}
+        assert bbb.journal.get("state") == State.MAIN_START_SEQ2
+    finally:
+        bbb.agent.close()
+
+def test_payload_commands(bbb, monkeypatch):
+    # Only GO is handled; the payload board's shell command is not
+    import subprocess
+    def check_output(*args, **kwargs):
+        raise AssertionError("Ran a shell command")
+    monkeypatch.setattr(subprocess, "check_output", check_output)
+
+    bbb.start_agent()
+    try:
+        assert list(bbb.payload_cmds) == [PayloadCommandId.GO]
+        packet = Packet()
+        packet.pkt_id = PayloadCommandHandler.SHELL_CMD
+        packet.seq_flags = Packet.SEQ_FLAG_FIRST | Packet.SEQ_FLAG_LAST
+        packet.data = bytearray(b"true")
+        packet.data_len = 4
+        bbb.agent.service_handler["Payload Command"](packet)
+        assert bbb.command_counts == {}
+    finally:
+        bbb.agent.close()
+
+def test_step_error(bbb):
+    # A condition that raises doesn't stop the state machine from running again
+    calls = []
+    @depends(commands=("GO",))
+    def flaky():
+        calls.append(len(calls))
+        if len(calls) == 1:
+            raise RuntimeError("flaky")
+        return True
+
+    Transitions.compile([
+        (State.INITIAL, State.MAIN_START_SEQ0, flaky, Action.nothing),
+    ])
+    with pytest.raises(RuntimeError):
+        bbb.step()
+    assert bbb.next_step is not None
+    assert bbb.next_step.when == pytest.approx(bbb.loop.clock() + BbbSoftware.MAIN_LOOP_TIMEOUT, abs=0.1)
+
+    bbb.next_step.callback()
+    assert calls == [0, 1]
+    assert bbb.state == State.MAIN_START_SEQ0
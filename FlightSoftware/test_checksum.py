@@ -0,0 +1,47 @@
+import pytest
+import sys, os
+
+import checksum
+from checksum import checksum16, Checksum16
+
+# Assert Python 2.7
+assert sys.version_info[0:2] == (2,7)
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(checksum, "numpy", None)
+    elif checksum.numpy is None:
+        pytest.skip("NumPy is not installed")
+
+def test_checksum16(backend):
+    for size in (0, 1, 40, checksum.NUMPY_THRESHOLD, 5000):
+        data = bytearray((i * 7 + 3) & 0xFF for i in range(size))
+        expected = 0xFFFF & sum(data)
+        assert checksum16(data) == expected
+        assert checksum16(bytes(data)) == expected
+        assert checksum16(memoryview(data)) == expected
+
+        # Sub-ranges
+        assert checksum16(data, 1, size // 2) == 0xFFFF & sum(data[1:size // 2])
+        assert checksum16(memoryview(data), 1) == 0xFFFF & sum(data[1:])
+        assert checksum16(memoryview(data), 1, size // 2) == 0xFFFF & sum(data[1:size // 2])
+        assert checksum16(memoryview(bytes(data))) == expected
+
+        # A view into a larger buffer, as the agent passes a received frame
+        recv_buf = bytearray(b"\xff" * 3) + data + bytearray(b"\xff" * 5)
+        frame = memoryview(recv_buf)[3:3 + size]
+        assert checksum16(frame) == expected
+        assert checksum16(frame, 1) == 0xFFFF & sum(data[1:])
+
+def test_incremental(backend):
+    data = bytearray((i * 13) & 0xFF for i in range(3000))
+
+    c = Checksum16()
+    assert c.value == 0
+    for i in range(0, len(data), 700):
+        c.update(data[i:i+700])
+    assert c.value == checksum16(data)
+
+    assert Checksum16(data).update(memoryview(data), 10, 20).value == \
+        0xFFFF & (sum(data) + sum(data[10:20]))
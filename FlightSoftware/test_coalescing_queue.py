@@ -0,0 +1,35 @@
+import pytest
+import sys, os
+
+from coalescing_queue import CoalescingQueue
+
+# Assert Python 2.7
+assert sys.version_info[0:2] == (2,7)
+
+def test_coalescing():
+    q = CoalescingQueue(4)
+    assert q.get() is None
+
+    assert not q.put(113, "a1")
+    assert not q.put(114, "b1")
+    assert q.put(113, "a2")         # replaces a1, keeps its place
+    assert len(q) == 2
+    assert q.get() == (113, "a2")
+    assert q.get() == (114, "b1")
+    assert q.get() is None
+    assert (q.received, q.coalesced, q.overflowed, q.dropped) == (3, 1, 0, 1)
+
+def test_overflow():
+    q = CoalescingQueue(2)
+    q.put(1, "a")
+    q.put(2, "b")
+    assert q.put(3, "c")            # drops the oldest
+    assert len(q) == 2
+    assert q.overflowed == 1
+    assert q.get() == (2, "b")
+    assert q.get() == (3, "c")
+
+    q.put(1, "a")
+    q.clear()
+    assert q.get() is None
+    assert q.dropped == 1
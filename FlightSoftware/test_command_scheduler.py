@@ -0,0 +1,145 @@
+import pytest
+import sys, os
+
+from command_scheduler import TimerWheel, CommandScheduler, SOLAR_PANEL_INTERVAL
+from event_loop import EventLoop
+from hardware import Hardware
+from hardware_mock import HardwareMock
+from spacepacket import Packet
+from send import Send
+from supernova import BusCommands
+
+# Assert Python 2.7
+assert sys.version_info[0:2] == (2,7)
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 100.0
+    def __call__(self):
+        return self.now
+
+def test_timer_wheel():
+    wheel = TimerWheel(0.1, num_slots=8, now=0.0)
+    ran = []
+    wheel.add(0.35, ran.append, "b")
+    wheel.add(0.3, ran.append, "a")
+    wheel.add(2.0, ran.append, "wrapped")       # more than one turn of the wheel
+    wheel.add(0.5, ran.append, "cancelled").cancel()
+    assert len(wheel) == 4
+
+    assert wheel.advance(0.25) == 0
+    assert wheel.advance(0.3) == 1
+    assert wheel.advance(0.4) == 1
+    assert ran == ["a", "b"]
+
+    # 2.0 shares a slot with 0.4, 1.2, ...
+    assert wheel.advance(1.25) == 0
+    assert ran == ["a", "b"]
+    assert len(wheel) == 1
+
+    # Jumping ahead many turns still runs everything due
+    wheel.add(5.0, ran.append, "late")
+    assert wheel.advance(100.0) == 2
+    assert ran == ["a", "b", "wrapped", "late"]
+    assert len(wheel) == 0
+
+    # A timer in the past runs on the next advance
+    wheel.add(1.0, ran.append, "past")
+    assert wheel.advance(100.1) == 1
+
+def test_sequence():
+    clock = FakeClock()
+    scheduler = CommandScheduler(clock=clock)
+    ran = []
+    done = []
+
+    seq = scheduler.submit([(0, ran.append, (1,)),
+                            (0.5, ran.append, (2,)),
+                            (0.5, ran.append, (3,))],
+                           done.append, "test")
+    assert scheduler.pending
+    for i in range(10):
+        clock.now = clock.now + 0.1
+        scheduler.tick()
+        if i == 0:
+            assert ran == [1]
+        if i == 4:
+            assert ran == [1]
+    assert ran == [1, 2]
+    assert not seq.done
+    clock.now = clock.now + 0.6
+    scheduler.tick()
+    assert ran == [1, 2, 3]
+    assert done == [seq] and seq.done and seq.error is None
+    assert not scheduler.pending
+
+    # A failing step ends the sequence
+    def fail():
+        raise RuntimeError("fail")
+    seq = scheduler.submit([(0, fail, ()), (0, ran.append, (4,))], done.append)
+    clock.now = clock.now + 1
+    scheduler.tick()
+    assert done[-1] is seq and isinstance(seq.error, RuntimeError)
+    assert ran == [1, 2, 3]
+
+    # A cancelled sequence doesn't run or report
+    seq = scheduler.submit([(0.5, ran.append, (5,))], done.append)
+    seq.cancel()
+    clock.now = clock.now + 1
+    scheduler.tick()
+    assert ran == [1, 2, 3] and len(done) == 2
+
+def test_event_loop():
+    loop = EventLoop()
+    scheduler = CommandScheduler()
+    scheduler.attach(loop)
+
+    ran = []
+    scheduler.submit([(0.02, ran.append, (1,)), (0.02, ran.append, (2,))],
+                     lambda seq: loop.stop())
+
+    # Other work continues on the loop meanwhile
+    ticks = []
+    def other():
+        ticks.append(1)
+        loop.call_later(0.005, other)
+    loop.call_soon(other)
+
+    loop.call_later(5, loop.stop)
+    loop.run_forever()
+    assert ran == [1, 2]
+    assert len(ticks) > 2
+    loop.close()
+
+def test_deploy_solar_panels():
+    Send.ENABLE_TRACE = True
+    Send.TRACE_QUEUE.clear()
+
+    clock = FakeClock()
+    hw = Hardware()
+    hw.scheduler = CommandScheduler(clock=clock)
+    done = []
+    seq = hw.deploy_solar_panels(done.append)
+
+    # Nothing is sent until the scheduler runs
+    assert len(Send.TRACE_QUEUE) == 0
+    for num in range(1, 5):
+        clock.now = clock.now + SOLAR_PANEL_INTERVAL
+        hw.scheduler.tick()
+        assert len(Send.TRACE_QUEUE) == 3 * num
+    assert done == [seq]
+
+    cmds = [Packet(buf) for buf in reversed(Send.TRACE_QUEUE)]
+    assert [p.pkt_id for p in cmds] == [BusCommands.PRM_CMD] * 12
+    assert bytearray(cmds[-1].data) == bytearray([0x09, 4, 10])
+
+    Send.TRACE_QUEUE.clear()
+    Send.ENABLE_TRACE = False
+
+    # The mock runs the sequence as its time advances
+    mock = HardwareMock()
+    seq = mock.deploy_solar_panels(done.append)
+    for i in range(4):
+        assert not seq.done
+        mock.advance_time(SOLAR_PANEL_INTERVAL)
+    assert seq.done
@@ -0,0 +1,303 @@
+import pytest
+import sys, os
+import struct
+
+import shutil
+
+from pumpkin.core_cmd_tlm import TLM, CMD, ENUMS, Telemetry, Command, decode_batch, \
+    enum_lookup, \
+    _bytes_to_dict, _dict_to_bytes, _group_items, _load_csv, _LazyGrouping, \
+    _ENUM_CSV_PATH, _TLM_CSV_PATH, _CACHE_SUFFIX, ANALOGS
+
+# Assert Python 2.7
+assert sys.version_info[0:2] == (2,7)
+
+def test_codec_size():
+    ''' The compiled codec should agree with the definition table length.
+    '''
+
+    codec = TLM.get_codec("TLMITEM_1_PL")
+    assert codec.size == 247
+    assert codec.size == TLM.get_packet_len_bytes("TLMITEM_1_PL")
+
+    # Commands without arguments compile to an empty codec
+    codec = CMD.get_codec("NOOP")
+    assert codec.size == 0
+    assert codec.unpack(bytearray()) == {}
+    assert codec.pack({}) == bytearray()
+
+def test_codec_is_cached():
+    ''' Each definition is compiled only once.
+    '''
+
+    assert TLM.get_codec("TLMITEM_1_PL") is TLM.get_codec("TLMITEM_1_PL")
+
+def test_mixed_endian_and_packed():
+    ''' Decode the summary packet, which mixes endianness and packed bits.
+    '''
+
+    data = bytearray(247)
+    struct.pack_into("<I", data, 0, 0x01020304)    # Time_Seconds (little)
+    data[12] = 0xA0                                 # SYS_POW_* bit fields
+    struct.pack_into(">B", data, 21, 0x7F)          # ACS_CMD_STATUS (big)
+
+    values = TLM.get_codec("TLMITEM_1_PL").unpack(data)
+
+    assert values["Time_Seconds"] == 0x01020304
+    assert values["SYS_POW_PIM_1"] == 1
+    assert values["SYS_POW_PIM_2"] == 0
+    assert values["SYS_POW_PIM_3"] == 1
+    assert values["SYS_POW_GPS"] == 0
+    assert values["ACS_CMD_STATUS"] == 0x7F
+
+    # Also accepts a memoryview without copying
+    assert TLM.get_codec("TLMITEM_1_PL").unpack(memoryview(data)) == values
+
+def test_roundtrip_all_packets():
+    ''' Every telemetry and command packet should survive pack + unpack.
+
+    (Packets that reuse a data item name cannot roundtrip through a dict.)
+    '''
+
+    for table in (TLM, CMD):
+        for name in table.table:
+            codec = table.get_codec(name)
+            if len(set(codec.names)) != len(codec.names):
+                continue
+            data = bytearray((i * 7 + 3) & 0xFF for i in range(codec.size))
+            values = _bytes_to_dict(data, table.table[name])
+            assert _dict_to_bytes(values, table.table[name]) == data
+
+def test_arrays():
+    ''' 1d character arrays decode as strings, 2d arrays as nested tuples.
+    '''
+
+    tlm = Telemetry("GPS_SD")
+    values = TLM.get_codec("GPS_SD").unpack(tlm.data)
+    assert len(values["GPS_OBS_DATA"]) == 14
+    assert len(values["GPS_OBS_DATA"][0]) == 16
+
+    cmd = Command("FILE_DUMP_ID")
+    cmd.arguments["FILE_PREFIX"] = "abcd"
+    assert CMD.get_codec("FILE_DUMP_ID").unpack(cmd.data)["FILE_PREFIX"] == "abcd"
+
+def test_cache(tmpdir):
+    ''' Tables load the same from the csv and from the cache.
+    '''
+
+    path = str(tmpdir.join("enum_entry.csv"))
+    shutil.copy(_ENUM_CSV_PATH, path)
+    expected = _group_items(_load_csv(path), 'ENUM_RELID', 'DISPLAY_NAME')
+
+    # First load parses the csv and writes the cache
+    table = _LazyGrouping(path, 'ENUM_RELID', 'DISPLAY_NAME')
+    assert not os.path.exists(path + _CACHE_SUFFIX)
+    assert dict(table) == expected
+    assert os.path.exists(path + _CACHE_SUFFIX)
+
+    # Second load reads the cache
+    assert dict(_LazyGrouping(path, 'ENUM_RELID', 'DISPLAY_NAME')) == expected
+
+    # Changing the csv invalidates the cache
+    with open(path, "ab") as f:
+        f.write(b"99,98,NEW_VALUE,3,New meaning\r\n")
+    table = _LazyGrouping(path, 'ENUM_RELID', 'DISPLAY_NAME')
+    assert table[98]["NEW_VALUE"]["VALUE"] == 3
+
+    # A corrupt cache is ignored (and rewritten)
+    with open(path + _CACHE_SUFFIX, "wb") as f:
+        f.write(b"garbage")
+    assert _LazyGrouping(path, 'ENUM_RELID', 'DISPLAY_NAME')[98]["NEW_VALUE"]["VALUE"] == 3
+    assert _LazyGrouping(path, 'ENUM_RELID', 'DISPLAY_NAME')[98]["NEW_VALUE"]["VALUE"] == 3
+
+def test_lazy_tables():
+    ''' The module-level tables behave like the grouped dicts.
+    '''
+
+    assert "TLMITEM_1_PL" in TLM.table
+    assert TLM.id_by_name["TLMITEM_1_PL"] == 113
+    assert TLM.name_by_id[113] == "TLMITEM_1_PL"
+    assert len(ENUMS) == 141
+
+def test_granular_loading():
+    ''' With an up to date cache, only the packets looked up are loaded.
+    '''
+
+    len(TLM.table) # ensure the cache exists
+
+    table = _LazyGrouping(_TLM_CSV_PATH, 'TLM_PKT_NAME', 'SEQUENCE_NUMBER', 'PKT_ID')
+    assert table.ids["TLMITEM_1_PL"] == 113
+    assert "GPS_SD" in table
+    assert table._groups == {}
+
+    assert table["TLMITEM_1_PL"] == TLM.table["TLMITEM_1_PL"]
+    assert list(table._groups) == ["TLMITEM_1_PL"]
+
+def test_decode_batch():
+    ''' Batch decoding agrees with decoding frame by frame.
+    '''
+
+    numpy = pytest.importorskip("numpy")
+
+    frames = []
+    for j in range(3):
+        data = bytearray((i * 7 + j) & 0xFF for i in range(247))
+        frames.append(data)
+    batch = decode_batch(frames, "TLMITEM_1_PL")
+    assert len(batch) == 3
+    for j in range(3):
+        values = TLM.get_codec("TLMITEM_1_PL").unpack(frames[j])
+        for name in ("Time_Seconds", "SYS_POW_PIM_1", "SYS_POW_GPS",
+                     "ACS_CMD_STATUS", "BAT_0_BAT_V", "FaultCount"):
+            assert batch[name][j] == values[name]
+        assert tuple(batch["ACS_ATT_QUAT"][j]) == values["ACS_ATT_QUAT"]
+
+    # One buffer of serialized frames, with a header before the data
+    buf = b"".join(b"H" * 12 + bytes(f) + b"CC" for f in frames)
+    batch2 = decode_batch(buf, "TLMITEM_1_PL", offset=12, stride=12 + 247 + 2)
+    assert (batch2 == batch).all()
+
+    with pytest.raises(ValueError):
+        decode_batch(buf[:-1], "TLMITEM_1_PL", offset=12, stride=12 + 247 + 2)
+    with pytest.raises(ValueError):
+        decode_batch([bytearray(246)], "TLMITEM_1_PL")
+
+    # 2d arrays
+    tlm = Telemetry("GPS_SD")
+    batch = decode_batch([tlm.data], "GPS_SD")
+    assert batch["GPS_OBS_DATA"].shape == (1, 14, 16)
+
+def test_analog_conversion():
+    ''' Analog items convert to engineering units; others are left alone.
+    '''
+
+    assert ANALOGS.coefficients("EPS_VPCM12V") == (-5.8, 0.02)
+    assert ANALOGS.units("EPS_TBRD") == "C"
+    assert ANALOGS.coefficients("NOT_AN_ANALOG") is None
+
+    conversion = TLM.get_conversion("TLMITEM_1_PL")
+    assert TLM.get_conversion("TLMITEM_1_PL") is conversion
+
+    values = TLM.get_codec("TLMITEM_1_PL").unpack(bytearray(247))
+    values["EPS_VPCM12V"] = 1000
+    values["ACS_AN_V2P5"] = 100         # shares the ACS_AN_V3P3 conversion
+    values["ACS_ATT_QUAT"] = (2, 4, 6, 8)
+    values["Time_Seconds"] = 1234
+    converted = conversion.convert(values)
+
+    assert converted["EPS_VPCM12V"] == pytest.approx(14.2)
+    assert converted["ACS_AN_V2P5"] == pytest.approx(1.5)
+    assert converted["ACS_ATT_QUAT"] == pytest.approx((1e-9, 2e-9, 3e-9, 4e-9))
+    assert converted["Time_Seconds"] == 1234
+    assert values["EPS_VPCM12V"] == 1000
+
+def test_analog_conversion_batch():
+    ''' Batch conversion agrees with converting frame by frame.
+    '''
+
+    numpy = pytest.importorskip("numpy")
+
+    frames = [bytearray((i * 7 + j) & 0xFF for i in range(247)) for j in range(3)]
+    conversion = TLM.get_conversion("TLMITEM_1_PL")
+    batch = conversion.convert_batch(decode_batch(frames, "TLMITEM_1_PL"))
+    for j in range(3):
+        values = conversion.convert(TLM.get_codec("TLMITEM_1_PL").unpack(frames[j]))
+        for name in ("EPS_VPCM12V", "BAT_0_BAT_V", "EPS_TBRD", "Time_Seconds"):
+            assert batch[name][j] == pytest.approx(values[name])
+        assert tuple(batch["ACS_ATT_QUAT"][j]) == pytest.approx(values["ACS_ATT_QUAT"])
+
+def test_enum_decoding():
+    ''' Enumerated items decode to display names through the reverse maps.
+    '''
+
+    assert enum_lookup(297, 1) == ("ON", "On")
+    assert enum_lookup(297, 7) is None
+    assert enum_lookup(3682, 4098) == (115200, "115200 Baud")    # sparse values
+
+    decoder = TLM.get_enum_decoder("TLMITEM_1_PL")
+    assert TLM.get_enum_decoder("TLMITEM_1_PL") is decoder
+
+    values = TLM.get_codec("TLMITEM_1_PL").unpack(bytearray(247))
+    values["ACS_GPS_VALID"] = 1
+    values["ACS_ADCS_MODE"] = 200       # not defined by the enum
+    decoded = decoder.decode(values)
+    assert decoded["ACS_GPS_VALID"] == "YES"
+    assert decoded["SYS_POW_PIM_1"] == "OFF"
+    assert decoded["ACS_ADCS_MODE"] == 200
+    assert decoded["BAT_0_BAT_V"] == 0
+    assert values["ACS_GPS_VALID"] == 1
+
+def test_unpack_fields():
+    ''' Selected fields decode the same as the whole packet.
+    '''
+
+    for name in ("TLMITEM_1_PL", "GPS_SD", "ACSMAI"):
+        codec = TLM.get_codec(name)
+        data = bytearray((i * 7 + 3) & 0xFF for i in range(codec.size))
+        values = codec.unpack(data)
+        names = sorted(values)
+        assert codec.unpack_fields(data, names) == tuple(values[n] for n in names)
+        assert codec.unpack_fields(data, names[-1:]) == (values[names[-1]],)
+
+def test_packet_index():
+    ''' The index gives each data item's position and type.
+    '''
+
+    index = TLM.get_index("TLMITEM_1_PL")
+    assert TLM.get_index("TLMITEM_1_PL") is index
+    assert index.length == 247
+    assert index.size == 247
+
+    field = index.field("Time_Seconds")
+    assert (field.byte_offset, field.bit_offset, field.num_bits) == (0, 0, 32)
+    assert (field.endian, field.fmt, field.shape, field.count) == ("<", "I", (), 1)
+    assert not field.packed
+
+    field = index.field("SYS_POW_PIM_2")
+    assert (field.byte_offset, field.bit_offset, field.num_bits) == (12, 97, 1)
+    assert field.packed
+
+    field = index.field("ACS_ATT_QUAT")
+    assert (field.shape, field.count, field.struct_format) == ((4,), 4, "4i")
+
+    # The last item of a repeated name
+    assert index.field("FaultCount").byte_offset == 245
+
+    field = TLM.get_index("GPS_SD").field("GPS_OBS_DATA")
+    assert field.shape == (14, 16)
+
+    # Items with DIM_1_SIZE but no ARRAY_NAME count in the length only
+    assert TLM.get_index("ACSMAI").length == 159
+    assert TLM.get_index("ACSMAI").size == 150
+
+def test_cache_unmapped(tmpdir, monkeypatch):
+    ''' A cache that isn't used is not left mapped.
+    '''
+
+    import mmap
+    import pumpkin.core_cmd_tlm as core_cmd_tlm
+
+    maps = []
+    real_mmap = mmap.mmap
+    def tracking_mmap(*args, **kwargs):
+        maps.append(real_mmap(*args, **kwargs))
+        return maps[-1]
+    monkeypatch.setattr(core_cmd_tlm.mmap, "mmap", tracking_mmap)
+
+    path = str(tmpdir.join("enum_entry.csv"))
+    shutil.copy(_ENUM_CSV_PATH, path)
+    len(_LazyGrouping(path, 'ENUM_RELID', 'DISPLAY_NAME'))
+
+    # Different keys: the header doesn't match
+    len(_LazyGrouping(path, 'ENUM_RELID', 'VALUE'))
+    assert len(maps) == 1
+    with pytest.raises(ValueError):
+        maps[0][0:1]
+
+    # Unreadable header
+    with open(path + _CACHE_SUFFIX, "wb") as f:
+        f.write(b"garbage")
+    len(_LazyGrouping(path, 'ENUM_RELID', 'DISPLAY_NAME'))
+    assert len(maps) == 2
+    with pytest.raises(ValueError):
+        maps[1][0:1]
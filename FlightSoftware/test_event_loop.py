@@ -0,0 +1,68 @@
+import pytest
+import sys, os
+import socket
+
+from event_loop import EventLoop
+
+# Assert Python 2.7
+assert sys.version_info[0:2] == (2,7)
+
+def test_timers():
+    loop = EventLoop()
+    calls = []
+
+    loop.call_later(0.02, calls.append, "c")
+    loop.call_later(0.01, calls.append, "b")
+    loop.call_soon(calls.append, "a")
+    loop.call_later(0.01, calls.append, "x").cancel()
+    loop.call_later(0.03, loop.stop)
+
+    loop.run_forever()
+    assert calls == ["a", "b", "c"]
+    loop.close()
+
+def test_coroutine():
+    loop = EventLoop()
+    calls = []
+
+    def coroutine():
+        calls.append(1)
+        yield 0.01
+        calls.append(2)
+        yield None
+        calls.append(3)
+        loop.stop()
+
+    loop.spawn(coroutine())
+    assert EventLoop.is_coroutine(coroutine())
+    assert not EventLoop.is_coroutine(None)
+
+    loop.run_forever()
+    assert calls == [1, 2, 3]
+    loop.close()
+
+def test_reader():
+    loop = EventLoop()
+    recv = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    recv.bind(("127.0.0.1", 0))
+    send = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    received = []
+    def on_readable():
+        received.append(recv.recv(64))
+    loop.add_reader(recv, on_readable)
+
+    # Nothing to read: returns once the timeout expires
+    loop.run_once(0.01)
+    assert received == []
+
+    send.sendto(b"hello", recv.getsockname())
+    loop.run_once(1.0)
+    assert received == [b"hello"]
+
+    assert loop.remove_reader(recv)
+    assert not loop.remove_reader(recv)
+
+    loop.close()
+    recv.close()
+    send.close()
@@ -0,0 +1,77 @@
+import pytest
+import sys, os
+
+from flight_sm import State, Condition, Action, Transitions, depends
+from flight_sim import Simulation, SimulationReport, run_many
+
+# Assert Python 2.7
+assert sys.version_info[0:2] == (2,7)
+
+def test_iss_exit_sequence():
+    # From the end of SEQ0, the ISS clearance is waited out, then the
+    # power check / Globalstar sequence runs until the GO command.
+    result = Simulation(6 * 3600, seed=1, initial_state=State.MAIN_DONE_SEQ0).run()
+
+    time_in_state = result["time_in_state"]
+    assert time_in_state[State.MAIN_EXIT_ISS_SAFETY_ZONE] == Condition.ISS_CLEARANCE_TIME
+    assert time_in_state[State.MAIN_START_POWER_CHECK] == 0
+    assert sum(time_in_state.values()) == pytest.approx(6 * 3600)
+    assert result["final_state"] == State.MAIN_START_SEQ2
+    assert result["livelocks"] == 0
+
+    # Jumps straight to the wakeup, rather than stepping through time
+    assert result["events"] < 100
+
+    # The same seed gives the same timeline
+    assert Simulation(6 * 3600, seed=1, initial_state=State.MAIN_DONE_SEQ0).run() == result
+
+def test_telemetry_and_livelock():
+    def battery():
+        tp = Action.hw().telemetry
+        return tp.values["BAT_0_BAT_V"] if tp else 7.5
+
+    @depends(telemetry=("BAT_0_BAT_V",))
+    def battery_low():
+        return battery() < 7
+
+    @depends(telemetry=("BAT_0_BAT_V",))
+    def battery_ok():
+        return battery() >= 7
+
+    Transitions.compile([
+        (State.INITIAL,               State.MAIN_START_POWER_CHECK, Condition.always, Action.nothing),
+        (State.MAIN_START_POWER_CHECK, State.MAIN_DONE_POWER_CHECK, battery_low, Action.nothing),
+        (State.MAIN_DONE_POWER_CHECK,  State.MAIN_START_POWER_CHECK, battery_ok, Action.nothing),
+        # A cycle that takes no time
+        (State.SEQ0_RECORDING, State.ERROR,          Condition.always, Action.nothing),
+        (State.ERROR,          State.SEQ0_RECORDING, Condition.always, Action.nothing),
+    ])
+    try:
+        options = dict(duration=3600, telemetry_interval=10.0,
+                       telemetry_ranges={"BAT_0_BAT_V": (6.0, 8.0)})
+        result = Simulation(seed=2, **options).run()
+        assert result["visits"][State.MAIN_DONE_POWER_CHECK] > 10
+        assert result["time_in_state"][State.MAIN_DONE_POWER_CHECK] > 0
+        assert State.ERROR not in result["visits"]
+
+        result = Simulation(60, seed=2, initial_state=State.SEQ0_RECORDING).run()
+        assert result["livelocks"] > 0
+
+        # Several timelines, merged
+        report = run_many(20, workers=0, **options)
+        assert report.runs == 20
+        assert report.visits[State.INITIAL] == 20
+        (covered, not_covered) = report.coverage()
+        assert State.MAIN_DONE_POWER_CHECK in covered
+        assert State.ERROR in not_covered
+        histogram = report.histogram(State.MAIN_DONE_POWER_CHECK, bins=4)
+        assert len(histogram) == 4
+        assert sum(count for (low, high, count) in histogram) == 20
+
+        # ... and in worker processes
+        report2 = run_many(20, workers=2, **options)
+        for state in report.time_in_state:
+            assert sorted(report2.time_in_state[state]) == sorted(report.time_in_state[state])
+        assert report2.transitions == report.transitions
+    finally:
+        Transitions.compile()
@@ -0,0 +1,160 @@
+import pytest
+import sys, os
+
+from flight_sm import State, Condition, Action, Transitions, StateMachine, depends
+from hardware_mock import HardwareMock
+
+# Assert Python 2.7
+assert sys.version_info[0:2] == (2,7)
+
+def linear_next(current_state):
+    ''' The state machine step, evaluated over the whole table. '''
+    for (t_current, t_next, t_condition, t_action) in Transitions.ALL:
+        if t_current == current_state and t_condition():
+            t_action()
+            return t_next
+    return current_state
+
+def test_next_matches_table():
+    Action.HARDWARE = HardwareMock()
+    for time in (0, 2000):
+        Action.HARDWARE.cur_time = time
+        for state in State.ALL:
+            assert Transitions.next(state) == linear_next(state)
+
+def test_index_order():
+    # The first transition listed for a state takes priority
+    entries = Transitions.BY_STATE[State.MAIN_DONE_GLOBALSTAR_TRANSMIT]
+    assert [t_next for (t_condition, t_action, t_next) in entries] == \
+        [State.MAIN_START_SEQ2, State.MAIN_START_POWER_CHECK]
+
+def test_compile_errors():
+    with pytest.raises(ValueError):
+        Transitions.compile([(State.INITIAL, 99, Condition.always, Action.nothing)])
+    with pytest.raises(ValueError):
+        Transitions.compile([(State.INITIAL, State.ERROR, None, Action.nothing)])
+    assert State.MAIN_START_SEQ0 in Transitions.BY_STATE
+
+def test_validate():
+    index = Transitions.compile([
+        (State.INITIAL,         State.MAIN_START_SEQ0, Condition.always, Action.nothing),
+        (State.MAIN_START_SEQ0, State.INITIAL,         Condition.always, Action.nothing),
+        (State.MAIN_START_SEQ0, State.ERROR,           Condition.always, Action.nothing),
+        (State.SEQ0_RECORDING,  State.INITIAL,         Condition.always, Action.nothing),
+    ])
+    try:
+        (unreachable, dead_ends) = Transitions.validate(index)
+        assert State.SEQ0_RECORDING in unreachable
+        assert State.MAIN_START_SEQ0 not in unreachable
+        assert dead_ends == [State.ERROR]
+    finally:
+        Transitions.compile()
+
+    (unreachable, dead_ends) = Transitions.validate()
+    assert State.INITIAL not in unreachable
+
+def test_conditions():
+    hw = Action.HARDWARE = HardwareMock()
+
+    # The ISS clearance time is inclusive
+    hw.cur_time = Condition.ISS_CLEARANCE_TIME - 0.5
+    assert not Condition.out_of_iss_safety_zone()
+    hw.cur_time = Condition.ISS_CLEARANCE_TIME
+    assert Condition.out_of_iss_safety_zone()
+    assert Condition.out_of_iss_safety_zone.at == Condition.ISS_CLEARANCE_TIME
+
+    # GO must have been received
+    previous = Condition.RECEIVED
+    try:
+        Condition.RECEIVED = frozenset()
+        assert not Condition.received_go_command()
+        Condition.RECEIVED = frozenset(["OTHER"])
+        assert not Condition.received_go_command()
+        Condition.RECEIVED = frozenset(["GO"])
+        assert Condition.received_go_command()
+    finally:
+        Condition.RECEIVED = previous
+
+def test_state_machine_wakeups():
+    hw = Action.HARDWARE = HardwareMock()
+    calls = []
+
+    @depends(telemetry=("BAT_0_BAT_V",))
+    def battery_ok():
+        calls.append("battery_ok")
+        return hw.telemetry >= 10
+
+    @depends(commands=("GO",))
+    def go():
+        calls.append("go")
+        return hw.go
+
+    index = Transitions.compile([
+        (State.INITIAL,         State.MAIN_START_SEQ0, battery_ok, Action.nothing),
+        (State.MAIN_START_SEQ0, State.MAIN_DONE_SEQ0,  go,         Action.nothing),
+        (State.MAIN_DONE_SEQ0,  State.MAIN_EXIT_ISS_SAFETY_ZONE, Condition.always, Action.nothing),
+        (State.MAIN_EXIT_ISS_SAFETY_ZONE, State.MAIN_START_POWER_CHECK,
+             Condition.out_of_iss_safety_zone, Action.nothing),
+    ])
+    try:
+        sm = StateMachine()
+        assert sm.watched_telemetry() == set(["BAT_0_BAT_V"])
+        assert not sm.polled()
+
+        # Everything is evaluated on entering a state; then only on changes
+        hw.telemetry = 0
+        assert not sm.step()
+        assert not sm.step()
+        assert not sm.step(["OTHER"])
+        assert calls == ["battery_ok"]
+        hw.telemetry = 12
+        assert sm.step(["BAT_0_BAT_V"])
+        assert sm.state == State.MAIN_START_SEQ0
+
+        # Commands
+        del calls[:]
+        hw.go = False
+        assert not sm.step()
+        hw.go = True
+        assert not sm.step()
+        assert calls == ["go"]
+        sm.command("GO")
+        assert sm.step()
+        assert calls == ["go", "go"]
+
+        assert sm.step()
+        assert sm.state == State.MAIN_EXIT_ISS_SAFETY_ZONE
+
+        # Exact wakeup for the ISS clearance time
+        hw.cur_time = 100
+        assert not sm.step()
+        assert sm.wake_time() == Condition.ISS_CLEARANCE_TIME
+        hw.cur_time = Condition.ISS_CLEARANCE_TIME - 1
+        assert not sm.step()
+        hw.cur_time = Condition.ISS_CLEARANCE_TIME
+        assert sm.wake_time() is None
+        assert sm.step()
+        assert sm.state == State.MAIN_START_POWER_CHECK
+    finally:
+        Transitions.compile()
+
+def test_go_command():
+    Action.HARDWARE = HardwareMock()
+
+    # Without GO, the power check / Globalstar loop repeats
+    sm = StateMachine(State.MAIN_DONE_GLOBALSTAR_TRANSMIT)
+    assert sm.step()
+    assert sm.state == State.MAIN_START_POWER_CHECK
+
+    # GO is kept until the state that waits for it is reached
+    sm.command("GO")
+    while sm.state != State.MAIN_DONE_GLOBALSTAR_TRANSMIT:
+        assert sm.step()
+    assert sm.step()
+    assert sm.state == State.MAIN_START_SEQ2
+    assert Condition.RECEIVED == frozenset(["GO"])
+
+    # ... and is then used up
+    sm = StateMachine(State.MAIN_DONE_GLOBALSTAR_TRANSMIT)
+    sm.step()
+    assert not Condition.received_go_command()
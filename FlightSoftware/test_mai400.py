@@ -0,0 +1,53 @@
+import pytest
+import sys, os
+import struct
+
+from mai400 import Mai400, MaiCommand
+from spacepacket import Packet
+from send import Send
+from supernova import BusCommands
+
+# Assert Python 2.7
+assert sys.version_info[0:2] == (2,7)
+
+def reference(fmt, *args):
+    ''' Encode a command the way the Hardware methods used to. '''
+    data = bytearray(40)
+    struct.pack_into(fmt, data, 0, *args)
+    struct.pack_into('<H', data, 38, 0xFFFF & sum(data[0:38]))
+    return data
+
+def test_encode():
+    assert Mai400.SET_MODE.encode(7) == reference('<HBB', 0xEB90, 0x00, 7)
+    assert Mai400.SET_GPS_TIME.encode(1234567) == reference('<HBL', 0xEB90, 0x44, 1234567)
+    assert Mai400.SET_LATLONG.encode(75, -50, 0, 999999999) == \
+        reference('<HBhhLL', 0xEB90, 0x51, 75, -50, 0, 999999999)
+    assert Mai400.RESET_2.encode() == reference('<HB', 0xEB90, 0xF1)
+
+    # Encoding into a used buffer gives the same result
+    buf = bytearray(b"\xAA" * 50)
+    Mai400.SET_MODE.pack_into(buf, 5, 7)
+    assert buf[5:45] == Mai400.SET_MODE.encode(7)
+
+    with pytest.raises(struct.error):
+        Mai400.SET_MODE.encode()
+    with pytest.raises(ValueError):
+        MaiCommand("TOO_LONG", 0x01, "10L", ("x",) * 10)
+    with pytest.raises(ValueError):
+        MaiCommand("NAMES", 0x01, "BB", ("x",))
+
+def test_send_batch():
+    Send.ENABLE_TRACE = True
+    Send.TRACE_QUEUE.clear()
+
+    commands = [(Mai400.SET_MODE, (i % 10,)) for i in range(6)] + \
+               [(Mai400.RESET_1, ()), (Mai400.RESET_2, ())]
+    Mai400.send(commands)
+
+    frames = [Packet(buf) for buf in reversed(Send.TRACE_QUEUE)]
+    assert [p.pkt_id for p in frames] == [BusCommands.MAI_CMD] * len(commands)
+    assert [bytearray(p.data) for p in frames] == \
+        [command.encode(*args) for (command, args) in commands]
+
+    Send.TRACE_QUEUE.clear()
+    Send.ENABLE_TRACE = False
@@ -1,9 +1,12 @@
 import pytest
 import sys, os
+import io
+import errno
+import socket
 
 from spacepacket import Packet
 from send import Send
-from supernova import BusCommands
+from supernova import Supernova, BusCommands
 
 # Assert Python 2.7
 assert sys.version_info[0:2] == (2,7)
@@ -26,6 +29,57 @@ def test_send_bus_command():
     with pytest.raises(ValueError) as ex:
         Send.send_bus_cmd(0x00, bytearray(1000))
 
+# Tests streaming a large payload as a packet sequence
+def test_send_payload_stream():
+    Send.ENABLE_TRACE = True
+    Send.TRACE_QUEUE.clear()
+
+    data = bytearray(i & 0xFF for i in range(1000))
+    Send.send_payload_stream(4, 0x00, io.BytesIO(bytes(data)))
+
+    assert len(Send.TRACE_QUEUE) == 3
+    seq = [Packet(buf) for buf in reversed(Send.TRACE_QUEUE)]
+    assert [p.seq_flags for p in seq] == [Packet.SEQ_FLAG_FIRST, 0, Packet.SEQ_FLAG_LAST]
+    assert [p.seq_count for p in seq] == [0, 1, 2]
+    assert bytearray().join(bytearray(p.data) for p in seq) == data
+
+    # An oversized packet passed to send() is split the same way
+    Send.TRACE_QUEUE.clear()
+    p = Packet()
+    p.data_len = len(data)
+    p.data = data
+    Send.send(p)
+    assert len(Send.TRACE_QUEUE) == 3
+
+    Send.TRACE_QUEUE.clear()
+    Send.ENABLE_TRACE = False
+
+# Tests that sockets are kept open and batches arrive in order
+def test_send_many():
+    # Listen in place of the bus controller
+    addr = Send.TRANSPORT.bus_address(Supernova.service_id("Bus Command"), Supernova.get_my_id())
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(addr)
+    sock.settimeout(1.0)
+
+    cmds = [(BusCommands.NO_OP, bytearray([i])) for i in range(0, Send.BATCH_SIZE + 3)]
+    Send.send_bus_cmds(cmds)
+    Send.send_bus_cmd(BusCommands.NO_OP, None)
+
+    for i in range(0, len(cmds)):
+        p = Packet(sock.recv(Packet.PACKET_SIZE))
+        assert p.pkt_id == BusCommands.NO_OP
+        assert p.data == bytearray([i])
+    assert Packet(sock.recv(Packet.PACKET_SIZE)).data_len == 0
+
+    # A single socket is used for the destination
+    assert addr in Send.TRANSPORT.sockets
+    sock_before = Send.TRANSPORT.sockets[addr]
+    Send.send_bus_cmd(BusCommands.NO_OP, None)
+    assert Send.TRANSPORT.sockets[addr] is sock_before
+
+    sock.close()
+
 # Test error or invalid inputs
 def test_error_cases():
 
@@ -40,3 +94,39 @@ def test_error_cases():
     # Exceptional: Invalid parameter type
     with pytest.raises(TypeError) as ex:
         Send.send_bus_cmd(0x00, 0x00)
+
+# Test sending to a destination where nothing is listening
+def test_connection_refused():
+    from send import Transport
+
+    # Find a port with nothing listening
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    addr = sock.getsockname()
+    sock.close()
+
+    transport = Transport()
+    frame = bytearray(Packet.PACKET_SIZE)
+    for i in range(0, 5):
+        transport.sendto(frame, addr) # never raises
+
+    # A send that is refused again on the retry is dropped and counted
+    class RefusingSocket(object):
+        closed = False
+        def send(self, frame):
+            raise socket.error(errno.ECONNREFUSED, "Connection refused")
+        def close(self):
+            self.closed = True
+
+    refusing = RefusingSocket()
+    transport.sockets[addr] = refusing
+    refused = transport.refused
+    transport.sendto(frame, addr)
+    assert transport.refused == refused + 1
+    assert refusing.closed
+    assert addr not in transport.sockets
+
+    # The next frame gets a new connection
+    transport.sendto(frame, addr)
+    assert transport.sockets[addr] is not refusing
+    transport.close()
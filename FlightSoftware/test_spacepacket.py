@@ -1,6 +1,8 @@
 import pytest
 import sys, os
+import io
 from spacepacket import Packet, TelemetryPacket, AckPacket
+from checksum import ChecksumError
 
 # Assert Python 2.7
 assert sys.version_info[0:2] == (2,7)
@@ -41,6 +43,35 @@ def test_roundtrip():
     assert len(p.data) == p.data_len
     roundtrip(p)
 
+def test_deserialize_memoryview():
+    ''' Deserializing from a memoryview should not copy the packet data.
+    '''
+
+    p = Packet()
+    p.pkt_type = 1
+    p.dst_node = 4
+    p.seq_count = 0x123
+    p.pkt_id = 0x42
+    p.data_len = 6
+    p.data = bytearray(b"abcdef")
+    buf = p.serialize()
+
+    p_view = Packet(memoryview(buf))
+    assert isinstance(p_view.data, memoryview)
+    assert p_view.data == b"abcdef"
+    assert p_view.dst_node == 4
+    assert p_view.seq_count == 0x123
+    assert p_view.pkt_id == 0x42
+    assert p_view.checksum == p.checksum
+    assert p_view.data_len == 6
+
+    # It can be serialized again as-is
+    assert p_view.serialize() == buf
+
+    # The data is a view into the received frame
+    buf[12] = ord("z")
+    assert p_view.data[0] == b"z"
+
 def test_seq0():
     ''' Test the breakdown of (large packets) into a sequence of smaller ones.
     
@@ -90,6 +121,124 @@ def test_seq2():
     assert seq[0].data_len == p.MAX_DATA_SIZE
     assert seq[1].data_len == p.MAX_DATA_SIZE
 
+def test_seq_shares_data():
+    ''' The packets in a sequence reference the original data, without copies.
+    '''
+
+    p = Packet()
+    p.pkt_id = 0x42
+    p.seq_count = 7
+    p.data_len = 2 * p.MAX_DATA_SIZE + 1
+    p.data = bytearray(p.data_len)
+
+    seq = p.make_seq()
+
+    assert len(seq) == 3
+    assert [s.seq_flags for s in seq] == [Packet.SEQ_FLAG_FIRST, 0, Packet.SEQ_FLAG_LAST]
+    assert [s.seq_count for s in seq] == [7, 8, 9]
+    assert all(s.pkt_id == 0x42 for s in seq)
+
+    # Modifying the original data is visible through the sequence
+    p.data[p.MAX_DATA_SIZE] = 0x55
+    assert seq[1].data[0] == b"\x55"
+
+def test_clone_header():
+    ''' A header clone copies every header field, but not the data.
+    '''
+
+    p = Packet()
+    p.pkt_type = 1
+    p.dst_node = 3
+    p.service = 2
+    p.pkt_id = 0x42
+    p.data_len = 3
+    p.data = bytearray(b"abc")
+
+    clone = p.clone_header()
+    assert clone.data is None
+    assert clone.data_len == 0
+    for name in Packet._HEADER_FIELDS:
+        assert getattr(clone, name) == getattr(p, name)
+
+    # The clone is independent of the original
+    clone.pkt_id = 0x43
+    assert p.pkt_id == 0x42
+
+    # Packets have a fixed set of attributes
+    assert not hasattr(p, "__dict__")
+    with pytest.raises(AttributeError) as ex:
+        p.no_such_field = 1
+
+def test_iter_seq():
+    ''' Test streaming segmentation from files, chunk iterators and buffers.
+    '''
+
+    data = bytearray(i & 0xFF for i in range(3 * Packet.MAX_DATA_SIZE + 5))
+
+    p = Packet()
+    p.pkt_id = 0x42
+    p.seq_count = Packet.SEQ_COUNT_MASK - 1
+
+    sources = [
+        io.BytesIO(bytes(data)),
+        (bytes(data[i:i+100]) for i in range(0, len(data), 100)),
+        data,
+    ]
+    for source in sources:
+        seq = list(p.iter_seq(source))
+
+        assert len(seq) == 4
+        assert [s.data_len for s in seq] == [Packet.MAX_DATA_SIZE]*3 + [5]
+        assert bytearray().join(bytearray(s.data) for s in seq) == data
+        assert [s.seq_flags for s in seq] == [Packet.SEQ_FLAG_FIRST, 0, 0, Packet.SEQ_FLAG_LAST]
+        # Sequence count rolls over at 14 bits
+        assert [s.seq_count for s in seq] == [0x3FFE, 0x3FFF, 0x0000, 0x0001]
+
+    # An empty source still produces a single (empty) packet
+    seq = list(p.iter_seq(io.BytesIO(b"")))
+    assert len(seq) == 1
+    assert seq[0].data_len == 0
+    assert seq[0].seq_flags == Packet.SEQ_FLAG_FIRST | Packet.SEQ_FLAG_LAST
+
+    # Packets are produced lazily
+    def chunks():
+        yield b"x" * Packet.MAX_DATA_SIZE
+        yield b"y" * Packet.MAX_DATA_SIZE
+        raise IOError("Not reached until the second packet is requested")
+    gen = p.iter_seq(chunks())
+    assert next(gen).data == b"x" * Packet.MAX_DATA_SIZE
+    with pytest.raises(IOError) as ex:
+        next(gen)
+
+def test_checksum_verification():
+    ''' A corrupted packet with the checksum valid flag is rejected.
+    '''
+
+    p = Packet()
+    p.checksum_valid = 1
+    p.data_len = 4
+    p.data = bytearray(b"abcd")
+    buf = p.serialize()
+
+    p2 = Packet()
+    p2.deserialize(buf, verify=True)
+    assert p2.checksum == p.checksum
+
+    buf[13] ^= 0x10
+    with pytest.raises(ChecksumError):
+        p2.deserialize(buf, verify=True)
+    with pytest.raises(ChecksumError):
+        p2.deserialize(memoryview(buf), verify=True)
+
+    # Not checked unless asked for
+    p2.deserialize(buf)
+
+    # Not checked when the flag is clear
+    p.checksum_valid = 0
+    buf = p.serialize()
+    buf[13] ^= 0x10
+    p2.deserialize(buf, verify=True)
+
 def test_telemetry_deserialize():
     ''' Test the deserialization of a telemetry packet.
     '''
@@ -101,6 +250,39 @@ def test_telemetry_deserialize():
 
     tp = TelemetryPacket(p)
     tp.deserialize()
+    assert tp.values["SYS_POW_GPS"] == 0
+
+    # Enumerated values by name
+    p.data[12] = 0x01
+    tp.deserialize(enums=True)
+    assert tp.values["SYS_POW_PIM_1"] == "OFF"
+    assert tp.values["SYS_POW_GPS"] == "ON"
+    assert tp.values["Time_Seconds"] == 0
+
+def test_telemetry_decode_fields():
+    ''' Decode selected fields of a telemetry packet.
+    '''
+
+    p = Packet()
+    p.pkt_id = 113
+    p.data_len = 247
+    p.data = bytearray((i * 7 + 3) & 0xFF for i in range(247))
+
+    tp = TelemetryPacket(p)
+    names = ("BAT_0_BAT_V", "ACS_GPS_VALID", "SYS_POW_GPS", "ACS_ATT_QUAT", "Time_Seconds")
+    values = tp.decode_fields(names)
+    assert tp.values == {}
+
+    tp.deserialize()
+    assert values == tuple(tp.values[name] for name in names)
+
+    with pytest.raises(KeyError):
+        tp.decode_fields(("NO_SUCH_FIELD",))
+
+    p.data_len = 10
+    p.data = bytearray(10)
+    with pytest.raises(ValueError):
+        tp.decode_fields(names)
 
 def test_packet_serialize():
     ''' Test the serialization of a packet headers.
@@ -159,6 +341,50 @@ def test_debug_output():
     Packet.DEBUG = False
     TelemetryPacket.DEBUG = False
 
+def test_serialize_into():
+    ''' Test serialization into a caller-owned buffer.
+    '''
+
+    p = Packet()
+    p.pkt_id = 0x42
+    p.data_len = 6
+    p.data = bytearray(b"abcdef")
+    expected = p.serialize()
+
+    # Write at an offset, leaving the rest of the buffer alone
+    buf = bytearray(b"\xEE" * Packet.PACKET_SIZE)
+    frame_len = p.serialize_into(buf, 10)
+    assert frame_len == len(expected)
+    assert buf[10:10+frame_len] == expected
+    assert buf[0:10] == bytearray(b"\xEE" * 10)
+    assert buf[10+frame_len] == 0xEE
+
+    # Reuse the same buffer for a different packet
+    p.data_len = 0
+    p.data = None
+    frame_len = p.serialize_into(buf, 10)
+    assert buf[10:10+frame_len] == p.serialize()
+
+    # Exceptional: buffer too small
+    with pytest.raises(ValueError) as ex:
+        p.serialize_into(bytearray(13))
+
+def test_serialize_many():
+    ''' Test serialization of several packets back-to-back.
+    '''
+
+    p = Packet()
+    p.data_len = 3 * p.MAX_DATA_SIZE - 10
+    p.data = bytearray(p.data_len)
+    seq = p.make_seq()
+
+    buf = bytearray(len(seq) * Packet.PACKET_SIZE)
+    frames = Packet.serialize_many(seq, buf)
+
+    assert len(frames) == len(seq)
+    for (s, (offset, frame_len)) in zip(seq, frames):
+        assert buf[offset:offset+frame_len] == s.serialize()
+
 def test_invalid_packets():
     ''' Test an invalid packets.
     '''
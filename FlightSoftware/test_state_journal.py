@@ -0,0 +1,94 @@
+import pytest
+import sys, os
+
+import state_journal
+from state_journal import StateJournal
+from event_loop import EventLoop
+
+# Assert Python 2.7
+assert sys.version_info[0:2] == (2,7)
+
+@pytest.fixture
+def fsyncs(monkeypatch):
+    calls = []
+    fsync = os.fsync
+    def counting_fsync(fd):
+        calls.append(fd)
+        fsync(fd)
+    monkeypatch.setattr(state_journal.os, "fsync", counting_fsync)
+    return calls
+
+def test_reload(tmpdir):
+    path = str(tmpdir.join("state.journal"))
+    journal = StateJournal(path)
+    assert journal.values == {}
+    journal.record({"state": 1, "start_time": 1234.5})
+    journal.record({"state": 2, "counts": {"GO": 1}})
+    journal.close()
+
+    journal = StateJournal(path)
+    assert journal.values == {"state": 2, "start_time": 1234.5, "counts": {"GO": 1}}
+    journal.record({"state": 3})
+    journal.close()
+    assert StateJournal(path).get("state") == 3
+
+def test_torn_record(tmpdir):
+    path = str(tmpdir.join("state.journal"))
+    journal = StateJournal(path)
+    journal.record({"state": 1})
+    journal.record({"state": 2})
+    journal.close()
+
+    # Lose the end of the last record
+    size = os.path.getsize(path)
+    with open(path, "r+b") as f:
+        f.truncate(size - 1)
+    journal = StateJournal(path)
+    assert journal.get("state") == 1
+
+    # New records follow the last good one
+    journal.record({"state": 5})
+    journal.close()
+    assert StateJournal(path).get("state") == 5
+
+    # A corrupted record is ignored too
+    with open(path, "r+b") as f:
+        f.seek(-1, 2)
+        f.write(b"\xff")
+    assert StateJournal(path).get("state") == 1
+
+def test_sync_batching(tmpdir, fsyncs):
+    path = str(tmpdir.join("state.journal"))
+    journal = StateJournal(path)
+
+    journal.record({"count": 1})
+    journal.record({"count": 2})
+    assert fsyncs == []
+    journal.record({"state": 4}, sync=True)
+    assert len(fsyncs) == 1
+    journal.sync()
+    assert len(fsyncs) == 1
+
+    # On an event loop, a timer syncs a batch of records
+    now = [0.0]
+    loop = EventLoop(clock=lambda: now[0])
+    journal.attach(loop)
+    for i in range(10):
+        journal.record({"count": i})
+    assert len(fsyncs) == 1
+    now[0] = StateJournal.SYNC_INTERVAL
+    loop.run_once(0)
+    assert len(fsyncs) == 2
+    loop.close()
+    journal.close()
+
+def test_compaction(tmpdir, monkeypatch):
+    monkeypatch.setattr(StateJournal, "COMPACT_SIZE", 1024)
+    path = str(tmpdir.join("state.journal"))
+    journal = StateJournal(path)
+    for i in range(1000):
+        journal.record({"count": i, "state": i % 13})
+    assert os.path.getsize(path) < 1024
+    journal.close()
+    assert StateJournal(path).values == {"count": 999, "state": 999 % 13}
+    assert not os.path.exists(path + ".tmp")
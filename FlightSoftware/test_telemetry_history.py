@@ -0,0 +1,71 @@
+import pytest
+import sys, os
+
+import telemetry_history
+from telemetry_history import TelemetryHistory
+from hardware_mock import HardwareMock
+from spacepacket import Packet, TelemetryPacket
+from pumpkin.core_cmd_tlm import TLM
+
+# Assert Python 2.7
+assert sys.version_info[0:2] == (2,7)
+
+@pytest.fixture(params=["numpy", "array"])
+def backend(request, monkeypatch):
+    if request.param == "array":
+        monkeypatch.setattr(telemetry_history, "numpy", None)
+    elif telemetry_history.numpy is None:
+        pytest.skip("NumPy is not installed")
+
+def test_columns(backend):
+    h = TelemetryHistory("TLMITEM_1_PL", capacity=4)
+    assert "BAT_0_BAT_V" in h.names
+    assert "SYS_POW_PIM_1" in h.names       # packed bit field
+    assert "ACS_ATT_QUAT" not in h.names    # array
+    assert h.names.count("FaultCount") == 1
+    assert len(h) == 0
+    assert h.latest("BAT_0_BAT_V") is None
+    assert list(h.window("BAT_0_BAT_V", 10)[1]) == []
+
+def test_wraparound(backend):
+    h = TelemetryHistory("TLMITEM_1_PL", capacity=4)
+
+    for t in range(6):
+        h.append({ "BAT_0_BAT_V" : 100 + t, "SYS_POW_PIM_1" : t & 1 }, t * 10.0)
+
+    assert len(h) == 4
+    assert h.latest("BAT_0_BAT_V") == 105
+    assert h.latest_time() == 50.0
+    assert list(h.column("BAT_0_BAT_V")) == [102, 103, 104, 105]
+    assert list(h.column("EPS_TBRD")) == [0, 0, 0, 0]
+
+    times, values = h.window("BAT_0_BAT_V", 15)
+    assert list(times) == [40.0, 50.0]
+    assert list(values) == [104, 105]
+
+    times, values = h.windows(["BAT_0_BAT_V", "SYS_POW_PIM_1"], 20, now=40.0)
+    assert list(times) == [20.0, 30.0, 40.0]
+    assert list(values["BAT_0_BAT_V"]) == [102, 103, 104]
+    assert list(values["SYS_POW_PIM_1"]) == [0, 1, 0]
+
+    h.clear()
+    assert len(h) == 0
+
+def test_64bit_columns():
+    # With NumPy, 64-bit integers are stored exactly
+    if telemetry_history.numpy is None:
+        pytest.skip("NumPy is not installed")
+    h = TelemetryHistory("FILEDUMPCB", capacity=2)
+    h.append({ "File_Req_File_ID" : 2**64 - 1 }, 0.0)
+    assert h.latest("File_Req_File_ID") == 2**64 - 1
+
+def test_mock_records_summary_only():
+    hw = HardwareMock()
+    for name in ("TLMITEM_1_PL", "GPS_SD"):
+        p = Packet()
+        p.pkt_id = TLM.id_by_name[name]
+        tp = TelemetryPacket(p)
+        tp.values = { "BAT_0_BAT_V" : 7 }
+        hw.record_telemetry(tp)
+        assert hw.telemetry is tp
+    assert list(hw.history.column("BAT_0_BAT_V")) == [7]